@@ -1,3 +1,4 @@
 from .models import Model
 from .priors import Prior, Family
 from .results import ModelResults
+from .parallel import ModelSet
@@ -1,13 +1,34 @@
 from abc import ABCMeta, abstractmethod
 from bambi.external.six import string_types
+import copy
+import os
+import pickle
+import re
+import time
+from collections import OrderedDict
 import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import scipy.sparse.linalg as splinalg
+from scipy import linalg
+from scipy.sparse.csgraph import reverse_cuthill_mckee
 import warnings
-from bambi.results import PyMC3Results, PyMC3ADVIResults
+from bambi.results import PyMC3Results, PyMC3ADVIResults, SampleResults
 from bambi.priors import Prior
+from bambi.diagnostics import ConvergenceMonitor, RunningSummary
+from bambi.utils import replace_file
 import theano
+import theano.sparse
+try:
+    from sksparse import cholmod
+except ImportError:
+    cholmod = None
 try:
     import pymc3 as pm
+    _NDArray = pm.backends.NDArray
 except:
+    # SummaryTrace can't be used then, but has to be defined
+    _NDArray = object
     warnings.warn("PyMC3 could not be imported. You will not be able to use "
                   "PyMC3 as the back-end for your models.")
 
@@ -27,6 +48,70 @@ class BackEnd(object):
     def run(self):
         pass
 
+    def compile(self):
+        '''
+        Compile any functions needed to fit the model ahead of time. Does
+        nothing unless overridden by a subclass.
+        '''
+        pass
+
+
+class SummaryTrace(_NDArray):
+
+    '''
+    A PyMC3 NDArray trace that keeps every draw of some variables only, and
+    running summaries (mean, variance, quantiles and effective sample size;
+    see bambi.diagnostics.RunningSummary) of all the others.
+    Args:
+        summarize (list): Names of the variables to summarize.
+        skip (int): Number of initial draws (e.g., tuning draws) left out
+            of the summaries.
+        buffer_size (int): Number of draws buffered between updates of the
+            summaries.
+        kwargs (dict): Optional keyword arguments passed onto NDArray.
+    '''
+
+    def __init__(self, summarize, skip=0, buffer_size=100, **kwargs):
+        super(SummaryTrace, self).__init__(**kwargs)
+        self.all_varnames = list(self.varnames)
+        self.varnames = [v for v in self.varnames if v not in summarize]
+        self.summaries = {v: RunningSummary(self.var_shapes[v], skip=skip)
+                          for v in self.all_varnames if v in summarize}
+        self.buffer_size = buffer_size
+        self._buffer = {v: [] for v in self.summaries}
+        self._buffered = 0
+
+    def setup(self, draws, chain, *args, **kwargs):
+        # only allocate arrays for the variables kept in full
+        shapes = self.var_shapes
+        self.var_shapes = {v: shapes[v] for v in self.varnames}
+        try:
+            super(SummaryTrace, self).setup(draws, chain, *args, **kwargs)
+        finally:
+            self.var_shapes = shapes
+
+    def record(self, point, *args, **kwargs):
+        for varname, value in zip(self.all_varnames, self.fn(point)):
+            if varname in self.summaries:
+                self._buffer[varname].append(value)
+            else:
+                self.samples[varname][self.draw_idx] = value
+        self.draw_idx += 1
+        self._buffered += 1
+        if self._buffered >= self.buffer_size:
+            self._flush()
+
+    def _flush(self):
+        if self._buffered:
+            for varname, values in self._buffer.items():
+                self.summaries[varname].update(np.array(values))
+                self._buffer[varname] = []
+            self._buffered = 0
+
+    def close(self):
+        self._flush()
+        super(SummaryTrace, self).close()
+
 
 class PyMC3BackEnd(BackEnd):
 
@@ -34,6 +119,10 @@ class PyMC3BackEnd(BackEnd):
     PyMC3 model-fitting back-end.
     '''
 
+    # With noncentered='auto', random terms whose median number of
+    # observations per group is below this are sampled non-centered
+    noncentered_max_count = 10
+
     # Available link functions
     links = {
         'identity': lambda x: x,
@@ -53,6 +142,22 @@ class PyMC3BackEnd(BackEnd):
         self.mu = None
         self.dists = {}
         self.shared_params = {}
+        self.shared_data = {}
+        self.full_data = {}
+        # auxiliary variables that are internal to the parameterization
+        # (e.g., non-centered offsets), mapped to their kind
+        self.aux_vars = {}
+        self.qr = None
+        self.step = None
+        # sampler state at the end of each chain of the last MCMC run
+        self.step_states = {}
+
+    def __getstate__(self):
+        # samples belong to the results objects, not to the backend
+        state = self.__dict__.copy()
+        for k in ['trace', 'advi_params']:
+            state.pop(k, None)
+        return state
 
     def _build_dist(self, label, dist, **kwargs):
         ''' Build and return a PyMC3 Distribution. '''
@@ -72,6 +177,147 @@ class PyMC3BackEnd(BackEnd):
         kwargs = {k: _expand_args(k, v, label) for (k, v) in kwargs.items()}
         return dist(label, **kwargs)
 
+    def _noncentered(self, spec, term):
+        ''' Decide whether to sample a random term non-centered. '''
+        if not term.random or term.prior.name != 'Normal' or \
+                not isinstance(term.prior.args.get('sd'), Prior):
+            return False
+        setting = spec.noncentered if term.noncentered is None \
+            else term.noncentered
+        if setting == 'auto':
+            # number of observations contributing to each random effect
+            if term.codes is not None:
+                present = term.codes >= 0
+                if term.values is not None:
+                    present &= term.values != 0
+                counts = np.bincount(term.codes[present],
+                                     minlength=term.n_columns)
+            else:
+                arrs = term.data.values() if term.kind == 'split' \
+                    else [term.data]
+                counts = np.concatenate([(x != 0).sum(0) for x in arrs])
+            return np.median(counts) < self.noncentered_max_count
+        return bool(setting)
+
+    def _build_random(self, label, prior, n_cols, noncentered):
+        ''' Build a vector of random effects. If noncentered, standardized
+        offsets are sampled and scaled by the group SD. '''
+        if not noncentered:
+            return self._build_dist(label, prior.name, shape=n_cols,
+                                    **prior.args)
+        args = dict(prior.args)
+        mu, sd = args.pop('mu', 0), args.pop('sd')
+        # hyperpriors are labeled as in the centered parameterization
+        if isinstance(mu, Prior):
+            mu = self._build_dist('%s_mu' % label, mu.name, **mu.args)
+        sd = self._build_dist('%s_sd' % label, sd.name, **sd.args)
+        offset_label = '_%s_offset' % label
+        offset = self._build_dist(offset_label, prior.name, mu=0, sd=1,
+                                  shape=n_cols, **args)
+        self.aux_vars[offset_label] = 'offset'
+        return pm.Deterministic(label, mu + offset * sd)
+
+    def _qr_eligible(self, term):
+        # the QR basis needs fixed priors that can be evaluated directly
+        return not term.random and term.kind not in ('split', 'sparse') and \
+            not any(isinstance(v, Prior) for v in term.prior.args.values())
+
+    def _build_qr(self, terms):
+        '''
+        Build fixed effects in a centered, scaled and QR-decomposed basis.
+        Free parameters are sampled in the orthogonal basis, the coefficients
+        on the original scale are exposed as deterministics, and the term
+        priors are applied to those through potentials (the transformation is
+        linear, so this is exact). Returns the contribution to the linear
+        predictor.
+        '''
+        intercepts = [t for t in terms if t.kind == 'intercept']
+        slopes = [t for t in terms if t not in intercepts]
+
+        def _prior(t, coef):
+            dist = getattr(pm, t.prior.name).dist(**t.prior.args)
+            pm.Potential('_b_%s_prior' % t.name, dist.logp(coef).sum())
+
+        mu = 0.
+        X = np.concatenate([t.data for t in slopes], axis=1)
+        # center only if the model has an intercept to absorb the shift
+        means = X.mean(0) if intercepts else np.zeros(X.shape[1])
+        sds = X.std(0)
+        sds[sds == 0] = 1.
+        n = max(len(X) - 1, 1)
+        Q, R = np.linalg.qr((X - means) / sds)
+        Q, R = Q * n ** .5, R / n ** .5
+
+        self.qr = dict(R=R, means=means, sds=sds,
+                       slopes=[t.name for t in slopes],
+                       intercepts=[t.name for t in intercepts])
+        theta = pm.Flat('_b_qr', shape=X.shape[1])
+        self.aux_vars['_b_qr'] = 'qr'
+        beta = theano.tensor.dot(np.linalg.inv(R), theta) / sds
+        mu += pm.math.dot(self._shared('_b_qr', Q), theta)
+
+        offset = 0
+        for t in slopes:
+            n_cols = t.n_columns
+            coef = pm.Deterministic('b_' + t.name,
+                                    beta[offset:offset + n_cols])
+            _prior(t, coef)
+            offset += n_cols
+
+        for t in intercepts:
+            label = '_b_%s_centered' % t.name
+            alpha = pm.Flat(label, shape=1)
+            self.aux_vars[label] = 'qr'
+            coef = pm.Deterministic('b_' + t.name,
+                                    alpha - theano.tensor.dot(means, beta))
+            _prior(t, coef)
+            mu += alpha
+
+        return mu
+
+    def _shared(self, name, values, dtype=None):
+        ''' Wrap data in a theano shared variable, so that they can later be
+        swapped out with set_data() without rebuilding the model. Sparse
+        matrices are kept sparse (in CSR format). '''
+        if sp.issparse(values):
+            values = values.tocsr().astype(dtype or theano.config.floatX)
+            shared = theano.sparse.shared(values, name=name)
+        else:
+            values = np.asarray(values, dtype=dtype or theano.config.floatX)
+            shared = theano.shared(values, name=name)
+        self.full_data[name] = values
+        self.shared_data[name] = shared
+        return shared
+
+    def _lookup(self, term, coef, prefix='b_'):
+        ''' Index a coefficient vector by the level codes of a categorical
+        (or group-coded) term, and multiply by the term's values if it has
+        any. Rows in none of the columns (code -1; e.g., the reference level
+        under treatment coding) get a coefficient of 0. '''
+        n_cols = term.n_columns
+        name = prefix + term.name
+        codes = self._shared(name, np.where(term.codes < 0, n_cols,
+                                            term.codes), dtype='int32')
+        if (term.codes < 0).any():
+            coef = theano.tensor.concatenate(
+                [coef, theano.tensor.zeros(1, dtype=coef.dtype)])
+        coef = coef[codes]
+        if term.values is not None:
+            coef = coef * self._shared(name + '_values', term.values)
+        return coef
+
+    def set_data(self, rows=None):
+        '''
+        Restrict the data of the compiled model to a subset of rows, without
+        rebuilding or recompiling the model.
+        Args:
+            rows (array): Integer indices or boolean mask of the rows to
+                use. If None (default), the full data are restored.
+        '''
+        for name, values in self.full_data.items():
+            self.shared_data[name].set_value(
+                values if rows is None else values[rows])
+
     def build(self, spec, reset=True):
         '''
         Compile the PyMC3 model from an abstract model specification.
@@ -86,31 +332,73 @@ class PyMC3BackEnd(BackEnd):
 
         with self.model:
 
-            self.mu = 0.
+            # The linear predictor is fused into a few vector-valued parts:
+            # the dense columns of all terms are gathered into one block
+            # matrix, which is multiplied with the concatenation of their
+            # coefficients; coded terms look up their coefficients by row;
+            # and sparse terms add one sparse product each.
+            parts, blocks, coefs = [], [], []
+            terms = list(spec.terms.values())
 
-            for t in spec.terms.values():
+            if spec.qr:
+                qr_terms = [t for t in terms if self._qr_eligible(t)]
+                # needs at least one non-intercept column to decompose
+                if any(t.kind != 'intercept' for t in qr_terms):
+                    parts.append(self._build_qr(qr_terms))
+                    terms = [t for t in terms if t not in qr_terms]
+
+            for t in terms:
 
-                data = t.data
                 label = t.name
                 dist_name = t.prior.name
                 dist_args = t.prior.args
 
+                # Fixed effects
+                if not t.random:
+                    coef = self._build_dist('b_' + label, dist_name,
+                                            shape=t.n_columns, **dist_args)
+                    # look up each row's coefficient by its level code
+                    # instead of multiplying with the indicator columns
+                    if t.kind in ['categorical', 'group']:
+                        parts.append(self._lookup(t, coef))
+                    elif t.kind == 'sparse':
+                        data = self._shared('b_' + label, t.data)
+                        parts.append(theano.sparse.structured_dot(
+                            data, coef[:, None])[:, 0])
+                    else:
+                        blocks.append(t.data)
+                        coefs.append(coef)
+                    continue
+
                 # Effects w/ hyperparameters (i.e., random effects)
-                if isinstance(data, dict):
-                    for level, level_data in data.items():
-                        n_cols = level_data.shape[1]
-                        mu_label = 'u_%s_%s' % (label, level)
-                        u = self._build_dist(mu_label, dist_name,
-                                             shape=n_cols, **dist_args)
-                        self.mu += pm.math.dot(level_data, u)[:, None]
+                noncentered = self._noncentered(spec, t)
+                if t.kind == 'split':
+                    for level, level_data in t.data.items():
+                        u = self._build_random('u_%s_%s' % (label, level),
+                                               t.prior, level_data.shape[1],
+                                               noncentered)
+                        blocks.append(level_data)
+                        coefs.append(u)
                 else:
-                    prefix = 'u_' if t.random else 'b_'
-                    n_cols = data.shape[1]
-                    coef = self._build_dist(prefix + label, dist_name,
-                                            shape=n_cols, **dist_args)
-                    self.mu += pm.math.dot(data, coef)[:, None]
+                    u = self._build_random('u_' + label, t.prior,
+                                           t.n_columns, noncentered)
+                    if t.kind in ['categorical', 'group']:
+                        parts.append(self._lookup(t, u, prefix='u_'))
+                    else:
+                        blocks.append(t.data)
+                        coefs.append(u)
 
-            y = spec.y.data
+            if blocks:
+                X = self._shared('_X', np.concatenate(blocks, axis=1))
+                parts.append(pm.math.dot(X, theano.tensor.concatenate(coefs)))
+            self.mu = sum(parts[1:], parts[0]) if parts else \
+                theano.tensor.zeros(len(spec.y.data))
+
+            # 1D outcome, so that it lines up with the 1D linear predictor
+            y_data = spec.y.data
+            if y_data.shape[1] == 1:
+                y_data = y_data[:, 0]
+            y = self._shared(spec.y.name, y_data)
             y_prior = spec.family.prior
             link_f = spec.family.link
             if not callable(link_f):
@@ -122,18 +410,466 @@ class PyMC3BackEnd(BackEnd):
 
             self.spec = spec
 
+    def _set_value(self, point, name, value):
+        # set a variable in a point, on the scale of its free variable
+        var = self.model.named_vars.get(name)
+        if var is None:
+            return
+        transformed = getattr(var, 'transformed', None)
+        if transformed is not None:
+            transform = transformed.distribution.transform_used
+            point[transformed.name] = transform.forward(
+                np.asarray(value, dtype=theano.config.floatX)).eval()
+        elif name in point:
+            point[name] = np.asarray(value).reshape(np.shape(point[name]))
+
+    def _random_moments(self, mle):
+        # method-of-moments estimates for each vector of random effects:
+        # the regression of the working residuals of the MLE on each random
+        # effect's column, and the spread of those estimates as the SD
+        resid = np.asarray(mle.resid_working).ravel()
+        floor = 1e-3 * (resid.std() or 1.)
+        for t in self.spec.random_terms.values():
+            items = t.data.items() if t.kind == 'split' \
+                else [(None, t.data if t.codes is None else None)]
+            for level, data in items:
+                label = 'u_%s' % t.name if level is None \
+                    else 'u_%s_%s' % (t.name, level)
+                if data is None:
+                    # indicator or group columns, from their level codes
+                    rows = np.flatnonzero(t.codes >= 0)
+                    codes = t.codes[rows]
+                    x = np.ones(len(rows)) if t.values is None \
+                        else t.values[rows]
+                    ss = np.bincount(codes, x ** 2, t.n_columns)
+                    xr = np.bincount(codes, x * resid[rows], t.n_columns)
+                else:
+                    ss = (data ** 2).sum(0)
+                    xr = np.dot(resid, data)
+                u = xr / np.where(ss > 0, ss, 1.)
+                noncentered = '_%s_offset' % label in self.aux_vars
+                yield label, u, max(u.std(), floor), noncentered
+
+    def _mle_start(self):
+        '''
+        Map the maximum likelihood estimates of the fixed effects, computed
+        while scaling the default priors, onto the model's free variables
+        (including transformed ones, like log SDs). Random effects and their
+        SDs are set to method-of-moments estimates. Variables without an
+        estimate keep their default test values.
+        '''
+        point = self.model.test_point
+        mle = getattr(self.spec, 'mle', None)
+        if mle is None:
+            return point
+
+        # PriorScaler names the columns of its design matrix 'term[i]'
+        coefs = {}
+        for name, t in self.spec.fixed_terms.items():
+            cols = ['%s[%d]' % (name, i) for i in range(len(t.levels))]
+            if all(c in mle.params.index for c in cols):
+                coefs[name] = mle.params[cols].values
+
+        if self.qr is not None and \
+                all(t in coefs for t in self.qr['slopes']):
+            beta = np.concatenate([coefs.pop(t) for t in self.qr['slopes']])
+            point['_b_qr'] = np.dot(self.qr['R'], beta * self.qr['sds'])
+            for t in self.qr['intercepts']:
+                if t in coefs:
+                    point['_b_%s_centered' % t] = coefs.pop(t) + \
+                        np.dot(self.qr['means'], beta)
+
+        for name, values in coefs.items():
+            if 'b_' + name in point:
+                point['b_' + name] = values
+
+        for label, u, sd, noncentered in self._random_moments(mle):
+            self._set_value(point, label + '_sd', sd)
+            if noncentered:
+                point['_%s_offset' % label] = u / sd
+            elif label in point:
+                point[label] = u
+
+        # the residual SD of gaussian models
+        if self.spec.family.name == 'gaussian':
+            self._set_value(point, '%s_sd' % self.spec.y.name,
+                            min(mle.scale ** .5,
+                                self.spec.y.data.std() * (1 - 1e-3)))
+        return point
+
+    def _mle_scaling(self):
+        '''
+        Diagonal of a mass matrix (i.e., posterior variances) for the free
+        variables, in the order used by the samplers. Fixed effects use the
+        squared GLM standard errors, random effects the squared moment
+        estimates of their SDs, and log SDs the approximate sampling
+        variance of a log SD estimated from k groups, 1 / (2(k - 1)). All
+        other variables get unit variance.
+        '''
+        ordering = pm.blocking.ArrayOrdering(self.model.cont_vars)
+        scaling = np.ones(ordering.dimensions)
+        slices = {v.var: v.slc for v in ordering.vmap}
+        mle = getattr(self.spec, 'mle', None)
+        if mle is None:
+            return scaling
+
+        cov = mle.cov_params()
+        for name, t in self.spec.fixed_terms.items():
+            cols = ['%s[%d]' % (name, i) for i in range(len(t.levels))]
+            if 'b_' + name in slices and all(c in cov.index for c in cols):
+                scaling[slices['b_' + name]] = np.diag(cov.loc[cols, cols])
+
+        if self.qr is not None and '_b_qr' in slices:
+            cols = ['%s[%d]' % (name, i) for name in self.qr['slopes']
+                    for i in range(len(self.spec.terms[name].levels))]
+            if all(c in cov.index for c in cols):
+                A = self.qr['R'] * self.qr['sds']
+                scaling[slices['_b_qr']] = np.diag(
+                    np.dot(np.dot(A, cov.loc[cols, cols]), A.T))
+                for t in self.qr['intercepts']:
+                    label = '_b_%s_centered' % t
+                    if label in slices and '%s[0]' % t in cov.index:
+                        c = pd.Series(np.append(1., self.qr['means']),
+                                      index=['%s[0]' % t] + cols)
+                        scaling[slices[label]] = np.dot(
+                            np.dot(c, cov.loc[c.index, c.index]), c)
+
+        for label, u, sd, noncentered in self._random_moments(mle):
+            sd_var = self.model.named_vars.get(label + '_sd')
+            free = getattr(sd_var, 'transformed', sd_var)
+            if free is not None and free.name in slices:
+                scaling[slices[free.name]] = 1. / (2 * max(len(u) - 1, 1))
+            if label in slices and not noncentered:
+                scaling[slices[label]] = sd ** 2
+
+        return np.clip(scaling, 1e-8, None)
+
+    def _laplace(self, start, draws, **kwargs):
+        '''
+        Fit a Gaussian approximation to the posterior: find its mode,
+        starting from start, compute the Hessian of the log-posterior at
+        the mode, and draw samples from the implied multivariate normal.
+        The samples are recorded in a regular PyMC3 trace, so deterministic
+        and transformed variables are available as usual.
+        '''
+        with self.model:
+            mode = pm.find_MAP(start=start, **kwargs)
+            hess = pm.find_hessian(mode)
+        bij = pm.blocking.DictToArrayBijection(
+            pm.blocking.ArrayOrdering(self.model.cont_vars), mode)
+        # the Hessian need not be positive definite (e.g., if a variance
+        # collapses at the mode), so drop any non-positive directions
+        cov = np.linalg.pinv(hess)
+        vals, vecs = np.linalg.eigh((cov + cov.T) / 2.)
+        vals = np.clip(vals, 0, None)
+        z = np.random.normal(size=(draws, len(vals)))
+        samples = bij.map(mode) + np.dot(z * vals ** .5, vecs.T)
+
+        strace = pm.backends.NDArray(model=self.model)
+        strace.setup(draws, chain=0)
+        for x in samples:
+            strace.record(bij.rmap(x))
+        strace.close()
+        return pm.backends.base.MultiTrace([strace])
+
+    def compile(self):
+        '''
+        Compile the NUTS step method for the current model, so that it is
+        reused by run() and persisted along with the model by Model.save().
+        Runs sample with copies of it, which start out untuned.
+        Unpickled theano functions skip graph optimization, so a saved model
+        can start sampling without recompilation.
+        '''
+        if self.step is not None or self.model.disc_vars:
+            return
+        with self.model:
+            self.step = pm.NUTS()
+
+    def _fresh_step(self):
+        # A copy of the compiled step method in its initial (untuned) state.
+        # Every run samples with a fresh copy, so that the tuning of one run
+        # (or of one group in Model.fit_by()) never carries over to the next.
+        self.compile()
+        if self.step is None:
+            return None
+        step = copy.copy(self.step)
+        self._set_step_state(step, self._get_step_state(self.step))
+        return step
+
+    def _get_step_state(self, step):
+        # the adaptation state of a step method: step size, dual averaging
+        # statistics, tuning flag and mass matrix (compiled functions are
+        # left alone)
+        return {k: copy.deepcopy(v) for k, v in vars(step).items()
+                if isinstance(v, (bool, int, float, np.number, np.ndarray)) or
+                type(v).__module__.endswith('quadpotential')}
+
+    def _set_step_state(self, step, state):
+        for k, v in state.items():
+            setattr(step, k, copy.deepcopy(v))
+
+    def _chain_trace(self, samples, chain):
+        # wrap the draws of one chain in a PyMC3 NDArray trace
+        strace = pm.backends.NDArray(model=self.model)
+        strace.chain = chain
+        strace.samples = samples
+        strace.draws = strace.draw_idx = len(next(iter(samples.values())))
+        return strace
+
+    def _write_checkpoint(self, path, checkpoint):
+        # write to a temporary file first, so that a crash mid-write never
+        # leaves a corrupt checkpoint behind
+        tmp = '%s.tmp' % path
+        with open(tmp, 'wb') as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        replace_file(tmp, path)
+
+    def _advance(self, step, chain, c, n, tune, **kwargs):
+        # draw n more samples for one chain, continuing from its saved state,
+        # and return the new draws
+        self._set_step_state(step, c['step'])
+        step.tune = tune
+        # pm.sample() stops tuning after its 'tune' draws; passing it
+        # explicitly (the whole block or none of it) keeps blocks from
+        # depending on the default of the installed PyMC3
+        kwargs['tune'] = n if tune else 0
+        with self.model:
+            trace = pm.sample(n, step=step, start=c['point'], chain=chain,
+                              progressbar=False, **kwargs)
+        block = trace._straces[chain].samples
+        samples = block if c['samples'] is None else \
+            {k: np.concatenate([c['samples'][k], v]) for k, v in block.items()}
+        c.update(samples=samples, point=trace.point(-1, chain=chain),
+                 step=self._get_step_state(step))
+        return block
+
+    def _init_chains(self, chains, kwargs):
+        # the step method shared by all chains, which start out with its
+        # initial (untuned) state unless they have one already
+        step = kwargs.pop('step', None)
+        if step is None:
+            step = self._fresh_step()
+        initial = self._get_step_state(step)
+        for c in chains.values():
+            c['step'] = c['step'] or initial
+        return step
+
+    def _sample_chains(self, chains, draws, tune=0, checkpoint=None,
+                       checkpoint_every=None, **kwargs):
+        '''
+        Sample each chain in turn, in blocks of checkpoint_every draws,
+        continuing from the draws, last point and step state stored for it.
+        After every block the full state is written to the checkpoint file.
+        Args:
+            chains (dict): Maps chain numbers to dicts with keys 'samples'
+                (dict of arrays of the draws so far, or None), 'point' (the
+                point to continue from) and 'step' (a step state saved by
+                _get_step_state(), or None for a fresh step method).
+            draws (int): The total number of draws per chain, including
+                tuning draws.
+            tune (int): The number of initial draws during which the step
+                method is tuned.
+            checkpoint (str): Optional path of the checkpoint file.
+            checkpoint_every (int): Number of draws between checkpoints.
+            kwargs (dict): Optional keyword arguments passed onto the sampler.
+        Returns: A PyMC3 MultiTrace.
+        '''
+        step = self._init_chains(chains, kwargs)
+        every = checkpoint_every or draws
+        state = dict(draws=draws, tune=tune, checkpoint_every=every,
+                     varnames=sorted(self.model.named_vars), chains=chains)
+
+        for chain, c in sorted(chains.items()):
+            done = 0 if c['samples'] is None \
+                else len(next(iter(c['samples'].values())))
+            while done < draws:
+                n = min(every, draws - done)
+                # blocks never straddle the end of tuning
+                if done < tune:
+                    n = min(n, tune - done)
+                self._advance(step, chain, c, n, done < tune, **kwargs)
+                done += n
+                if checkpoint is not None:
+                    self._write_checkpoint(checkpoint, state)
+            self.step_states[chain] = c['step']
+
+        return pm.backends.base.MultiTrace(
+            [self._chain_trace(c['samples'], k) for k, c in chains.items()])
+
+    def _sample_adaptive(self, chains, tune, draws=None, target_ess=None,
+                         max_rhat=None, time_budget=None, block_size=100,
+                         names=None, checkpoint=None, **kwargs):
+        '''
+        Sample all chains in rounds of block_size draws each, until the
+        effective sample size and Gelman-Rubin statistic of every monitored
+        parameter meet their targets, the time budget is used up, or the
+        maximum number of draws is reached. The diagnostics are updated
+        incrementally after each round, from the new draws only; tuning
+        draws are not monitored.
+        Returns: A tuple of the PyMC3 MultiTrace, the reason sampling stopped
+            ('converged', 'time_budget' or 'samples'), and a DataFrame with
+            the final diagnostics of the monitored parameters.
+        '''
+        if max_rhat is not None and len(chains) < 2:
+            raise ValueError("Multiple MCMC chains (i.e., njobs > 1) are "
+                             "required in order to monitor R-hat.")
+        started = time.time()
+        step = self._init_chains(chains, kwargs)
+        monitor, labels, done = None, None, 0
+
+        while True:
+            n = block_size if done >= tune else min(block_size, tune - done)
+            if draws is not None:
+                n = min(n, tune + draws - done)
+            for chain, c in sorted(chains.items()):
+                block = self._advance(step, chain, c, n, done < tune,
+                                      **kwargs)
+                if done < tune:
+                    continue
+                if names is None:
+                    # the parameters summary() shows by default
+                    trace = pm.backends.base.MultiTrace(
+                        [self._chain_trace(block, chain)])
+                    names = PyMC3Results(self.spec, trace)._filter_names(None)
+                x = [block[v].reshape(n, -1) for v in names]
+                if monitor is None:
+                    labels = [v if b.shape[1] == 1 else '%s[%d]' % (v, i)
+                              for v, b in zip(names, x)
+                              for i in range(b.shape[1])]
+                    monitor = ConvergenceMonitor(len(labels), list(chains))
+                monitor.update(chain, np.concatenate(x, axis=1))
+            done += n
+
+            if checkpoint is not None:
+                self._write_checkpoint(checkpoint, dict(
+                    draws=done, tune=tune, checkpoint_every=block_size,
+                    varnames=sorted(self.model.named_vars), chains=chains))
+
+            reason = None
+            if monitor is not None:
+                ess, rhat = monitor.ess(), monitor.rhat()
+                if (target_ess is None or np.all(ess >= target_ess)) and \
+                        (max_rhat is None or np.all(rhat <= max_rhat)) and \
+                        (target_ess is not None or max_rhat is not None):
+                    reason = 'converged'
+                elif draws is not None and done >= tune + draws:
+                    reason = 'samples'
+            if reason is None and time_budget is not None and \
+                    time.time() - started >= time_budget:
+                reason = 'time_budget'
+            if reason is not None:
+                break
+
+        for chain, c in chains.items():
+            self.step_states[chain] = c['step']
+        trace = pm.backends.base.MultiTrace(
+            [self._chain_trace(c['samples'], k) for k, c in chains.items()])
+        if monitor is None:
+            diagnostics = pd.DataFrame(columns=['effective_n', 'gelman_rubin'])
+        else:
+            diagnostics = pd.DataFrame({'effective_n': ess,
+                                        'gelman_rubin': rhat}, index=labels,
+                                       columns=['effective_n', 'gelman_rubin'])
+        return trace, reason, diagnostics
+
+    def resume(self, checkpoint, **kwargs):
+        '''
+        Continue an MCMC run from a checkpoint file written by run(). Chains
+        pick up from their saved step state (so finished tuning is not
+        repeated), and new checkpoints are written to the same file.
+        Args:
+            checkpoint (str): Path of the checkpoint file.
+            kwargs (dict): Optional keyword arguments passed onto the sampler.
+        Returns: A PyMC3Results instance.
+        '''
+        with open(checkpoint, 'rb') as f:
+            state = pickle.load(f)
+        if state['varnames'] != sorted(self.model.named_vars):
+            raise ValueError("The checkpoint '%s' was written by a different "
+                             "model." % checkpoint)
+        self.trace = self._sample_chains(
+            state['chains'], state['draws'], state['tune'], checkpoint,
+            state['checkpoint_every'], **kwargs)
+        return PyMC3Results(self.spec, self.trace)
+
+    def extend(self, trace, n_draws, checkpoint=None, checkpoint_every=None,
+               **kwargs):
+        '''
+        Draw more samples for every chain of a trace, continuing from the last
+        point of each chain without re-tuning. Requires the tuned sampler
+        state of every chain, which run() keeps for chains it sampled
+        itself, i.e. unless they were sampled in parallel without a
+        checkpoint. Chains are extended one after the other.
+        Args:
+            trace (MultiTrace): The trace to extend.
+            n_draws (int): The number of draws to add to each chain.
+            checkpoint (str): Optional path of a checkpoint file.
+            checkpoint_every (int): Number of draws between checkpoints.
+            kwargs (dict): Optional keyword arguments passed onto the sampler.
+        Returns: A new PyMC3 MultiTrace holding the old and the new draws.
+        '''
+        missing = [c for c in trace.chains if c not in self.step_states]
+        if missing:
+            raise ValueError("No tuned sampler state is available for chains "
+                             "%s, so they can't be extended. Chains sampled "
+                             "in parallel (njobs > 1) keep their state only "
+                             "if the run is checkpointed." % missing)
+        chains = {}
+        for chain in trace.chains:
+            step = self.step_states[chain]
+            chains[chain] = dict(
+                samples={k: np.asarray(v) for k, v in
+                         trace._straces[chain].samples.items()},
+                point=trace.point(-1, chain=chain), step=step)
+        return self._sample_chains(chains, len(trace) + n_draws, 0,
+                                   checkpoint, checkpoint_every, **kwargs)
+
+    def _summarized_vars(self, store):
+        # the names of the variables a store specification summarizes
+        if isinstance(store, string_types):
+            store = {'all': store}
+        for k, v in store.items():
+            if v not in ['full', 'summary']:
+                raise ValueError("Unknown store '%s' for '%s'; must be "
+                                 "'full' or 'summary'." % (v, k))
+
+        def _group(name):
+            name = name.lstrip('_')
+            if name.startswith('b_'):
+                return 'fixed'
+            if name.startswith('u_') and \
+                    not re.search(r'_sd(_[a-z]+_)?$', name):
+                return 'random'
+            return 'other'
+
+        names = [v.name for v in self.model.unobserved_RVs]
+        return [n for n in names if store.get(
+            n, store.get(_group(n), store.get('all', 'full'))) == 'summary']
+
     def run(self, start=None, method='mcmc', init=None, n_init=10000,
-            find_map=False, **kwargs):
+            find_map=False, checkpoint=None, checkpoint_every=100,
+            store='full', **kwargs):
         '''
         Run the PyMC3 MCMC sampler.
         Args:
             start: Starting parameter values to pass to sampler; see
-                pm.sample() documentation for details.
+                pm.sample() documentation for details. If 'mle', sampling
+                starts from the maximum likelihood estimates computed while
+                scaling the default priors (plus moment estimates of the
+                random effects and their SDs), and, unless a step method or
+                init is passed, the NUTS mass matrix is seeded with the
+                corresponding estimated variances. This shortens warm-up.
             method: The method to use for fitting the model. By default,
                 'mcmc', in which case the PyMC3 sampler will be used.
                 Alternatively, 'advi', in which case the model will be fitted
                 using  automatic differentiation variational inference as
-                implemented in PyMC3.
+                implemented in PyMC3, or 'laplace', in which case the
+                posterior is approximated by a multivariate normal centered
+                at its mode, with covariance given by the inverse Hessian of
+                the log-posterior. The 'laplace' method starts from the
+                maximum likelihood estimates computed during build(), and
+                takes a 'samples' keyword giving the number of draws from
+                the approximation (defaults to 1000).
             init: Initialization method (see PyMC3 sampler documentation).
                 In PyMC3, this defaults to 'advi', but we set it to None.
             n_init: Number of initialization iterations if init = 'advi' or
@@ -141,19 +877,380 @@ class PyMC3BackEnd(BackEnd):
                 we expect to see run with bambi, so we lower it considerably.
             find_map (bool): whether or not to use the maximum a posteriori
                 estimate as a starting point; passed directly to PyMC3.
+            checkpoint (str): Optional path of a file to which the MCMC state
+                (the draws so far, and the tuned step size, mass matrix and
+                other sampler state of every chain) is saved periodically.
+                Chains are then sampled one after the other in this process
+                (njobs only sets the number of chains), and an interrupted
+                run can be continued with Model.resume().
+            checkpoint_every (int): Number of draws between checkpoints.
+            store (str, dict): Either 'full' (default), to keep every draw
+                of every variable, or 'summary', to only keep running
+                summaries (mean, SD, quantiles and effective sample size)
+                that summary() reads in place of the draws. A dict sets this
+                per variable group ('fixed', 'random' for individual random
+                effects, 'other', or 'all') or per variable name, e.g.
+                {'random': 'summary', 'u_subj': 'full'}. Summarized
+                variables are not available through get_trace() or plot(),
+                and their summaries leave out the tuning draws.
             kwargs (dict): Optional keyword arguments passed onto the sampler.
+                If any of 'target_ess', 'max_rhat' or 'time_budget' (in
+                seconds) is passed, all chains are sampled in rounds of
+                'block_size' (default: 100) draws after 'tune' (default:
+                500) tuning draws, until the minimum effective sample size
+                and maximum R-hat of the monitored parameters meet the
+                targets or the time budget is used up; 'samples' then caps
+                the number of draws per chain after tuning. Parameters are
+                selected as in summary() unless a list of 'names' is passed.
+                The results report the reason sampling stopped
+                (stop_reason) and the final diagnostics (convergence).
         Returns: A PyMC3ModelResults instance.
         '''
         if method == 'mcmc':
-            samples = kwargs.pop('samples', 1000)
+            samples = kwargs.pop('samples', None)
+            adaptive = {k: kwargs.pop(k) for k in
+                        ['target_ess', 'max_rhat', 'time_budget',
+                         'block_size', 'names'] if k in kwargs}
+            mle = isinstance(start, string_types) and start == 'mle'
+            if mle:
+                start = self._mle_start()
             with self.model:
                 if start is None and find_map:
                     start = pm.find_MAP()
-                self.trace = pm.sample(samples, start=start, init=init,
-                                       n_init=n_init, **kwargs)
+                if init is None and 'step' not in kwargs:
+                    step = self._fresh_step()
+                    if step is not None:
+                        # NUTS compiles its mass matrix into its functions,
+                        # so the MLE scaling needs a step method of its own
+                        if mle:
+                            step = pm.NUTS(scaling=self._mle_scaling(),
+                                           is_cov=True)
+                        kwargs['step'] = step
+                self.step_states = {}
+                summarized = self._summarized_vars(store)
+                if summarized and (adaptive or checkpoint is not None):
+                    raise ValueError("Summarized variables can't be combined "
+                                     "with checkpoints or adaptive sampling.")
+                elif summarized:
+                    kwargs['trace'] = SummaryTrace(
+                        summarized, skip=kwargs.get('tune') or 0,
+                        model=self.model)
+                if adaptive or checkpoint is not None:
+                    n_chains = kwargs.pop('njobs', 1)
+                    chain = kwargs.pop('chain', 0)
+                    starts = start if isinstance(start, list) \
+                        else [start] * n_chains
+                    chains = {chain + i: dict(
+                        samples=None, step=None,
+                        point=starts[i] or self.model.test_point)
+                        for i in range(n_chains)}
+                    tune = kwargs.pop('tune', None)
+                if adaptive:
+                    self.trace, reason, diagnostics = self._sample_adaptive(
+                        chains, 500 if tune is None else tune, samples,
+                        checkpoint=checkpoint, **dict(kwargs, **adaptive))
+                    results = PyMC3Results(self.spec, self.trace)
+                    results.stop_reason = reason
+                    results.convergence = diagnostics
+                    if reason != 'converged' and \
+                            ('target_ess' in adaptive or
+                             'max_rhat' in adaptive):
+                        warnings.warn("Sampling stopped before reaching the "
+                                      "convergence targets (reason: '%s')."
+                                      % reason)
+                    return results
+                elif checkpoint is not None:
+                    samples = samples or 1000
+                    # as in pm.sample(), tune=None tunes throughout
+                    self.trace = self._sample_chains(
+                        chains, samples, samples if tune is None else tune,
+                        checkpoint, checkpoint_every, **kwargs)
+                else:
+                    self.trace = pm.sample(samples or 1000, start=start,
+                                           init=init, n_init=n_init, **kwargs)
+                    # a step method only keeps its tuning if it ran here
+                    step = kwargs.get('step')
+                    if step is not None and kwargs.get('njobs', 1) == 1:
+                        self.step_states[self.trace.chains[-1]] = \
+                            self._get_step_state(step)
+            return PyMC3Results(self.spec, self.trace)
+
+        elif method == 'laplace':
+            samples = kwargs.pop('samples', 1000)
+            if start is None or start == 'mle':
+                start = self._mle_start()
+            self.trace = self._laplace(start, samples, **kwargs)
             return PyMC3Results(self.spec, self.trace)
 
         elif method == 'advi':
             with self.model:
                 self.advi_params = pm.variational.advi(start, **kwargs)
             return PyMC3ADVIResults(self.spec, self.advi_params)
+
+
+class GibbsBackEnd(BackEnd):
+
+    '''
+    Blocked Gibbs sampler for gaussian models with an identity link, using
+    only NumPy and SciPy (no compilation). Supports Normal priors with fixed
+    parameters on the fixed effects, and Normal random effects whose SDs
+    (like the residual SD) have HalfNormal, HalfCauchy or Uniform priors.
+    Each iteration draws all fixed and random coefficients jointly from
+    their conditional multivariate normal distribution, using a sparse
+    Cholesky factorization if scikit-sparse is installed (and otherwise a
+    sparse LDL' factorization by SciPy's SuperLU), and then updates each SD
+    by slice sampling on the log scale. Only the cross-products of the
+    design matrix are used while sampling, so the cost per draw does not
+    grow with the number of rows.
+    '''
+
+    # Log densities (up to a constant) of the supported priors on SDs
+    sd_priors = {
+        'HalfNormal': lambda x, a: -.5 * (x / a.get('sd', 1.)) ** 2,
+        'HalfCauchy': lambda x, a: -np.log1p((x / a.get('beta', 1.)) ** 2),
+        'Uniform': lambda x, a: 0. if a.get('lower', 0.) <= x <=
+            a.get('upper', 1.) else -np.inf
+    }
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        '''
+        Reset the back-end and all precomputed quantities.
+        '''
+        self.spec = None
+        # (variable name, column slice, SD prior or None) per coefficient
+        # block; the SD prior is only set for random effects
+        self.blocks = []
+        self.samples = None
+        # CHOLMOD factor, or fill-reducing ordering for SuperLU, of the
+        # precision matrix of the coefficients (see _draw_coefs)
+        self._factor = None
+
+    def _design(self, term):
+        # the term's design matrix (or, for split terms, one per level)
+        if term.kind == 'split':
+            return [('u_%s_%s' % (term.name, level), sp.csc_matrix(x))
+                    for level, x in term.data.items()]
+        if term.kind == 'intercept':
+            X = sp.csc_matrix(np.ones((term.n_rows, 1)))
+        elif term.codes is not None:
+            rows = np.flatnonzero(term.codes >= 0)
+            values = np.ones(len(rows)) if term.values is None \
+                else term.values[rows]
+            X = sp.csc_matrix((values, (rows, term.codes[rows])),
+                              shape=(term.n_rows, term.n_columns))
+        else:
+            X = sp.csc_matrix(term.data)
+        return [(('u_' if term.random else 'b_') + term.name, X)]
+
+    def _fixed_args(self, prior, names, n):
+        # the values of fixed (i.e., non-hyperprior) prior parameters
+        args = [prior.args.get(k, 0.) for k in names]
+        if any(isinstance(a, Prior) for a in args):
+            return None
+        return [np.broadcast_to(np.ravel(np.asarray(a, dtype=float)), n)
+                for a in args]
+
+    def _sd_prior(self, prior, label):
+        sd = prior.args.get('sd') if prior is not None else None
+        if not isinstance(sd, Prior) or sd.name not in self.sd_priors or \
+                any(isinstance(v, Prior) for v in sd.args.values()):
+            raise ValueError("The Gibbs back-end needs a HalfNormal, "
+                             "HalfCauchy or Uniform prior with fixed "
+                             "parameters on the SD of '%s'." % label)
+        return sd
+
+    def build(self, spec, reset=True):
+        '''
+        Precompute the cross-products of the design matrix and outcome, and
+        the prior means and precisions of the coefficients.
+        Args:
+            spec (Model): A bambi Model instance containing the abstract
+                specification of the model to fit.
+            reset (bool): if True (default), resets the GibbsBackEnd
+                instance first.
+        '''
+        if reset:
+            self.reset()
+        if spec.family.name != 'gaussian' or spec.family.link != 'identity':
+            raise ValueError("The Gibbs back-end only supports gaussian "
+                             "models with an identity link.")
+
+        mats, means, sds = [], [], []
+        offset = 0
+        for t in spec.terms.values():
+            if t.random:
+                self._sd_prior(t.prior, t.name)
+            args = self._fixed_args(t.prior, ['mu', 'sd'] if not t.random
+                                    else ['mu'], t.n_columns)
+            if t.prior.name != 'Normal' or args is None:
+                raise ValueError("The Gibbs back-end needs Normal priors "
+                                 "with fixed parameters on the coefficients "
+                                 "of term '%s'." % t.name)
+            for name, X in self._design(t):
+                n = X.shape[1]
+                self.blocks.append((name, slice(offset, offset + n),
+                                    t.prior.args['sd'] if t.random else None))
+                mats.append(X)
+                # random effects of split terms share the term's prior mean
+                means.append(args[0][:n] if t.kind == 'split' else args[0])
+                sds.append(np.ones(n) if t.random else args[1])
+                offset += n
+
+        y = spec.y.data[:, 0].astype(float)
+        W = sp.hstack(mats, format='csc') if mats \
+            else sp.csc_matrix((len(y), 0))
+        self.WtW = (W.T * W).tocsc()
+        self.Wty = W.T * y
+        self.yty = np.dot(y, y)
+        self.n = len(y)
+        self.prior_mean = np.concatenate(means) if means else np.zeros(0)
+        # fixed effects have fixed prior precisions; those of random effects
+        # are set from the current group SDs
+        self.prior_prec = 1. / np.concatenate(sds) ** 2 if sds \
+            else np.zeros(0)
+        self.y_name = spec.y.name
+        self.y_sd_prior = self._sd_prior(spec.y.prior, spec.y.name)
+        self.y_sd_start = min(y.std(), self._sd_start(self.y_sd_prior))
+        self.spec = spec
+
+    def _draw_coefs(self, rng, sigma, taus):
+        prec = self.prior_prec.copy()
+        for (name, cols, sd_prior), tau in zip(self._random_blocks(), taus):
+            prec[cols] = tau ** -2
+        P = (self.WtW / sigma ** 2 + sp.diags(prec)).tocsc()
+        rhs = self.Wty / sigma ** 2 + prec * self.prior_mean
+        z = rng.standard_normal(len(rhs))
+        if cholmod is None:
+            return self._draw_superlu(P, rhs, z)
+        # the sparsity pattern is fixed, so it is only analyzed once
+        if self._factor is None:
+            self._factor = cholmod.analyze(P)
+        self._factor.cholesky_inplace(P)
+        f = self._factor
+        return f(rhs) + f.apply_Pt(f.solve_Lt(z, use_LDLt_decomposition=False))
+
+    def _draw_superlu(self, P, rhs, z):
+        # A draw from N(P^-1 rhs, P^-1) using a sparse LU factorization
+        # without pivoting, which for the positive definite P is LDL' (with
+        # U = DL'): then L^-T D^-1/2 z = U^-1 D^1/2 z = P^-1 L D^1/2 z. The
+        # fill-reducing ordering only depends on the sparsity pattern, which
+        # is fixed, so it is computed once.
+        if self._factor is None:
+            self._factor = reverse_cuthill_mckee(P.tocsr(),
+                                                 symmetric_mode=True)
+        order = self._factor
+        lu = splinalg.splu(P[order][:, order].tocsc(), permc_spec='NATURAL',
+                           diag_pivot_thresh=0.,
+                           options=dict(SymmetricMode=True))
+        d = lu.U.diagonal()
+        identity = np.arange(len(d))
+        if (lu.perm_r != identity).any() or (lu.perm_c != identity).any() \
+                or not (d > 0).all():
+            raise ValueError("The precision matrix of the coefficients is "
+                             "not positive definite.")
+        x = np.empty(len(d))
+        x[order] = lu.solve(rhs[order] + lu.L.dot(np.sqrt(d) * z))
+        return x
+
+    def _random_blocks(self):
+        return [b for b in self.blocks if b[2] is not None]
+
+    def _slice(self, rng, logp, x, width=1., max_steps=32):
+        # univariate slice sampler with stepping out (Neal, 2003)
+        level = logp(x) - rng.exponential()
+        lo = x - width * rng.uniform()
+        hi = lo + width
+        j = rng.randint(max_steps)
+        k = max_steps - 1 - j
+        while j > 0 and logp(lo) > level:
+            lo -= width
+            j -= 1
+        while k > 0 and logp(hi) > level:
+            hi += width
+            k -= 1
+        while True:
+            x1 = rng.uniform(lo, hi)
+            if logp(x1) > level:
+                return x1
+            if x1 < x:
+                lo = x1
+            else:
+                hi = x1
+
+    def _sd_start(self, prior):
+        # the scale of an SD prior
+        if prior.name == 'Uniform':
+            return (prior.args.get('lower', 0.) + prior.args['upper']) / 2.
+        return prior.args.get('sd', prior.args.get('beta', 1.))
+
+    def _draw_sd(self, rng, sd, prior, n, ss):
+        # SD of n normal deviates with sum of squares ss, sampled on the log
+        # scale (hence the Jacobian term s)
+        density = self.sd_priors[prior.name]
+
+        def logp(s):
+            x = np.exp(s)
+            return -n * s - ss / (2 * x ** 2) + density(x, prior.args) + s
+        return np.exp(self._slice(rng, logp, np.log(sd)))
+
+    def run(self, samples=1000, tune=0, chains=None, njobs=1, start=None,
+            random_seed=None, **kwargs):
+        '''
+        Run the Gibbs sampler.
+        Args:
+            samples (int): The number of draws to keep per chain.
+            tune (int): The number of initial draws to discard per chain.
+            chains (int): The number of chains, which are run one after
+                another. Defaults to njobs.
+            njobs (int): Alias of chains, for compatibility with the PyMC3
+                back-end.
+            start (dict): Optional starting values of the SDs, keyed by
+                variable name (e.g., 'Y_sd', 'u_1|subj_sd'). The
+                coefficients are drawn first, so they need no starting
+                values.
+            random_seed (int): Optional seed of the random number generator.
+        Returns: A SampleResults instance.
+        '''
+        if kwargs:
+            warnings.warn("Arguments %s are not used by the Gibbs back-end."
+                          % sorted(kwargs))
+        rng = np.random.RandomState(random_seed)
+        chains = chains or njobs
+        start = start or {}
+        random_blocks = self._random_blocks()
+        sd_names = [name + '_sd' for name, _, _ in random_blocks]
+
+        names = [b[0] for b in self.blocks] + sd_names + \
+            ['%s_sd' % self.y_name]
+        shapes = [(b[1].stop - b[1].start,) for b in self.blocks] + \
+            [()] * (len(sd_names) + 1)
+        draws = OrderedDict((name, np.empty((chains, samples) + shape))
+                            for name, shape in zip(names, shapes))
+
+        for chain in range(chains):
+            sigma = start.get('%s_sd' % self.y_name, self.y_sd_start)
+            taus = [start.get(name, self._sd_start(prior))
+                    for name, (_, _, prior) in zip(sd_names, random_blocks)]
+            for i in range(tune + samples):
+                theta = self._draw_coefs(rng, sigma, taus)
+                for j, (name, cols, prior) in enumerate(random_blocks):
+                    dev = theta[cols] - self.prior_mean[cols]
+                    taus[j] = self._draw_sd(rng, taus[j], prior, len(dev),
+                                            np.dot(dev, dev))
+                # residual sum of squares, from the cross-products only
+                ss = self.yty - 2 * np.dot(theta, self.Wty) + \
+                    np.dot(theta, self.WtW * theta)
+                sigma = self._draw_sd(rng, sigma, self.y_sd_prior, self.n,
+                                      max(ss, 0.))
+                if i < tune:
+                    continue
+                values = [theta[cols] for _, cols, _ in self.blocks] + \
+                    taus + [sigma]
+                for name, value in zip(names, values):
+                    draws[name][chain, i - tune] = value
+
+        self.samples = draws
+        return SampleResults(self.spec, draws)
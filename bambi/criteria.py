@@ -0,0 +1,302 @@
+'''
+Information criteria (WAIC and PSIS-LOO) computed from posterior draws.
+The pointwise log-likelihood (draws x observations) is evaluated with NumPy
+one chunk of rows at a time and reduced on the fly, so the full matrix is
+never held in memory unless it is explicitly requested.
+'''
+import warnings
+import numpy as np
+import pandas as pd
+from scipy.special import gammaln, logsumexp
+from bambi.priors import Prior
+from bambi.utils import links
+
+
+def _normal(y, mu, sd=1., **kwargs):
+    return -.5 * np.log(2 * np.pi) - np.log(sd) - (y - mu) ** 2 / (2 * sd ** 2)
+
+
+def _bernoulli(y, p, **kwargs):
+    return np.where(y > .5, np.log(p), np.log1p(-p))
+
+
+def _poisson(y, mu, **kwargs):
+    return y * np.log(mu) - mu - gammaln(y + 1)
+
+
+def _student_t(y, mu, nu=1., lam=1., sd=None, **kwargs):
+    if sd is not None:
+        lam = sd ** -2.
+    return gammaln((nu + 1) / 2.) - gammaln(nu / 2.) + \
+        .5 * np.log(lam / (nu * np.pi)) - \
+        (nu + 1) / 2. * np.log1p(lam * (y - mu) ** 2 / nu)
+
+
+# Log densities of the outcome distributions, by PyMC3 distribution name
+densities = {
+    'Normal': _normal,
+    'Bernoulli': _bernoulli,
+    'Poisson': _poisson,
+    'StudentT': _student_t
+}
+
+
+def _draws(results, var, burn_in):
+    # all draws of a variable, chains stacked, as (n_draws, size)
+    if var in results.summaries:
+        raise ValueError("Only running summaries of '%s' were kept while "
+                         "sampling (store='summary'); the log-likelihood "
+                         "needs its draws." % var)
+    return np.concatenate([
+        results._chain_values(var, c, burn_in).reshape(
+            max(results._chain_length(c) - burn_in, 0), -1)
+        for c in results.chains])
+
+
+def _coefficients(results, burn_in):
+    # (term, rows -> design block, draws) for every coefficient block
+    blocks = []
+    for name, t in results.model.terms.items():
+        prefix = 'u_' if t.random else 'b_'
+        if t.kind == 'split':
+            for level, data in t.data.items():
+                blocks.append((t, data, _draws(
+                    results, 'u_%s_%s' % (name, level), burn_in)))
+        else:
+            blocks.append((t, None, _draws(results, prefix + name, burn_in)))
+    return blocks
+
+
+def _linear_predictor(blocks, rows, n_draws):
+    eta = np.zeros((n_draws, rows.stop - rows.start))
+    for t, data, coef in blocks:
+        if data is not None:
+            eta += np.dot(coef, data[rows].T)
+        elif t.kind == 'intercept':
+            eta += coef[:, :1]
+        elif t.codes is not None:
+            # rows in none of the columns (code -1) get a coefficient of 0
+            codes = t.codes[rows]
+            coef = np.concatenate([coef, np.zeros((len(coef), 1))], axis=1)
+            eta += coef[:, codes] if t.values is None \
+                else coef[:, codes] * t.values[rows]
+        elif t.kind == 'sparse':
+            eta += (t.data[rows] * coef.T).T
+        else:
+            eta += np.dot(coef, t.data[rows].T)
+    return eta
+
+
+def pointwise_log_likelihood(results, burn_in=0, chunk_size=1000):
+    '''
+    Evaluate the log-likelihood of every observation under every draw, one
+    chunk of rows at a time.
+    Args:
+        results (ModelResults): The fitted model's results.
+        burn_in (int): Number of initial draws to exclude from each chain.
+        chunk_size (int): Number of rows per chunk.
+    Returns: A generator of (rows, values) tuples, where rows is a slice of
+        the model's rows and values an array of shape (n_draws, n_rows).
+    '''
+    model = results.model
+    y = model.y.data[:, 0].astype(float)
+    prior = model.y.prior
+    if prior.name not in densities:
+        raise ValueError("The log-likelihood of the '%s' distribution is not "
+                         "implemented." % prior.name)
+    link = model.family.link
+    if not callable(link):
+        link = links[link]
+
+    blocks = _coefficients(results, burn_in)
+    n_draws = len(blocks[0][2]) if blocks else \
+        sum(max(results._chain_length(c) - burn_in, 0)
+            for c in results.chains)
+    # the outcome's other parameters: either sampled or fixed
+    params = {}
+    for k, v in prior.args.items():
+        if k in ['observed', model.family.parent]:
+            continue
+        if isinstance(v, Prior):
+            params[k] = _draws(results, '%s_%s' % (model.y.name, k),
+                               burn_in)[:, :1]
+        else:
+            params[k] = v
+
+    for start in range(0, len(y), chunk_size):
+        rows = slice(start, min(start + chunk_size, len(y)))
+        params[model.family.parent] = link(
+            _linear_predictor(blocks, rows, n_draws))
+        yield rows, densities[prior.name](y[rows], **params)
+
+
+def log_likelihood(results, burn_in=0, chunk_size=1000):
+    '''
+    The full pointwise log-likelihood matrix, of shape (n_draws, n_rows).
+    Args: See pointwise_log_likelihood().
+    '''
+    return np.concatenate([ll for _, ll in pointwise_log_likelihood(
+        results, burn_in, chunk_size)], axis=1)
+
+
+def _gpdfit(x, prior_bs=3, prior_k=10):
+    '''
+    Estimate the parameters of a generalized Pareto distribution with
+    location 0 from the columns of x, which are sorted in ascending order
+    (Zhang & Stephens, 2009, with the weakly informative prior on k of
+    Vehtari et al., 2017). Returns arrays of the shape k and scale sigma.
+    '''
+    n = len(x)
+    m = 30 + int(n ** .5)
+    b = 1 - np.sqrt(m / (np.arange(1, m + 1) - .5))
+    b = b[:, None] / (prior_bs * x[int(n / 4. + .5) - 1]) + 1 / x[-1]
+    k = np.log1p(-b[:, None, :] * x[None]).mean(1)
+    L = n * (np.log(-b / k) - k - 1)
+    w = np.exp(L - logsumexp(L, axis=0))
+    b_post = (b * w).sum(0)
+    k_post = np.log1p(-b_post * x).mean(0)
+    sigma = -k_post / b_post
+    return (n * k_post + prior_k * .5) / (n + prior_k), sigma
+
+
+def _gpinv(p, k, sigma):
+    # quantile function of the generalized Pareto distribution
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = sigma * np.expm1(-k * np.log1p(-p)) / k
+    return np.where(np.abs(k) < 1e-10, -sigma * np.log1p(-p), q)
+
+
+def psis(log_ratios):
+    '''
+    Pareto-smoothed importance sampling (Vehtari, Gelman & Gabry, 2017).
+    The largest importance ratios of each column are replaced by the
+    expected order statistics of a generalized Pareto distribution fitted
+    to them.
+    Args:
+        log_ratios (array): Log importance ratios, of shape
+            (n_draws, n_columns).
+    Returns: The normalized log weights (same shape), and the estimated
+        Pareto shape k of each column.
+    '''
+    lw = log_ratios - log_ratios.max(0)
+    S, n_cols = lw.shape
+    M = int(np.ceil(min(.2 * S, 3 * np.sqrt(S))))
+    k = np.zeros(n_cols)
+    if M >= 5:
+        order = np.argsort(lw, axis=0)
+        cols = np.arange(n_cols)
+        tail_idx = order[-M:]
+        cutoff = np.exp(lw[order[-M - 1], cols])
+        tail = np.exp(lw[tail_idx, cols]) - cutoff
+        # columns with a degenerate tail need no smoothing
+        ok = tail[-1] > 0
+        if ok.any():
+            k_ok, sigma = _gpdfit(tail[:, ok])
+            smoothed = np.log(_gpinv(((np.arange(M) + .5) / M)[:, None],
+                                     k_ok, sigma) + cutoff[ok])
+            fit = np.isfinite(k_ok)
+            k[ok] = k_ok
+            ok[ok] = fit
+            # the smoothed weights are truncated at the largest raw weight
+            lw[tail_idx[:, ok], cols[ok]] = np.minimum(smoothed[:, fit], 0)
+    return lw - logsumexp(lw, axis=0), k
+
+
+def waic(results, burn_in=0, chunk_size=1000, pointwise=False):
+    '''
+    The widely applicable information criterion (Watanabe, 2010).
+    Args:
+        results (ModelResults): The fitted model's results.
+        burn_in (int): Number of initial draws to exclude from each chain.
+        chunk_size (int): Number of rows whose log-likelihood is evaluated
+            at a time.
+        pointwise (bool): If True, also return the per-observation values.
+    Returns: A Series with the WAIC (on the deviance scale), its standard
+        error and the effective number of parameters; if pointwise is True,
+        a tuple of the Series and a DataFrame of the per-observation
+        values.
+    '''
+    lppd, p = [], []
+    for _, ll in pointwise_log_likelihood(results, burn_in, chunk_size):
+        lppd.append(logsumexp(ll, axis=0) - np.log(len(ll)))
+        p.append(ll.var(0, ddof=1))
+    lppd, p = np.concatenate(lppd), np.concatenate(p)
+    values = -2 * (lppd - p)
+    if (p > .4).any():
+        warnings.warn("For one or more observations the posterior variance "
+                      "of the log-likelihood exceeds 0.4; WAIC may be "
+                      "unreliable. Consider using loo() instead.")
+    out = pd.Series([values.sum(), (len(values) * values.var()) ** .5,
+                     p.sum()], index=['waic', 'waic_se', 'p_waic'])
+    if pointwise:
+        return out, pd.DataFrame({'waic': values, 'p_waic': p})
+    return out
+
+
+def loo(results, burn_in=0, chunk_size=1000, pointwise=False):
+    '''
+    Leave-one-out cross-validation, estimated by Pareto-smoothed importance
+    sampling (Vehtari, Gelman & Gabry, 2017).
+    Args: See waic().
+    Returns: A Series with the LOO information criterion (on the deviance
+        scale), its standard error, the effective number of parameters and
+        the largest estimated Pareto shape k; if pointwise is True, a tuple
+        of the Series and a DataFrame of the per-observation values
+        (including each observation's k).
+    '''
+    elpd, lppd, ks = [], [], []
+    for _, ll in pointwise_log_likelihood(results, burn_in, chunk_size):
+        lw, k = psis(-ll)
+        elpd.append(logsumexp(lw + ll, axis=0))
+        lppd.append(logsumexp(ll, axis=0) - np.log(len(ll)))
+        ks.append(k)
+    elpd, lppd, ks = np.concatenate(elpd), np.concatenate(lppd), \
+        np.concatenate(ks)
+    values = -2 * elpd
+    if (ks > .7).any():
+        warnings.warn("Estimated Pareto shape k exceeds 0.7 for %d "
+                      "observation(s); the LOO estimate may be unreliable."
+                      % (ks > .7).sum())
+    out = pd.Series([values.sum(), (len(values) * values.var()) ** .5,
+                     (lppd - elpd).sum(), ks.max()],
+                    index=['loo', 'loo_se', 'p_loo', 'k_max'])
+    if pointwise:
+        return out, pd.DataFrame({'loo': values, 'p_loo': lppd - elpd,
+                                  'k': ks})
+    return out
+
+
+def compare(results, ic='waic', burn_in=0, chunk_size=1000):
+    '''
+    Rank several fitted models by an information criterion.
+    Args:
+        results (dict, list): The ModelResults to compare. If a dict, its
+            keys are used to label the models; otherwise they are labeled
+            by position.
+        ic (str): Either 'waic' (default) or 'loo'.
+        burn_in, chunk_size: See waic().
+    Returns: A DataFrame with one row per model, sorted from best to worst,
+        with the criterion, its standard error, the effective number of
+        parameters, the difference to the best model ('d_ic') and its
+        standard error ('d_se'), and Akaike-type weights.
+    '''
+    if ic not in ['waic', 'loo']:
+        raise ValueError("ic must be either 'waic' or 'loo'.")
+    if not isinstance(results, dict):
+        results = dict(enumerate(results))
+    fn = waic if ic == 'waic' else loo
+    stats, points = {}, {}
+    for key, res in results.items():
+        stats[key], pw = fn(res, burn_in, chunk_size, pointwise=True)
+        points[key] = pw[ic].values
+    df = pd.DataFrame(stats).T[[ic, ic + '_se', 'p_' + ic]]
+    df = df.sort_values(ic)
+    best = points[df.index[0]]
+    if any(len(points[k]) != len(best) for k in df.index):
+        raise ValueError("All models must be fitted to the same rows.")
+    df['d_ic'] = df[ic] - df[ic].iloc[0]
+    df['d_se'] = [(len(best) * (points[k] - best).var()) ** .5
+                  for k in df.index]
+    w = np.exp(-.5 * df['d_ic'])
+    df['weight'] = w / w.sum()
+    return df
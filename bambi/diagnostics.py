@@ -0,0 +1,288 @@
+'''
+Running summaries of MCMC draws. Each accumulator is updated one block of
+draws at a time and keeps a bounded amount of state, so that convergence
+can be monitored while sampling without holding on to the draws.
+'''
+import numpy as np
+
+
+class Welford(object):
+
+    '''
+    Running mean and variance of a stream of vectors (Welford's algorithm,
+    generalized to update with a block of vectors at a time).
+    Args:
+        size (int): Length of the vectors.
+    '''
+
+    def __init__(self, size):
+        self.n = 0
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros(size)
+
+    def update(self, x):
+        '''
+        Args:
+            x (array): A block of draws, of shape (n_draws, size).
+        '''
+        x = np.asarray(x, dtype=float).reshape(-1, len(self.mean))
+        n = len(x)
+        if not n:
+            return
+        mean = x.mean(0)
+        delta = mean - self.mean
+        total = self.n + n
+        self.m2 = self.m2 + ((x - mean) ** 2).sum(0) + \
+            delta ** 2 * self.n * n / total
+        self.mean = self.mean + delta * n / total
+        self.n = total
+
+    @property
+    def var(self):
+        ''' The sample variance of the draws so far. '''
+        return self.m2 / max(self.n - 1, 1)
+
+
+class BatchMeans(object):
+
+    '''
+    Running batch-means estimate of the effective sample size of a single
+    chain. The means of consecutive batches of draws are kept; whenever
+    there are more than 2 * max_batches of them, adjacent batches are merged
+    and the batch size doubles, so memory stays bounded.
+    Args:
+        size (int): Number of parameters (columns) per draw.
+        batch_size (int): The initial number of draws per batch.
+        max_batches (int): Bound on the number of batch means kept.
+    '''
+
+    def __init__(self, size, batch_size=10, max_batches=512):
+        self.moments = Welford(size)
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.means = np.zeros((0, size))
+        self._partial = np.zeros((0, size))
+
+    def update(self, x):
+        '''
+        Args:
+            x (array): A block of draws, of shape (n_draws, size).
+        '''
+        x = np.asarray(x, dtype=float).reshape(-1, self.means.shape[1])
+        self.moments.update(x)
+        x = np.concatenate([self._partial, x])
+        k = len(x) // self.batch_size
+        full = x[:k * self.batch_size].reshape(k, self.batch_size,
+                                               x.shape[1])
+        self.means = np.concatenate([self.means, full.mean(1)])
+        self._partial = x[k * self.batch_size:]
+        while len(self.means) > 2 * self.max_batches:
+            # fold in any leftover batch, so that batches stay contiguous
+            k = len(self.means) // 2
+            partial = np.repeat(self.means[2 * k:], self.batch_size, 0)
+            self.means = self.means[:2 * k].reshape(k, 2, -1).mean(1)
+            self.batch_size *= 2
+            self._partial = np.concatenate([partial, self._partial])
+
+    @property
+    def n(self):
+        return self.moments.n
+
+    def ess(self):
+        '''
+        The effective sample size of each parameter, estimated from the
+        variance of the means of about sqrt(n_batches) batches of
+        sqrt(n_batches) stored batches each. NaN until there are at least
+        four stored batches.
+        '''
+        k = len(self.means)
+        if k < 4:
+            return np.full(self.means.shape[1], np.nan)
+        m = int(np.sqrt(k))
+        a = k // m
+        means = self.means[:a * m].reshape(a, m, -1).mean(1)
+        var_means = means.var(0, ddof=1)
+        var = self.moments.var
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ess = self.n * var / (m * self.batch_size * var_means)
+        # constant parameters carry no information about mixing
+        return np.where(var_means > 0, ess, self.n)
+
+
+def gelman_rubin(moments):
+    '''
+    The Gelman-Rubin statistic of each parameter, from the running moments
+    of several chains. NaN unless there are at least two chains with the
+    same number of draws.
+    Args:
+        moments (list): Welford instances, one per chain.
+    '''
+    n = moments[0].n
+    if len(moments) < 2 or n < 2 or any(m.n != n for m in moments):
+        return np.full(len(moments[0].mean), np.nan)
+    W = np.mean([m.var for m in moments], 0)
+    B = np.var([m.mean for m in moments], 0, ddof=1) * n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rhat = np.sqrt(((n - 1.) / n * W + B / n) / W)
+    return np.where(W > 0, rhat, 1.)
+
+
+class ConvergenceMonitor(object):
+
+    '''
+    Running effective sample sizes and Gelman-Rubin statistics of the draws
+    of several chains, updated one block of draws at a time.
+    Args:
+        size (int): Number of parameters (columns) per draw.
+        chains (list): The chain identifiers.
+        kwargs (dict): Optional keyword arguments passed onto BatchMeans.
+    '''
+
+    def __init__(self, size, chains, **kwargs):
+        self.chains = {c: BatchMeans(size, **kwargs) for c in chains}
+
+    def update(self, chain, x):
+        '''
+        Args:
+            chain: The identifier of the chain the draws belong to.
+            x (array): A block of draws, of shape (n_draws, size).
+        '''
+        self.chains[chain].update(x)
+
+    def ess(self):
+        ''' The effective sample size of each parameter, over all chains. '''
+        return np.sum([c.ess() for c in self.chains.values()], 0)
+
+    def rhat(self):
+        ''' The Gelman-Rubin statistic of each parameter. '''
+        return gelman_rubin([c.moments for c in self.chains.values()])
+
+
+class P2Quantile(object):
+
+    '''
+    Running estimate of a quantile of each element of a stream of vectors,
+    using the P-square algorithm (Jain & Chlamtac, 1985), which tracks five
+    markers per element instead of storing the draws.
+    Args:
+        size (int): Length of the vectors.
+        p (float): The probability of the quantile to track.
+    '''
+
+    def __init__(self, size, p):
+        self.size = size
+        self.p = p
+        self.q = None
+        self._first = []
+        self.desired = np.array([0, 2 * p, 4 * p, 2 + 2 * p, 4])[:, None]
+        self.increments = np.array([0, p / 2, p, (1 + p) / 2, 1])[:, None]
+
+    def update(self, x):
+        '''
+        Args:
+            x (array): A block of draws, of shape (n_draws, size).
+        '''
+        for row in np.asarray(x, dtype=float).reshape(-1, self.size):
+            if self.q is None:
+                self._first.append(row)
+                if len(self._first) == 5:
+                    self.q = np.sort(self._first, 0)
+                    self.pos = np.repeat(np.arange(5.)[:, None], self.size, 1)
+                continue
+            self._step(row)
+
+    def _step(self, x):
+        q, pos = self.q, self.pos
+        q[0] = np.minimum(q[0], x)
+        q[4] = np.maximum(q[4], x)
+        # the markers above the cell x falls into move up by one
+        cell = (x >= q[1:4]).sum(0)
+        pos += np.arange(5)[:, None] > cell
+        self.desired = self.desired + self.increments
+        cols = np.arange(self.size)
+        for i in (1, 2, 3):
+            d = self.desired[i] - pos[i]
+            move = ((d >= 1) & (pos[i + 1] - pos[i] > 1)) | \
+                ((d <= -1) & (pos[i - 1] - pos[i] < -1))
+            if not move.any():
+                continue
+            s = np.sign(d)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                # piecewise-parabolic prediction, or linear if that one
+                # would not keep the markers in order
+                parabolic = q[i] + s / (pos[i + 1] - pos[i - 1]) * (
+                    (pos[i] - pos[i - 1] + s) * (q[i + 1] - q[i]) /
+                    (pos[i + 1] - pos[i]) +
+                    (pos[i + 1] - pos[i] - s) * (q[i] - q[i - 1]) /
+                    (pos[i] - pos[i - 1]))
+                j = (i + s).astype(int)
+                linear = q[i] + s * (q[j, cols] - q[i]) / (
+                    pos[j, cols] - pos[i])
+            ok = (q[i - 1] < parabolic) & (parabolic < q[i + 1])
+            q[i] = np.where(move, np.where(ok, parabolic, linear), q[i])
+            pos[i] = np.where(move, pos[i] + s, pos[i])
+
+    @property
+    def value(self):
+        ''' The current estimate of the quantile. '''
+        if self.q is None:
+            if not self._first:
+                return np.full(self.size, np.nan)
+            return np.percentile(self._first, 100 * self.p, axis=0)
+        return self.q[2].copy()
+
+
+class RunningSummary(object):
+
+    '''
+    Running posterior summary of one variable in one chain: mean, variance,
+    quantiles and batch-means effective sample size.
+    Args:
+        shape (tuple): The shape of the variable.
+        quantiles (list): Probabilities of the quantiles to track.
+        skip (int): Number of initial draws (e.g., tuning draws) to ignore.
+    '''
+
+    def __init__(self, shape, quantiles=(.025, .975), skip=0):
+        self.shape = tuple(shape)
+        size = int(np.prod(self.shape))
+        self.batches = BatchMeans(size)
+        self.quantiles = {p: P2Quantile(size, p) for p in quantiles}
+        self.skip = skip
+
+    def update(self, x):
+        '''
+        Args:
+            x (array): A block of draws, of shape (n_draws,) + shape.
+        '''
+        x = np.asarray(x, dtype=float).reshape(-1, self.batches.means.shape[1])
+        if self.skip:
+            n = min(self.skip, len(x))
+            x, self.skip = x[n:], self.skip - n
+        self.batches.update(x)
+        for acc in self.quantiles.values():
+            acc.update(x)
+
+    @property
+    def moments(self):
+        return self.batches.moments
+
+    def ess(self):
+        return self.batches.ess()
+
+
+def hpd(x, alpha=0.05):
+    '''
+    The highest posterior density interval of each parameter, i.e. the
+    shortest interval holding a 1 - alpha share of the draws.
+    Args:
+        x (array): Draws, of shape (n_draws, size).
+        alpha (float): One minus the probability mass of the interval.
+    Returns: Arrays of the lower and upper bounds.
+    '''
+    x = np.sort(np.asarray(x, dtype=float), 0)
+    n = len(x)
+    k = min(int(np.floor((1 - alpha) * n)), n - 1)
+    i = (x[k:] - x[:n - k]).argmin(0)
+    cols = np.arange(x.shape[1])
+    return x[i, cols], x[i + k, cols]
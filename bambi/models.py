@@ -1,17 +1,18 @@
 import pandas as pd
 import numpy as np
-import pymc3 as pm
-from pymc3.model import FreeRV
+import scipy.sparse as sp
 import matplotlib.pyplot as plt
 from bambi.external.six import string_types
 from bambi.external.patsy import Ignore_NA
 from collections import OrderedDict, defaultdict
-from bambi.utils import listify
-from patsy import dmatrices, dmatrix
-import re, warnings
-from bambi.priors import PriorFactory, PriorScaler, Prior
+from bambi.utils import listify, sparse_column_stats, load_data
+from patsy import (dmatrices, dmatrix, ModelDesc, design_matrix_builders,
+                   build_design_matrices)
+import re, sys, time, warnings
+from bambi.priors import PriorFactory, PriorScaler, PriorCache, Prior
 from copy import deepcopy
 import statsmodels.api as sm
+import pickle
 
 
 class Model(object):
@@ -20,12 +21,15 @@ class Model(object):
     Args:
         data (DataFrame, str): the dataset to use. Either a pandas
             DataFrame, or the name of the file containing the data, which
-            will be passed to pd.read_table().
+            will be read with utils.load_data() (Parquet, Feather, NumPy
+            .npz or delimited text files).
         intercept (bool): If True, an intercept term is added to the model
             at initialization. Defaults to False, as both fixed and random
             effect specifications will add an intercept by default.
-        backend (str): The name of the BackEnd to use. Currently only
-            'pymc3' is supported.
+        backend (str): The name of the BackEnd to use. Either 'pymc3'
+            (default) or 'gibbs', a blocked Gibbs sampler for gaussian
+            (mixed) models that needs no compilation (see
+            backends.GibbsBackEnd).
         default_priors (dict, str): An optional specification of the
             default priors to use for all model terms. Either a dict
             containing named distributions, families, and terms (see the
@@ -45,20 +49,76 @@ class Model(object):
             numbered values tend to work better. Defaults to 5 for Normal 
             models and 1 for non-Normal models. Values higher than the defaults
             are generally not recommended as they can be unstable.
+        noncentered (bool, str): If True, random effects are sampled using a
+            non-centered parameterization, i.e., as standardized offsets
+            scaled by the group SD. This avoids the funnel-shaped posterior
+            that slows down sampling when there are few observations per
+            group. If 'auto', the parameterization of each random term is
+            picked from its per-group data counts when the model is built.
+            Can be overridden for individual terms in add_term(). Defaults
+            to False.
+        qr (bool): If True, the fixed effects are sampled in an internal
+            basis obtained by centering, scaling and QR-decomposing the fixed
+            effects design matrix. This makes sampling much more efficient
+            when predictors are strongly correlated. Priors are applied to
+            the coefficients on their original scale, and results are
+            reported on that scale as well. Defaults to False.
+        sparse_threshold (float): If set, the fixed terms of formulas are
+            built one term (and one chunk of rows) at a time, and terms whose
+            share of nonzero entries is below this threshold are kept as
+            sparse matrices, e.g. for interactions of factors with many
+            levels. The default priors of sparse terms are scaled by the SD
+            of Y over the SD of each column, rather than by a GLM fit.
+            Defaults to None (all terms are dense).
+        scale_jobs (int): Number of workers among which the default priors
+            of the terms are scaled (see priors.PriorScaler). The slope
+            statistics of each fixed effect column and of each random slope
+            term are computed in parallel. If None, the number of CPUs is
+            used. Defaults to 1 (no pool).
+        scale_executor (str): The kind of pool used if scale_jobs isn't 1:
+            'thread' (default) or 'process'.
+        prior_cache (str, PriorCache): A directory (or priors.PriorCache)
+            in which the scaled default priors of each term are stored, so
+            that rebuilding a model with the same terms and data (or adding
+            terms to it) only scales the priors that changed. Defaults to
+            None (no cache).
+        columns (list): If data is a file name, the columns to read: column
+            names and/or the formulas and random effects specifications
+            whose variables should be read (e.g., ['y ~ x + C(g)',
+            '1|subj']). Defaults to all columns.
+        dtypes (dict): If data is a file name, optional dtypes of some of
+            its columns (e.g., {'subj': 'category', 'x': 'float32'}).
+
+    Attributes:
+        timings (dict): The time (in seconds) spent by the last build() to
+            build the terms ('terms'), scale their priors ('priors') and
+            build the backend ('backend'), and the number of priors found
+            ('prior_cache_hits') and not found ('prior_cache_misses') in
+            the prior cache.
     '''
 
+    # Number of rows of each chunk in which sparse design blocks are built
+    sparse_chunk_size = 10000
+
     def __init__(self, data=None, intercept=False, backend='pymc3',
                  default_priors=None, auto_scale=True, dropna=False,
-                 taylor=None):
+                 taylor=None, noncentered=False, qr=False,
+                 sparse_threshold=None, scale_jobs=1, scale_executor='thread',
+                 prior_cache=None, columns=None, dtypes=None):
 
         if isinstance(data, string_types):
-            data = pd.read_table(data, sep=None)
+            data = load_data(data, columns=columns, dtypes=dtypes)
 
         self.default_priors = PriorFactory(default_priors)
 
         obj_cols = data.select_dtypes(['object']).columns
         data[obj_cols] = data[obj_cols].apply(lambda x: x.astype('category'))
         self.data = data
+        # Optional dict shared by models fitted to the same dataset (see
+        # ModelSet), used to avoid rebuilding identical design columns.
+        self._design_cache = None
+        # Encodings shared by the terms built together (see _materialize())
+        self._encodings = None
         # Some random effects stuff later requires us to make guesses about
         # column groupings into terms based on patsy's naming scheme.
         if re.search("[\[\]]+", ''.join(data.columns)):
@@ -72,9 +132,13 @@ class Model(object):
         if backend.lower() == 'pymc3':
             from bambi.backends import PyMC3BackEnd
             self.backend = PyMC3BackEnd()
+        elif backend.lower() == 'gibbs':
+            from bambi.backends import GibbsBackEnd
+            self.backend = GibbsBackEnd()
         else:
             raise ValueError(
-                "At the moment, only the PyMC3 backend is supported.")
+                "At the moment, only the PyMC3 and Gibbs backends are "
+                "supported.")
 
         if intercept:
             self.add_intercept()
@@ -82,13 +146,31 @@ class Model(object):
         self.auto_scale = auto_scale
         self.dropna = dropna
         self.taylor = taylor
+        self.noncentered = noncentered
+        self.qr = qr
+        self.sparse_threshold = sparse_threshold
+        self.scale_jobs = scale_jobs
+        self.scale_executor = scale_executor
+        if isinstance(prior_cache, string_types):
+            prior_cache = PriorCache(prior_cache)
+        self.prior_cache = prior_cache
+        self.timings = {}
+
+    def __getstate__(self):
+        # the design cache may hold patsy objects, which can't be pickled
+        state = self.__dict__.copy()
+        state['_design_cache'] = None
+        return state
 
     def reset(self):
         '''
         Reset list of terms and y-variable.
         '''
         self.terms = OrderedDict()
+        self._term_classes = None
         self.y = None
+        self.rows = None
+        self.built = False
 
     def build(self):
         ''' Set up the model for sampling/fitting. Performs any steps that
@@ -100,15 +182,31 @@ class Model(object):
                              "add_y() or specify an outcome variable using the"
                              " formula interface before build() or fit().")
 
+        # build the values of all terms added since the last build
+        started = time.time()
+        self._materialize()
+        self.timings = {'terms': time.time() - started}
+
         # Check for NaNs and halt if dropna is False--otherwise issue warning.
-        arrs = []
+        na_index = np.isnan(self.y.data).any(1)
         for t in self.terms.values():
-            if isinstance(t.data, dict):
-                arrs.extend(list(t.data.values()))
-            else:
-                arrs.append(t.data)
-        X = np.concatenate(arrs + [self.y.data], axis=1)
-        na_index = np.isnan(X).any(1)
+            if t.kind == 'split':
+                for values in t.data.values():
+                    na_index |= np.isnan(values).any(1)
+            # indicator codes and intercepts can't hold NaNs
+            elif t.kind == 'numeric':
+                na_index |= np.isnan(t.data).any(1)
+            elif t.kind == 'group':
+                na_index |= np.isnan(t.values)
+            elif t.kind == 'sparse':
+                coo = t.data.tocoo()
+                na_index[coo.row[np.isnan(coo.data)]] = True
+        # rows of the dataset that are used to fit the model (terms may
+        # already have been subset by an earlier build)
+        rows = np.flatnonzero(~na_index)
+        if self.rows is not None and len(self.rows) == len(na_index):
+            rows = self.rows[rows]
+        self.rows = rows
         if na_index.sum():
             msg = "%d rows were found contain at least one missing value." \
                 % na_index.sum()
@@ -126,14 +224,8 @@ class Model(object):
             warnings.warn(msg)
             keeps = np.invert(na_index)
             for t in self.terms.values():
-                # remove missing values from random effects
-                if isinstance(t.data, dict):
-                    t.data[list(t.data.keys())[0]] = \
-                        t.data[list(t.data.keys())[0]][keeps]
-                # remove missing values from fixed effects
-                else:
-                    t.data = t.data[keeps]
-            self.y.data = self.y.data[keeps]
+                t.subset(keeps)
+            self.y.subset(keeps)
 
         # X = fixed effects design matrix (excluding intercept/constant term)
         # r2_x = 1 - 1/VIF, i.e., R2 for predicting each x from all other x's.
@@ -142,8 +234,17 @@ class Model(object):
 
         if len(self.fixed_terms) > 1:
 
-            X = [pd.DataFrame(x.data, columns=x.levels) for x in terms]
-            X = pd.concat(X, axis=1)
+            # r2_x is only computed for the dense terms; sparse terms only
+            # contribute their column means and SDs
+            X = [pd.DataFrame(x.data, columns=x.levels) for x in terms
+                 if x.kind != 'sparse']
+            X = pd.concat(X, axis=1) if X else pd.DataFrame()
+            means, sds = [X.mean(axis=0)], [X.std()]
+            for x in terms:
+                if x.kind == 'sparse':
+                    mean, sd = sparse_column_stats(x.data)
+                    means.append(pd.Series(mean, index=x.levels))
+                    sds.append(pd.Series(sd, index=x.levels))
 
             self.dm_statistics = {
                 'r2_x': pd.Series({
@@ -151,9 +252,9 @@ class Model(object):
                         exog=sm.add_constant(X.drop(x, axis=1)) \
                             if 'Intercept' in self.term_names \
                             else X.drop(x, axis=1)).fit().rsquared
-                    for x in list(X.columns)}),
-                'sd_x': X.std(),
-                'mean_x': X.mean(axis=0)
+                    for x in list(X.columns)}, dtype=float),
+                'sd_x': pd.concat(sds),
+                'mean_x': pd.concat(means)
             }
 
             # save potentially useful info for diagnostics, send to ModelResults
@@ -177,18 +278,31 @@ class Model(object):
                     str(self._diagnostics))
 
         # throw informative error message if any categorical predictors have 1 category
-        if any(np.array([x.data.size for x in self.fixed_terms.values()])==0):
+        if any(x.n_columns == 0 for x in self.fixed_terms.values()):
             raise ValueError("At least one categorical predictor contains only 1 category!")
 
-        # only set priors if there is at least one term in the model
+        # only set priors if there is at least one term in the model. The
+        # maximum likelihood fit of the fixed effects is kept, as it makes
+        # a good starting point for fitting.
+        self.mle = None
+        started = time.time()
+        cache = self.prior_cache
+        hits, misses = (cache.hits, cache.misses) if cache is not None \
+            else (0, 0)
         if len(self.terms) > 0:
             # Get and scale default priors if none are defined yet
             if self.taylor is not None:
                 taylor = self.taylor
             else:
                 taylor = 5 if self.family.name=='gaussian' else 1
-            scaler = PriorScaler(self, taylor=taylor)
+            scaler = PriorScaler(self, taylor=taylor, n_jobs=self.scale_jobs,
+                                 executor=self.scale_executor, cache=cache)
             scaler.scale()
+            self.mle = scaler.mle
+        self.timings['priors'] = time.time() - started
+        if cache is not None:
+            self.timings['prior_cache_hits'] = cache.hits - hits
+            self.timings['prior_cache_misses'] = cache.misses - misses
 
         # For binomial models with n_trials = 1 (most common use case),
         # tell user which event is being modeled
@@ -197,7 +311,9 @@ class Model(object):
             warnings.warn('Modeling the probability that {}==\'{}\''.format(
                 self.y.name, str(self.data[self.y.name].iloc[event])))
 
+        started = time.time()
         self.backend.build(self)
+        self.timings['backend'] = time.time() - started
         self.built = True
 
     def fit(self, fixed=None, random=None, priors=None, family='gaussian',
@@ -246,6 +362,112 @@ class Model(object):
                 self.build()
             return self.backend.run(**kwargs)
 
+    def fit_by(self, by, fixed=None, random=None, priors=None,
+               family='gaussian', link=None, categorical=None, n_jobs=None,
+               traces=False, **kwargs):
+        '''
+        Fit the model separately to each group of rows (split-apply-fit).
+        The model is built and compiled once for the full dataset; the rows
+        of each group are then swapped into the compiled model's shared
+        data and sampled in a pool of worker processes.
+        Args:
+            by (str, list): Name(s) of the column(s) defining the groups.
+            fixed (str): Optional formula specification of fixed effects.
+                If neither fixed nor random is passed, the terms already
+                added to the model are used.
+            random (list): Optional list-based specification of random effects.
+            priors, family, link, categorical: See fit().
+            n_jobs (int): Maximum number of worker processes. Defaults to
+                the number of CPUs.
+            traces (bool): If True, the get_trace() DataFrame of every group
+                is returned as well.
+            kwargs (dict): Optional keyword arguments passed onto the
+                BackEnd's run() method (e.g., samples).
+        Returns: A DataFrame of summary() results, indexed by group and
+            parameter. If traces is True, a tuple of that DataFrame and a
+            dict mapping groups to their traces.
+
+        Notes: Priors are scaled once using the full dataset, and all groups
+            share its design columns. Coefficients of factor levels that do
+            not occur in a group are informed by the prior alone.
+        '''
+        from bambi.parallel import fit_groups
+        if fixed is not None or random is not None:
+            self.add_formula(fixed=fixed, random=random, priors=priors,
+                             family=family, link=link, categorical=categorical,
+                             append=False)
+        if not self.built:
+            self.build()
+
+        data = self.data.iloc[self.rows]
+        # unused categories of categorical columns may give empty groups
+        # (groupby()'s observed keyword needs pandas 0.23)
+        groups = data.groupby(listify(by), sort=True).indices
+        groups = OrderedDict((k, rows) for k, rows in groups.items()
+                             if len(rows))
+        summary, group_traces = fit_groups(self, groups, listify(by), n_jobs,
+                                           traces, kwargs)
+        return (summary, group_traces) if traces else summary
+
+    def resume(self, checkpoint, **kwargs):
+        '''
+        Continue an MCMC run that was checkpointed with
+        fit(checkpoint=...), e.g. after the process running it died. The
+        model must have the same specification as the one that wrote the
+        checkpoint. Draws already taken are kept, and chains continue from
+        their saved step size, mass matrix and other sampler state.
+        Args:
+            checkpoint (str): Path of the checkpoint file.
+            kwargs (dict): Optional keyword arguments passed onto the sampler.
+        '''
+        if not self.built:
+            self.build()
+        return self.backend.resume(checkpoint, **kwargs)
+
+    def save(self, filename):
+        '''
+        Save the built model to disk, so that it can later be restored with
+        Model.load() without re-running patsy, prior scaling, or the backend
+        compilation. Useful for worker processes that refit or score a model
+        with a fixed specification.
+        Args:
+            filename (str): Path of the file to write the model to.
+        '''
+        if not self.built:
+            warnings.warn("Current Bayesian model has not been built yet; "
+                          "building it first before saving.")
+            self.build()
+        self.backend.compile()
+        # theano graphs are deeply nested, so pickling them can exceed the
+        # default recursion limit
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, 10000))
+        try:
+            with open(filename, 'wb') as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            sys.setrecursionlimit(limit)
+
+    @classmethod
+    def load(cls, filename):
+        '''
+        Load a model previously written to disk with Model.save(). The
+        returned model is already built and can be fit immediately.
+        Args:
+            filename (str): Path of the file the model was saved to.
+        '''
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, 10000))
+        try:
+            with open(filename, 'rb') as f:
+                model = pickle.load(f)
+        finally:
+            sys.setrecursionlimit(limit)
+        if not isinstance(model, cls):
+            raise ValueError("The file '%s' does not contain a saved bambi "
+                             "Model." % filename)
+        return model
+
     def add_intercept(self):
         '''
         Adds a constant term to the model. Generally unnecessary when using the
@@ -302,39 +524,44 @@ class Model(object):
         if fixed is not None:
             # Explicitly convert columns to category if desired--though this
             # can also be done within the formula using C().
-            if categorical is not None:
-                data = data.copy()
-                cats = listify(categorical)
-                data[cats] = data[cats].apply(lambda x: x.astype('category'))
-
+            cats = tuple(listify(categorical))
+            data = self._formula_data(cats)
+
+            # check to see if formula is using the 'y[event] ~ x' syntax
+            # (for binomial models). If so, chop it into groups:
+            # 1 = 'y[event]', 2 = 'y', 3 = 'event', 4 = 'x'
+            # If this syntax is not being used, event = None
+            event = re.match(r'^((\S+)\[(\S+)\])\s*~(.*)$', fixed)
+            if event is not None:
+                fixed = '{}~{}'.format(event.group(2), event.group(4))
+
+            # only the metadata of the design (terms, columns and factor
+            # levels) is computed here; the columns of the terms that are
+            # still in the model are built by build()
+            y_info, x_info = self._cached(('formula', fixed, cats),
+                                          lambda: self._design_info(fixed,
+                                                                    data))
             if '~' in fixed:
-                # check to see if formula is using the 'y[event] ~ x' syntax
-                # (for binomial models). If so, chop it into groups:
-                # 1 = 'y[event]', 2 = 'y', 3 = 'event', 4 = 'x'
-                # If this syntax is not being used, event = None
-                event = re.match(r'^((\S+)\[(\S+)\])\s*~(.*)$', fixed)
-                if event is not None:
-                    fixed = '{}~{}'.format(event.group(2),event.group(4))
-                y, X = dmatrices(fixed, data=data, NA_action=Ignore_NA())
-                y_label = y.design_info.term_names[0]
+                y_label = y_info.term_names[0]
                 if event is not None:
                     # pass in new Y data that has 1 if y=event and 0 otherwise
-                    y_data = y[:, 
-                               y.design_info.column_names.index(event.group(1))]
+                    y = build_design_matrices([y_info], data,
+                                              NA_action=Ignore_NA())[0]
+                    y_data = y[:, y_info.column_names.index(event.group(1))]
                     y_data = pd.DataFrame({event.group(3): y_data})
                     self.add_y(y_label, family=family, link=link, data=y_data)
                 else:
                     # use Y as-is
                     self.add_y(y_label, family=family, link=link)
-            else:
-                X = dmatrix(fixed, data=data, NA_action=Ignore_NA())
 
             # Loop over predictor terms
-            for _name, _slice in X.design_info.term_name_slices.items():
-                cols = X.design_info.column_names[_slice]
-                term_data = pd.DataFrame(X[:, _slice], columns=cols)
+            for _term in x_info.terms:
+                _name = _term.name()
                 prior = priors.pop(_name, priors.pop('fixed', None))
-                self.add_term(_name, data=term_data, prior=prior)
+                term = Term(_name, None, prior=prior, source=(self, {
+                    'info': x_info, 'categorical': cats}))
+                self.terms[_name] = term
+                self.built = False
 
         # Random effects
         if random is not None:
@@ -381,6 +608,52 @@ class Model(object):
                 kwargs['prior'] = priors.pop(label, priors.get('random', None))
                 self.add_term(variable=variable, label=label, **kwargs)
 
+    def _formula_data(self, categorical):
+        # the dataset, with the categorical columns converted to category
+        data = self.data
+        if categorical:
+            data = data.copy()
+            cats = list(categorical)
+            data[cats] = data[cats].apply(lambda x: x.astype('category'))
+        return data
+
+    def _design_info(self, formula, data):
+        ''' The patsy DesignInfo of the outcome and of the predictors of a
+        formula. Factors are evaluated to find their types and levels, but
+        no design matrix is built. '''
+        desc = ModelDesc.from_formula(formula)
+        return design_matrix_builders(
+            [desc.lhs_termlist, desc.rhs_termlist], lambda: iter([data]),
+            eval_env=0, NA_action=Ignore_NA())
+
+    def _design(self, info, data):
+        '''
+        Build the columns of the terms of a patsy DesignInfo. Returns a list
+        of (term name, column names, block) tuples. If sparse_threshold is
+        set, blocks are built one term and one chunk of rows at a time, so
+        that no dense matrix larger than a chunk of a single term is ever
+        built, and are kept as CSR matrices if their share of nonzero
+        entries is below sparse_threshold.
+        '''
+        if self.sparse_threshold is None:
+            X = build_design_matrices([info], data, NA_action=Ignore_NA())[0]
+            return [(name, info.column_names[_slice], np.asarray(X[:, _slice]))
+                    for name, _slice in info.term_name_slices.items()]
+
+        blocks = []
+        for name, _slice in info.term_name_slices.items():
+            term_info = info.subset([name])
+            chunks = [sp.csr_matrix(np.asarray(build_design_matrices(
+                [term_info], data.iloc[i:i + self.sparse_chunk_size],
+                NA_action=Ignore_NA())[0]))
+                for i in range(0, len(data), self.sparse_chunk_size)]
+            block = sp.vstack(chunks, format='csr')
+            size = block.shape[0] * block.shape[1]
+            if size and block.nnz >= self.sparse_threshold * size:
+                block = block.toarray()
+            blocks.append((name, info.column_names[_slice], block))
+        return blocks
+
     def add_y(self, variable, prior=None, family='gaussian', link=None, *args,
               **kwargs):
         '''
@@ -433,7 +706,8 @@ class Model(object):
         self.built = False
 
     def add_term(self, variable, data=None, label=None, categorical=False,
-                 random=False, over=None, prior=None, drop_first=True):
+                 random=False, over=None, prior=None, drop_first=True,
+                 noncentered=None):
         '''
         Add a term to the model.
         Args:
@@ -471,6 +745,9 @@ class Model(object):
                 If False, the predictor will be represented using N-1 binary
                 indicators, where each indicator codes the contrast between
                 the N_j and N_0 columns, for j = {1..N-1}.
+            noncentered (bool, str): For random effects, whether to use a
+                non-centered parameterization (True, False, or 'auto'). If
+                None (default), the model-level setting is used.
 
         Notes: One can think of bambi's split_by operation as a sequence of two
             steps. First, the target variable is multiplied by the splitting
@@ -479,15 +756,40 @@ class Model(object):
             of the split_by variable.
         '''
 
-        if data is None:
-            data = self.data.copy()
-
         # Make sure user didn't forget to set categorical=True
-        if variable in data.columns and \
-                data.loc[:, variable].dtype.name in ['object', 'category']:
+        columns = self.data if data is None else data
+        if variable in columns.columns and \
+                columns[variable].dtype.name in ['object', 'category']:
             categorical = True
 
-        else:
+        if label is None:
+            label = variable
+            if over is not None:
+                label += '|%s' % over
+
+        # the term's values are built by build(), along with those of all
+        # other terms (see _materialize())
+        source = (self, {'variable': variable, 'data': data,
+                         'categorical': categorical, 'random': random,
+                         'over': over, 'drop_first': drop_first})
+        term = Term(name=label, data=None, categorical=categorical,
+                    random=random, prior=prior, noncentered=noncentered,
+                    source=source)
+        self.terms[term.name] = term
+        self.built = False
+
+    def _term_values(self, variable, data, categorical, random, over,
+                     drop_first):
+        # the values of a term added with add_term()
+
+        # design pieces derived from the model's own dataset can be shared
+        # with other models through the design cache, and with the other
+        # terms of the model (see _materialize())
+        shared = data is None
+        if data is None:
+            data = self.data
+
+        if not categorical:
             # If all columns have identical names except for levels in [],
             # assume they've already been contrast-coded, and pass data as-is
             cols = [re.sub('\[.*?\]', '', c) for c in data.columns]
@@ -495,47 +797,119 @@ class Model(object):
                 X = data[[variable]]
 
         if categorical:
-            X = pd.get_dummies(data[variable], drop_first=drop_first)
+            X = self._cached(
+                ('dummies', variable, drop_first),
+                lambda: pd.get_dummies(data[variable], drop_first=drop_first),
+                shared)
         elif variable in data.columns:
             X = data[[variable]]
         else:
             X = data
 
-        if random and over is not None:
-            id_var = pd.get_dummies(data[over], drop_first=False)
-            data = {over: id_var.values, variable: X.values}
-            f = '0 + %s:%s' % (over, variable)
-            data = dmatrix(f, data=data, NA_action=Ignore_NA())
-            cols = data.design_info.column_names
-            data = pd.DataFrame(data, columns=cols)
-
-            # For categorical effects, one variance term per predictor level
-            if categorical:
-                split_data = {}
-                groups = list(set([c.split(':')[1] for c in cols]))
-                for g in groups:
-                    patt = re.escape(r':%s' % g) + '$'
-                    level_data = data.filter(regex=patt)
-                    level_data.columns = [
-                        c.split(':')[0] for c in level_data.columns]
-                    level_data = level_data.loc[
-                        :, (level_data != 0).any(axis=0)]
-                    split_data[g] = level_data
-                data = split_data
-            else:
-                data.columns = [c.split(':')[0] for c in cols]
-        else:
-            data = X
-
-        if label is None:
-            label = variable
-            if over is not None:
-                label += '|%s' % over
+        if not (random and over is not None):
+            return X
 
-        term = Term(name=label, data=data, categorical=categorical,
-                    random=random, prior=prior)
-        self.terms[term.name] = term
-        self.built = False
+        def _interact():
+            id_var = self._cached(
+                ('dummies', over, False),
+                lambda: pd.get_dummies(data[over], drop_first=False), shared)
+            dm = {over: id_var.values, variable: X.values}
+            f = '0 + %s:%s' % (over, variable)
+            dm = dmatrix(f, data=dm, NA_action=Ignore_NA())
+            return np.asarray(dm), dm.design_info.column_names
+        values, cols = self._cached(
+            ('interaction', variable, over, categorical, drop_first),
+            _interact, shared)
+        data = pd.DataFrame(values, columns=cols)
+
+        # For categorical effects, one variance term per predictor level
+        if categorical:
+            split_data = {}
+            groups = list(set([c.split(':')[1] for c in cols]))
+            for g in groups:
+                patt = re.escape(r':%s' % g) + '$'
+                level_data = data.filter(regex=patt)
+                level_data.columns = [
+                    c.split(':')[0] for c in level_data.columns]
+                level_data = level_data.loc[
+                    :, (level_data != 0).any(axis=0)]
+                split_data[g] = level_data
+            return split_data
+        data.columns = [c.split(':')[0] for c in cols]
+        return data
+
+    def _materialize(self, terms=()):
+        '''
+        Build the values of all terms of the model (including y) that
+        haven't been built yet, plus those of any other given terms, in one
+        pass. The fixed terms of each add_formula() call are built with a
+        single patsy call, from the design of their own formula (so that
+        their contrast coding is the same as if they had been built right
+        away), and columns encoded identically for several terms or
+        formulas (e.g. the indicators of a grouping variable) are only
+        encoded once. Terms that were replaced or removed before the pass
+        are never built.
+        Args:
+            terms (list): Terms outside the model to build as well.
+        '''
+        pending = OrderedDict()
+        for t in list(self.terms.values()) + [self.y] + list(terms):
+            if t is not None and t._source is not None:
+                pending[id(t)] = t
+        if not pending:
+            return
+
+        # encodings shared by the terms built in this pass
+        self._encodings = {}
+        try:
+            formulas = OrderedDict()
+            for t in pending.values():
+                spec = t._source[1]
+                if 'info' in spec:
+                    formulas.setdefault(id(spec['info']), []).append(t)
+                else:
+                    t._set_values(self._term_values(**spec))
+
+            for group in formulas.values():
+                spec = group[0]._source[1]
+                info, cats = spec['info'], spec['categorical']
+                # a term's columns are identified by its name and the names
+                # of its columns, which reflect its coding
+                keys = OrderedDict(
+                    (t.name, ('term', cats, self.sparse_threshold, t.name,
+                              tuple(info.column_names[
+                                  info.term_name_slices[t.name]])))
+                    for t in group)
+                cache = self._design_cache
+                if cache is None:
+                    cache = self._encodings
+                missing = [name for name, key in keys.items()
+                           if key not in cache]
+                if missing:
+                    data = self._formula_data(cats)
+                    for name, cols, block in self._design(
+                            info.subset(missing), data):
+                        cache[keys[name]] = (cols, block)
+                for t in group:
+                    cols, block = cache[keys[t.name]]
+                    t._set_values(block, cols)
+                    t._design = _term_design(info, t.name)
+        finally:
+            self._encodings = None
+
+    def _cached(self, key, func, shared=True):
+        ''' Return func(), memoized under key in the design cache if the
+        model has one (or else in the encodings shared by the terms built
+        by _materialize()) and the result only depends on the model's
+        dataset. '''
+        cache = self._design_cache
+        if cache is None:
+            cache = self._encodings
+        if cache is None or not shared:
+            return func()
+        if key not in cache:
+            cache[key] = func()
+        return cache[key]
 
     def set_priors(self, priors=None, fixed=None, random=None):
         '''
@@ -576,6 +950,9 @@ class Model(object):
         if not self.built:
             raise ValueError("Cannot plot priors until model is built!")
 
+        import pymc3 as pm
+        from pymc3.model import FreeRV
+
         with pm.Model():
             # get priors for fixed fx, separately for each level of each predictor
             dists = []
@@ -623,21 +1000,55 @@ class Model(object):
         ''' Return names of all terms in order of addition to model. '''
         return list(self.terms.keys())
 
+    def _classify_terms(self):
+        # fixed and random terms, recomputed only when the terms change
+        key = tuple((k, id(v)) for k, v in self.terms.items())
+        if self._term_classes is None or self._term_classes[0] != key:
+            fixed = OrderedDict((k, v) for (k, v) in self.terms.items()
+                                if not v.random)
+            random = OrderedDict((k, v) for (k, v) in self.terms.items()
+                                 if v.random)
+            self._term_classes = (key, fixed, random)
+        return self._term_classes
+
     @property
     def fixed_terms(self):
         ''' Return dict of all and only fixed effects in model. '''
-        return {k: v for (k, v) in self.terms.items() if not v.random}
+        return self._classify_terms()[1]
 
     @property
     def random_terms(self):
         ''' Return dict of all and only random effects in model. '''
-        return {k: v for (k, v) in self.terms.items() if v.random}
+        return self._classify_terms()[2]
+
+
+def _term_design(info, name):
+    ''' A picklable description of how patsy codes a term of a DesignInfo:
+    a list with the factors and the number of columns of each subterm.
+    Factors are dicts with their code and either their categories and
+    contrast matrix (categorical factors) or their number of columns. '''
+    term = info.terms[info.term_names.index(name)]
+    subterms = []
+    for sub in info.term_codings[term]:
+        factors = []
+        for f in sub.factors:
+            fi = info.factor_infos[f]
+            if fi.type == 'categorical':
+                factors.append({'code': f.code,
+                                'categories': list(fi.categories),
+                                'contrast': sub.contrast_matrices[f].matrix})
+            else:
+                factors.append({'code': f.code, 'n_columns': fi.num_columns})
+        subterms.append({'factors': factors, 'n_columns': sub.num_columns})
+    return subterms
 
 
 class Term(object):
 
     '''
-    Representation of a single model term.
+    Representation of a single model term. The values are stored in the
+    most compact form that fits them (see kind), and expanded into a dense
+    design matrix only when the data property is accessed.
     Args:
         name (str): Name of the term.
         data (DataFrame, Series, ndarray): The term values.
@@ -646,27 +1057,180 @@ class Term(object):
             as continuous.
         prior (Prior): A specification of the prior(s) to use. An instance
             of class priors.Prior.
+        noncentered (bool, str): For random effects, whether to use a
+            non-centered parameterization (True, False, or 'auto'). None
+            defers to the model-level setting.
+        source (tuple): If data is None, the (Model, specification) pair the
+            values are built from. Models build the values of all their
+            terms together when they are built, or when any attribute that
+            depends on the values (e.g. data, kind or levels) is accessed.
+
+    Attributes:
+        kind (str): How the values are stored. One of 'intercept' (a column
+            of ones; only the number of rows is kept), 'categorical' (one
+            indicator column per level; kept as integer codes, with -1 for
+            rows in none of the columns), 'group' (slopes by group, where
+            each row has a value in at most one group's column; kept as
+            group codes plus the values), 'numeric' (a dense array), 'sparse'
+            (a scipy CSR matrix; see Model's sparse_threshold) or 'split'
+            (random slopes of a factor; a dict of dense arrays, one per
+            level of the factor).
+        n_columns (int): The number of columns of the design matrix.
+        is_intercept (bool): Whether the columns add up to a constant, i.e.
+            the term spans the intercept.
+        coding (str): For 'categorical' terms, 'full' if every row belongs
+            to one of the columns, or 'treatment' if some rows (those of the
+            reference level) belong to none of them; None otherwise.
     '''
-    def __init__(self, name, data, categorical=False, random=False, prior=None):
+
+    # attributes set from the term's values
+    _values = ['levels', 'kind', 'n_rows', 'n_columns', 'is_intercept',
+               'coding', 'codes', 'values', '_data']
+    __slots__ = ['name', 'categorical', 'random', 'prior', 'noncentered',
+                 '_source', '_design'] + _values
+
+    def __init__(self, name, data, categorical=False, random=False, prior=None,
+                 noncentered=None, source=None):
 
         self.name = name
         self.categorical = categorical
         self.random = random
         self.prior = prior
-
+        self.noncentered = noncentered
+        self._source = source
+        # for terms of formulas, how patsy coded them (see _term_design)
+        self._design = None
+        if data is not None:
+            self._set_values(data)
+
+    def __getattr__(self, attr):
+        # only called for attributes that aren't set: the values of a term
+        # with a source are built on first access (see Model._materialize)
+        if attr in Term._values and self._source is not None:
+            self._source[0]._materialize([self])
+            return getattr(self, attr)
+        raise AttributeError("'Term' object has no attribute '%s'" % attr)
+
+    def _set_values(self, data, levels=None):
+        # store the term's values, and drop its source; levels names the
+        # columns of array or sparse matrix values
+        self._source = None
         if isinstance(data, pd.Series):
             data = data.to_frame()
         if isinstance(data, pd.DataFrame):
             self.levels = list(data.columns)
-            data = data.values
+            # sparse columns only exist since pandas 0.24
+            sparse_dtype = getattr(pd, 'SparseDtype', None)
+            sparse = sparse_dtype is not None and len(data.columns) and all(
+                isinstance(d, sparse_dtype) for d in data.dtypes)
+            data = data.sparse.to_coo() if sparse else data.values
         # Random effects pass through here
         elif isinstance(data, dict):
             self.levels = list(data[list(data.keys())[0]].columns)
-            for k, v in data.items():
-                data[k] = v.values
+            data = {k: v.values for k, v in data.items()}
         else:
-            data = np.atleast_2d(data)
-            self.levels = list(range(data.shape[1]))
+            if not sp.issparse(data):
+                data = np.atleast_2d(data)
+            self.levels = list(range(data.shape[1])) if levels is None \
+                else list(levels)
 
         self.data = data
-        
+
+    @property
+    def data(self):
+        ''' The term's design matrix (or, for 'split' terms, a dict of
+        design matrices). '''
+        if self.kind in ['numeric', 'sparse', 'split']:
+            return self._data
+        if self.kind == 'intercept':
+            return np.ones((self.n_rows, 1))
+        out = np.zeros((self.n_rows, self.n_columns))
+        rows = np.flatnonzero(self.codes >= 0)
+        out[rows, self.codes[rows]] = 1. if self.values is None \
+            else self.values[rows]
+        return out
+
+    @data.setter
+    def data(self, data):
+        self.codes = self.values = self._data = self.coding = None
+        if isinstance(data, dict):
+            self.kind = 'split'
+            self._data = data
+            self.n_rows = len(next(iter(data.values())))
+            self.n_columns = len(self.levels)
+            self.is_intercept = False
+            return
+
+        sparse = sp.issparse(data)
+        if sparse:
+            data = data.tocsr()
+            data.eliminate_zeros()
+        else:
+            data = np.asarray(data)
+        self.n_rows, self.n_columns = data.shape
+        if self.n_columns == 1 and not sparse and np.all(data == 1):
+            self.kind = 'intercept'
+            self.is_intercept = True
+            return
+
+        # patsy names the indicator columns of factors 'name[level]'
+        coded = self.categorical or self.random or (self.n_columns > 0 and
+            all('[' in str(l) for l in self.levels))
+        if coded and sparse and (np.diff(data.indptr) <= 1).all():
+            present = np.diff(data.indptr) > 0
+            codes = np.full(self.n_rows, -1, dtype=np.int32)
+            codes[present] = data.indices
+            values = np.zeros(self.n_rows)
+            values[present] = data.data
+            self._set_codes(codes, values)
+            return
+        if coded and not sparse:
+            nonzero = data != 0
+            if not (nonzero.sum(1) > 1).any():
+                present = nonzero.any(1)
+                codes = np.where(present, nonzero.argmax(1), -1)
+                values = np.where(present, data[np.arange(self.n_rows),
+                                                codes.clip(0)], 0.)
+                self._set_codes(codes.astype(np.int32), values)
+                return
+
+        self.kind = 'sparse' if sparse else 'numeric'
+        self._data = data
+        self.is_intercept = self.n_rows > 0 and self.n_columns > 0 and \
+            np.asarray(data.sum(1)).var() == 0
+
+    def _set_codes(self, codes, values):
+        # rows hold a value in at most one column: keep the column codes,
+        # and the values unless they are all 1
+        present = codes >= 0
+        self.codes = codes
+        if np.all(values[present] == 1):
+            self.kind = 'categorical'
+            self.is_intercept = bool(present.all())
+            self.coding = 'full' if self.is_intercept else 'treatment'
+        else:
+            self.kind = 'group'
+            self.values = values.astype(float)
+            self.is_intercept = bool(present.all() and np.ptp(values) == 0)
+
+    def subset(self, rows):
+        '''
+        Keep only some rows of the term's values.
+        Args:
+            rows (array): Integer indices or boolean mask of the rows to keep.
+        '''
+        if self.kind == 'split':
+            self.data = {k: v[rows] for k, v in self._data.items()}
+        elif self.kind == 'intercept':
+            self.n_rows = len(np.arange(self.n_rows)[rows])
+        elif self.kind in ['numeric', 'sparse']:
+            self.data = self._data[rows]
+        else:
+            self.codes = self.codes[rows]
+            self.n_rows = len(self.codes)
+            if self.values is not None:
+                self.values = self.values[rows]
+            self.is_intercept = bool((self.codes >= 0).all()) and (
+                self.values is None or len(set(self.values)) < 2)
+            if self.kind == 'categorical':
+                self.coding = 'full' if self.is_intercept else 'treatment'
@@ -0,0 +1,303 @@
+import pickle
+import re
+import sys
+from collections import OrderedDict
+from multiprocessing import cpu_count
+import numpy as np
+import pandas as pd
+from patsy import ModelDesc
+from bambi.utils import listify, pool_imap
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # before Python 3.8, datasets are pickled into each worker instead
+    shared_memory = None
+
+
+class SharedData(object):
+
+    '''
+    A DataFrame encoded into a single block of shared memory, so that worker
+    processes can reconstruct it without the data being pickled and sent to
+    each of them. Categorical (and object) columns are stored as integer
+    codes plus their categories; all other columns are stored as-is, the
+    columns of each dtype in one contiguous block, so that the DataFrame
+    rebuilt by attach() uses the shared memory without copying it.
+    Args:
+        data (DataFrame): The dataset to share.
+    '''
+
+    def __init__(self, data):
+        if shared_memory is None:
+            raise ValueError("Sharing a dataset between processes requires "
+                             "Python 3.8 or later.")
+        blocks = OrderedDict()
+        for name in data.columns:
+            col = data[name]
+            # strings and other objects are shared as categories
+            if col.dtype.name != 'category' and \
+                    getattr(col.dtype, 'kind', 'O') not in 'biufcmM':
+                col = col.astype('category')
+            if col.dtype.name == 'category':
+                values = np.asarray(col.cat.codes)
+                cats = (list(col.cat.categories), col.cat.ordered)
+                # every categorical column is a block of its own in pandas
+                blocks[name] = ([name], [values], cats)
+                continue
+            values = np.asarray(col)
+            if values.dtype.hasobject:
+                raise ValueError("Column '%s' can't be placed in shared "
+                                 "memory." % name)
+            block = blocks.setdefault(values.dtype.str, ([], [], None))
+            block[0].append(name)
+            block[1].append(values)
+
+        self.blocks = []
+        offset = 0
+        for names, arrays, cats in blocks.values():
+            # keep every block aligned to 8 bytes
+            offset += -offset % 8
+            self.blocks.append((names, arrays[0].dtype.str, offset, cats))
+            offset += sum(a.nbytes for a in arrays)
+        self.n_rows = len(data)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for (names, dtype, offset, cats), (_, arrays, _) in zip(
+                self.blocks, blocks.values()):
+            dest = np.ndarray((len(arrays), self.n_rows), dtype=dtype,
+                              buffer=self.shm.buf, offset=offset)
+            for i, values in enumerate(arrays):
+                dest[i] = values
+
+    @property
+    def spec(self):
+        ''' A small, picklable description used by attach(). '''
+        return dict(name=self.shm.name, blocks=self.blocks,
+                    n_rows=self.n_rows)
+
+    @staticmethod
+    def attach(spec):
+        '''
+        Reconstruct the shared DataFrame in another process. Its columns are
+        read-only views of the shared memory, grouped by dtype (so their
+        order may differ from that of the original DataFrame).
+        Args:
+            spec (dict): The spec property of a SharedData instance.
+        Returns: A tuple of (SharedMemory, DataFrame). The SharedMemory
+            handle must be kept alive for as long as the DataFrame is used.
+        '''
+        shm = shared_memory.SharedMemory(name=spec['name'])
+        frames = []
+        for names, dtype, offset, cats in spec['blocks']:
+            values = np.ndarray((len(names), spec['n_rows']),
+                                dtype=np.dtype(dtype), buffer=shm.buf,
+                                offset=offset)
+            values.flags.writeable = False
+            if cats is not None:
+                values = pd.Categorical.from_codes(
+                    values[0], categories=cats[0], ordered=cats[1])
+                frames.append(pd.Series(values, name=names[0], copy=False))
+            else:
+                # the transpose of a (columns, rows) array is exactly the
+                # layout of a pandas block, so it isn't copied
+                frames.append(pd.DataFrame(values.T, columns=names,
+                                           copy=False))
+        return shm, _concat_columns(frames, spec['n_rows'])
+
+    def close(self):
+        ''' Release the shared memory block. '''
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _concat_columns(frames, n_rows):
+    # Join frames side by side keeping their blocks as they are. Since
+    # pandas 3, concatenation never copies eagerly and copy is deprecated.
+    if not frames:
+        return pd.DataFrame(index=pd.RangeIndex(n_rows))
+    kwargs = {'copy': False} if int(pd.__version__.split('.')[0]) < 3 \
+        else {}
+    return pd.concat(frames, axis=1, **kwargs)
+
+
+def _with_recursion_limit(func, *args):
+    # Call func (pickling or unpickling a model or its results) with a
+    # recursion limit high enough for the deeply nested theano graphs, and
+    # restore the previous limit afterwards.
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 10000))
+    try:
+        return func(*args)
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+# Per-process state of pool workers; set by _init_worker.
+_worker = {}
+
+
+def _init_worker(data, model_kwargs):
+    # data is either the spec of a SharedData or the dataset itself
+    shm = None
+    if isinstance(data, dict):
+        shm, data = SharedData.attach(data)
+    _worker.update(shm=shm, data=data, model_kwargs=model_kwargs,
+                   design_cache={})
+
+
+def _fit_spec(key, spec):
+    from bambi.models import Model
+    model = Model(_worker['data'], **_worker['model_kwargs'])
+    # identical design columns are only built once per worker
+    model._design_cache = _worker['design_cache']
+    # the results are pickled here rather than by the pool, so that the
+    # recursion limit only has to be raised while they are
+    results = model.fit(**spec)
+    return key, _with_recursion_limit(pickle.dumps, results,
+                                      pickle.HIGHEST_PROTOCOL)
+
+
+def _init_group_worker(model_bytes):
+    _worker['model'] = _with_recursion_limit(pickle.loads, model_bytes)
+
+
+def _fit_group(key, rows, run_kwargs, traces):
+    model = _worker['model']
+    model.backend.set_data(rows)
+    results = model.backend.run(**run_kwargs)
+    trace = results.get_trace() if traces else None
+    return key, results.summary(), trace
+
+
+def fit_groups(model, groups, names, n_jobs=None, traces=False,
+               run_kwargs=None):
+    '''
+    Fit a built model separately to several subsets of its rows, in a pool
+    of worker processes. Each worker receives the compiled model once and
+    then swaps each group's rows into its shared data. Every group is
+    sampled with an untuned copy of the compiled step method, so results
+    don't depend on which worker fits which groups.
+    Args:
+        model (Model): A built bambi Model.
+        groups (dict): Maps group keys to the integer indices of the group's
+            rows in the model's data.
+        names (list): Names of the index levels identifying the groups.
+        n_jobs (int): Maximum number of worker processes. Defaults to the
+            number of CPUs.
+        traces (bool): If True, also collect each group's get_trace().
+        run_kwargs (dict): Optional keyword arguments passed to the
+            backend's run() method.
+    Returns: A DataFrame of summary() results indexed by group and
+        parameter, and a dict mapping group keys to traces (or None).
+    '''
+    model.backend.compile()
+    model_bytes = _with_recursion_limit(pickle.dumps, model,
+                                        pickle.HIGHEST_PROTOCOL)
+
+    summaries, all_traces = {}, {}
+    tasks = [(k, rows, run_kwargs or {}, traces) for k, rows in groups.items()]
+    for key, summary, trace in pool_imap(
+            _fit_group, tasks, min(n_jobs or cpu_count(), len(tasks)) or 1,
+            _init_group_worker, (model_bytes,), ordered=False):
+        summaries[key] = summary
+        all_traces[key] = trace
+
+    keys = list(groups)
+    summary = pd.concat([summaries[k] for k in keys], keys=keys,
+                        names=listify(names) + ['parameter'])
+    return summary, (all_traces if traces else None)
+
+
+class ModelSet(object):
+
+    '''
+    A collection of model specifications fitted against a single dataset.
+    The dataset is encoded once and shared with a pool of worker processes,
+    design columns shared by several specifications are built only once per
+    worker, and fits are scheduled longest-first.
+    Args:
+        data (DataFrame): The dataset all models are fitted to.
+        specs (list, dict): The model specifications. Each specification is
+            a dict of keyword arguments to Model.fit() (e.g., fixed, random,
+            family, link, priors, categorical, samples, ...). If a dict of
+            specifications is passed, its keys are used to label the results;
+            otherwise results are labeled by position.
+        n_jobs (int): Maximum number of worker processes. Defaults to the
+            number of CPUs.
+        model_kwargs (dict): Optional keyword arguments passed to Model() for
+            every specification (e.g., dropna, auto_scale, taylor).
+
+    Examples:
+        >>> specs = {'a': {'fixed': 'y ~ x'},
+        >>>          'b': {'fixed': 'y ~ x', 'random': ['1|subj']}}
+        >>> results = ModelSet(data, specs, n_jobs=4).fit()
+    '''
+
+    def __init__(self, data, specs, n_jobs=None, model_kwargs=None):
+
+        if not isinstance(specs, dict):
+            specs = OrderedDict(enumerate(listify(specs)))
+        for key, spec in specs.items():
+            if not isinstance(spec, dict) or spec.get('fixed') is None:
+                raise ValueError("Specification '%s' must be a dict with at "
+                                 "least a 'fixed' formula." % str(key))
+        self.specs = specs
+        self.data = data
+        self.n_jobs = n_jobs or cpu_count()
+        self.model_kwargs = model_kwargs or {}
+
+    def _n_levels(self, variable):
+        # number of design columns a variable contributes to a term
+        variable = re.sub(r'^C\((.+?)\s*(,.*)?\)$', r'\1', variable.strip())
+        if variable not in self.data.columns:
+            return 1
+        col = self.data[variable]
+        # patsy treats booleans, strings and categories as categorical
+        if col.dtype.name == 'category' or \
+                getattr(col.dtype, 'kind', 'O') not in 'iufcmM':
+            return col.nunique()
+        return 1
+
+    def cost(self, spec):
+        '''
+        Rough relative cost of fitting a specification: the number of rows,
+        times the approximate number of design columns, times the number of
+        samples drawn. Only used to order the fits.
+        '''
+        fixed = re.sub(r'^\s*\S+\[\S+\]\s*~', '~', spec['fixed'])
+        n_cols = 0
+        for term in ModelDesc.from_formula(fixed).rhs_termlist:
+            n_cols += np.prod([self._n_levels(f.name()) for f in term.factors])
+        for f in listify(spec.get('random')):
+            n_cols += np.prod([self._n_levels(v) for v in
+                               re.split(r'[\|\+]', f) if v.strip() and
+                               v.strip() not in ['0', '1']])
+        return len(self.data) * n_cols * spec.get('samples', 1000)
+
+    def iter_fit(self):
+        '''
+        Fit all specifications in a process pool.
+        Returns: A generator of (key, ModelResults) tuples, yielded in the
+            order the fits finish.
+        '''
+        # longest fits first keeps the pool busy until the end
+        order = sorted(self.specs, key=lambda k: -self.cost(self.specs[k]))
+        shared = SharedData(self.data) if shared_memory is not None else None
+        data = self.data if shared is None else shared.spec
+        try:
+            for key, results in pool_imap(
+                    _fit_spec, [(k, self.specs[k]) for k in order],
+                    min(self.n_jobs, len(order)) or 1, _init_worker,
+                    (data, self.model_kwargs), ordered=False):
+                yield key, _with_recursion_limit(pickle.loads, results)
+        finally:
+            if shared is not None:
+                shared.close()
+
+    def fit(self):
+        '''
+        Fit all specifications in a process pool.
+        Returns: An OrderedDict mapping specification keys to ModelResults,
+            in the order the specifications were given.
+        '''
+        results = dict(self.iter_fit())
+        return OrderedDict((k, results[k]) for k in self.specs)
@@ -4,8 +4,15 @@ from scipy.special import hyp2f1
 from pandas import Series
 from os.path import dirname, join
 from bambi.external.six import string_types
+from bambi.utils import sparse_column_stats, pool_imap, replace_file
+from scipy import linalg
+from statsmodels.genmod.generalized_linear_model import (GLMResults,
+                                                         GLMResultsWrapper)
 from copy import deepcopy
+from multiprocessing import cpu_count
+import hashlib
 import json
+import os
 import re
 import statsmodels.api as sm
 
@@ -182,13 +189,17 @@ class PriorScaler(object):
         'superwide': 0.8
     }
 
-    def __init__(self, model, taylor):
+    def __init__(self, model, taylor, n_jobs=1, executor='thread',
+                 cache=None):
         self.model = model
         self.stats = model.dm_statistics if hasattr(model, 'dm_statistics') \
             else None
-        self.dm = pd.DataFrame({'{}[{}]'.format(t.name, lev): t.data[:, lev]
+        # sparse terms are left out of the GLM fit (see _scale_sparse)
+        self.dm = pd.concat([pd.DataFrame(t.data, columns=[
+                   '{}[{}]'.format(t.name, lev) for lev in range(t.n_columns)])
                    for t in model.fixed_terms.values()
-                   for lev in range(len(t.levels))})
+                   if t.kind != 'sparse'] or [pd.DataFrame()],
+                   axis=1)
         self.priors = {}
         self.mle = sm.GLM(endog=self.model.y.data, exog=self.dm,
             family=self.model.family.smfamily(),
@@ -196,6 +207,44 @@ class PriorScaler(object):
         self.taylor = taylor
         with open(join(dirname(__file__),'config','derivs.txt'), 'r') as file:
             self.deriv = [next(file).strip('\n') for x in range(taylor+1)]
+        if executor not in ['thread', 'process']:
+            raise ValueError("executor must be 'thread' or 'process'.")
+        self.n_jobs = n_jobs or cpu_count()
+        self.executor = executor
+        # GLM fits reused across terms (see _intercept_fit, _augmented_fit)
+        self._fits = {}
+        # fixed effect data of the random terms (see _random_fixed_data)
+        self._fixed_data = {}
+        # priors of models with a custom link function aren't cached, as
+        # the link can't be fingerprinted
+        self.cache = None if callable(model.family.link) else cache
+        if self.cache is not None:
+            sparse = [(t.name, t.data) for t in model.fixed_terms.values()
+                      if t.kind == 'sparse']
+            self.fingerprint = _fingerprint(
+                'bambi.priors', 1, model.family.name, model.family.link,
+                taylor, model.y.data, list(self.dm.columns), self.dm.values,
+                sparse)
+
+    def __getstate__(self):
+        # worker processes only get the parts of the model that the slope
+        # statistics depend on
+        state = self.__dict__.copy()
+        state['model'] = _ScalerModel(self.model)
+        return state
+
+    def _map(self, tasks):
+        # Run (method name, args) tasks, in a pool of n_jobs workers if
+        # there are several. Results are returned in the order of the tasks.
+        if self.n_jobs == 1 or len(tasks) < 2:
+            return [getattr(self, method)(*args) for method, args in tasks]
+        n_jobs = min(self.n_jobs, len(tasks))
+        if self.executor == 'process':
+            # the scaler (and its design matrix) is sent to each worker once
+            return list(pool_imap(_run_scaler, tasks, n_jobs, _init_scaler,
+                                  (self,)))
+        return list(pool_imap(lambda method, args: getattr(self, method)(
+            *args), tasks, n_jobs, threads=True))
 
     def _get_slope_stats(self, exog, predictor, sd_corr, full_mod=None,
         points=4):
@@ -269,11 +318,8 @@ class PriorScaler(object):
 
     def _get_intercept_stats(self, add_slopes=True):
         # start with mean and variance of Y on the link scale
-        mod = sm.GLM(endog=self.model.y.data,
-            exog=np.repeat(1, len(self.model.y.data)),
-            family=self.model.family.smfamily(),
-            missing='drop' if self.model.dropna else 'none').fit()
-        mu = mod.params
+        mod = self._intercept_fit()
+        mu = mod.params.copy()
         # multiply SE by sqrt(N) to turn it into (approx.) SD(Y) on link scale
         sd = (mod.cov_params()[0] * len(mod.mu))**.5
 
@@ -294,18 +340,26 @@ class PriorScaler(object):
 
         return mu, sd
 
-    def _scale_fixed(self, term, sd_corr):
+    def _fixed_slope_stats(self, column, sd_corr):
+        # slope SD of one column of the fixed effects design matrix
+        return self._get_slope_stats(exog=self.dm,
+                                     predictor=self.dm[column].values,
+                                     sd_corr=sd_corr)
+
+    def _scale_fixed(self, term, sd_corr, sd=None):
+        # sd: the slope SD of each column, if already computed
 
         # these defaults are only defined for Normal priors
         if term.prior.name != 'Normal':
             return
 
-        mu = []
-        sd = []
-        for pred in term.data.T:
-            mu += [0]
-            sd += [self._get_slope_stats(
-                exog=self.dm, predictor=pred, sd_corr=sd_corr)]
+        if term.kind == 'sparse':
+            mu, sd = self._scale_sparse(term, sd_corr)
+        else:
+            mu = [0] * term.n_columns
+            if sd is None:
+                sd = [self._fixed_slope_stats(col, sd_corr)
+                      for col in self._columns(term)]
 
         # save and set prior
         self.priors.update({term.name: {
@@ -313,6 +367,20 @@ class PriorScaler(object):
             }})
         term.prior.update(mu = np.array(mu), sd=np.array(sd))
 
+    def _columns(self, term):
+        # names of the columns of a fixed term in self.dm
+        return ['{}[{}]'.format(term.name, lev)
+                for lev in range(term.n_columns)]
+
+    def _scale_sparse(self, term, sd_corr):
+        # Sparse terms are too wide to fit by GLM, so the slope SDs are set
+        # as if each column were the only predictor: sd_corr times the SD of
+        # Y (on the link scale) over the SD of the column.
+        sd_y = np.ravel(self._get_intercept_stats(add_slopes=False)[1])[0]
+        sd_x = sparse_column_stats(term.data)[1]
+        sd_x = np.where(sd_x > 0, sd_x, 1.)
+        return np.zeros(term.n_columns), sd_corr * sd_y / sd_x
+
     def _scale_intercept(self, term, sd_corr):
 
         # default priors are only defined for Normal priors
@@ -328,16 +396,22 @@ class PriorScaler(object):
             }})
         term.prior.update(mu=mu, sd=sd)
 
-    def _scale_random(self, term, sd_corr):
-        # these default priors are only defined for HalfNormal priors
-        if term.prior.args['sd'].name != 'HalfNormal':
-            return
+    def _random_fixed_data(self, term):
+        if term.name not in self._fixed_data:
+            self._fixed_data[term.name] = self._get_fixed_data(term)
+        return self._fixed_data[term.name]
 
+    def _get_fixed_data(self, term):
         # recreate the corresponding fixed effect data
-        fix_data = term.data.sum(axis=1) \
-            if not isinstance(term.data, dict) \
-            else np.vstack([term.data[x].sum(axis=1) \
-            for x in term.data.keys()]).T
+        if term.kind == 'split':
+            fix_data = np.vstack([x.sum(axis=1)
+                                  for x in term.data.values()]).T
+        elif term.codes is not None:
+            # the row sums of indicator or group columns
+            fix_data = np.where(term.codes >= 0, 1. if term.values is None
+                                else term.values, 0.)
+        else:
+            fix_data = term.data.sum(axis=1)
 
         # classify as random intercept or random slope
         term_type = 'intercept' if np.atleast_2d(fix_data.T).T.sum(1).var()==0 \
@@ -346,37 +420,125 @@ class PriorScaler(object):
         # get name of corresponding fixed effect
         fix = re.sub(r'\|.*', r'', term.name).strip() \
             if term_type=='fixed' else 'Intercept'
+        return fix_data, term_type, fix
+
+    def _intercept_fit(self):
+        # intercept-only GLM, fitted once
+        if 'intercept' not in self._fits:
+            self._fits['intercept'] = sm.GLM(endog=self.model.y.data,
+                exog=np.repeat(1, len(self.model.y.data)),
+                family=self.model.family.smfamily(),
+                missing='drop' if self.model.dropna else 'none').fit()
+        return self._fits['intercept']
+
+    def _incremental(self):
+        # whether augmented fits can extend the QR decomposition of the
+        # fixed effects design matrix rather than being refitted
+        return self.model.family.name == 'gaussian' and \
+            self.model.family.link == 'identity' and \
+            np.isfinite(self.dm.values).all() and \
+            np.isfinite(self.model.y.data).all()
+
+    def _base_qr(self):
+        # economic QR decomposition of the fixed effects design matrix
+        if 'qr' not in self._fits:
+            self._fits['qr'] = linalg.qr(self.dm.values.astype(float),
+                                         mode='economic')
+        return self._fits['qr']
+
+    def _augmented_fit(self, fix_data):
+        # The GLM of the fixed effects plus the columns of fix_data, and its
+        # design matrix, memoized by those columns. Gaussian fits add the
+        # columns to the QR decomposition of self.dm if the result has full
+        # rank; other fits are warm started from the MLE of the fixed
+        # effects.
+        fix_data = np.atleast_2d(fix_data.T).T
+        key = ('augmented', fix_data.shape, hashlib.sha1(
+            np.ascontiguousarray(fix_data, dtype=float)).hexdigest())
+        if key in self._fits:
+            return self._fits[key]
+
+        fix_dataframe = pd.DataFrame(fix_data, index=self.dm.index)
+        # things break if column names are integers (the default)
+        fix_dataframe.rename(
+            columns={c:'_'+str(c) for c in fix_dataframe.columns},
+            inplace=True)
+        exog = pd.concat([self.dm, fix_dataframe], axis=1)
+        model = sm.GLM(endog=self.model.y.data, exog=exog,
+            family=self.model.family.smfamily(),
+            missing='drop' if self.model.dropna else 'none')
+
+        full_mod = None
+        if self._incremental():
+            k = self.dm.shape[1]
+            try:
+                if k:
+                    Q, R = self._base_qr()
+                    Q, R = linalg.qr_insert(Q, R, fix_data.astype(float), k,
+                                            which='col')
+                else:
+                    Q, R = linalg.qr(fix_data.astype(float), mode='economic')
+                # R can only be inverted if the columns are linearly
+                # independent (qr_insert() already refuses new columns in
+                # the span of self.dm)
+                d = np.abs(np.diag(R))
+                tol = d.max() * max(R.shape) * np.finfo(float).eps
+                if R.shape[0] != R.shape[1] or not (d > tol).all():
+                    raise linalg.LinAlgError("The design is rank deficient.")
+            except linalg.LinAlgError:
+                pass
+            else:
+                y = np.ravel(self.model.y.data)
+                params = linalg.solve_triangular(R, Q.T.dot(y))
+                R_inv = linalg.solve_triangular(R, np.eye(R.shape[1]))
+                resid = y - exog.values.dot(params)
+                full_mod = GLMResultsWrapper(GLMResults(
+                    model, params, R_inv.dot(R_inv.T),
+                    resid.dot(resid) / model.df_resid))
+        if full_mod is None:
+            # rank deficient designs are fitted by IRLS, which uses a
+            # pseudoinverse, like the GLM fit of the fixed effects
+            start = np.append(np.asarray(self.mle.params),
+                              np.zeros(fix_data.shape[1]))
+            full_mod = model.fit(start_params=start)
+
+        self._fits[key] = exog, full_mod
+        return exog, full_mod
+
+    def _random_slope_stats(self, fix_data, sd_corr):
+        # slope SDs of the columns of a random slope term that has no
+        # corresponding fixed effect
+        sd = []
+        # this will replace self.mle (which is missing predictors)
+        exog, full_mod = self._augmented_fit(fix_data)
+        # loop over the columns of fix_data
+        ncols = exog.shape[1] - self.dm.shape[1]
+        for pred in range(ncols):
+            sd += [self._get_slope_stats(exog=exog,
+                predictor=np.atleast_2d(fix_data.T).T[:,pred],
+                full_mod=full_mod, sd_corr=sd_corr)]
+        return sd
+
+    def _scale_random(self, term, sd_corr, sd=None):
+        # sd: the slope SDs, if already computed (see _random_slope_stats)
+
+        # these default priors are only defined for HalfNormal priors
+        if term.prior.args['sd'].name != 'HalfNormal':
+            return
+
+        fix_data, term_type, fix = self._random_fixed_data(term)
 
         # handle case where there IS a corresponding fixed effect
         if fix in self.model.fixed_terms.keys():
             sd = self.priors[fix]['sd']
 
         # handle case where there IS NOT a corresponding fixed effect
-        else: 
-            # handle intercepts and slopes separately
-            if term_type=='intercept':
-                mu, sd = self._get_intercept_stats()
-                sd *= sd_corr
-            if term_type=='fixed':
-                mu = []
-                sd = []
-                fix_dataframe = pd.DataFrame(fix_data)
-                # things break if column names are integers (the default)
-                fix_dataframe.rename(
-                    columns={c:'_'+str(c) for c in fix_dataframe.columns},
-                    inplace=True)
-                exog = self.dm.join(fix_dataframe)
-                # this will replace self.mle (which is missing predictors)
-                full_mod = sm.GLM(endog=self.model.y.data, exog=exog,
-                    family=self.model.family.smfamily(),
-                    missing='drop' if self.model.dropna else 'none').fit()
-                # loop over the columns of fix_data
-                ncols = exog.shape[1] - self.dm.shape[1]
-                for pred in range(ncols):
-                    mu += [0]
-                    sd += [self._get_slope_stats(exog=exog,
-                        predictor=np.atleast_2d(fix_data.T).T[:,pred],
-                        full_mod=full_mod, sd_corr=sd_corr)]
+        # handle intercepts and slopes separately
+        elif term_type=='intercept':
+            mu, sd = self._get_intercept_stats()
+            sd *= sd_corr
+        elif sd is None:
+            sd = self._random_slope_stats(fix_data, sd_corr)
 
         # set the prior SD.
         # if there are multiple SDs for multiple categories, use mean for all
@@ -385,9 +547,9 @@ class PriorScaler(object):
     def scale(self):
         # classify all terms
         fixed_intercepts = [t for t in self.model.terms.values()
-            if not t.random and t.data.sum(1).var()==0]
+            if not t.random and t.is_intercept]
         fixed_slopes = [t for t in self.model.terms.values()
-            if not t.random and not t.data.sum(1).var()==0]
+            if not t.random and not t.is_intercept]
         random_terms = [t for t in self.model.terms.values() if t.random]
 
         # arrange them in the order in which they should be initialized
@@ -396,7 +558,8 @@ class PriorScaler(object):
             ['intercept']*len(fixed_intercepts) + \
             ['random']*len(random_terms)
 
-        # initialize them in order
+        # impute the default priors in order, and decide their scale
+        todo = []
         for t, term_type in zip(term_list, term_types):
 
             # only set default priors if no prior defined yet
@@ -406,7 +569,7 @@ class PriorScaler(object):
                 sd_corr = t.prior
                 if sd_corr is None:
                     if not self.model.auto_scale:
-                        return
+                        break
                     sd_corr = 'wide'
 
                 # set scale
@@ -415,7 +578,203 @@ class PriorScaler(object):
 
                 # impute default
                 t.prior = self.model.default_priors.get(term=term_type)
+                todo.append((t, term_type, sd_corr))
+
+        # Cached priors that only depend on the design are looked up right
+        # away; those that depend on the slope priors once they are set
+        keys, cached = {}, {}
+        if self.cache is not None:
+            for t, term_type, sd_corr in todo:
+                if not self._depends_on_slopes(t, term_type):
+                    keys[t.name] = self._cache_key(t, term_type, sd_corr)
+                    cached[t.name] = self.cache.get(keys[t.name])
+
+        # The slope statistics of the columns of fixed terms, and of random
+        # slopes without a corresponding fixed effect, only depend on the
+        # MLE: compute them all at once, possibly in a pool of workers
+        tasks, names = [], []
+        for t, term_type, sd_corr in todo:
+            if cached.get(t.name) is not None:
+                continue
+            if term_type == 'fixed' and t.prior.name == 'Normal' and \
+                    t.kind != 'sparse':
+                for col in self._columns(t):
+                    tasks.append(('_fixed_slope_stats', (col, sd_corr)))
+                    names.append(t.name)
+            elif term_type == 'random' and \
+                    t.prior.args['sd'].name == 'HalfNormal':
+                fix_data, kind, fix = self._random_fixed_data(t)
+                if kind == 'fixed' and fix not in self.model.fixed_terms:
+                    tasks.append(('_random_slope_stats', (fix_data, sd_corr)))
+                    names.append(t.name)
+        # fits shared by the tasks are done before they are sent to workers
+        if any(method == '_random_slope_stats' for method, _ in tasks):
+            if self._incremental() and self.dm.shape[1]:
+                self._base_qr()
+        sds = {}
+        for name, sd in zip(names, self._map(tasks)):
+            sds.setdefault(name, []).append(sd)
+
+        # scale them in order, as the intercept priors depend on the slopes
+        for t, term_type, sd_corr in todo:
+            if self.cache is not None and t.name not in keys:
+                keys[t.name] = self._cache_key(t, term_type, sd_corr)
+                cached[t.name] = self.cache.get(keys[t.name])
+            if cached.get(t.name) is not None:
+                self._set_cached(t, term_type, cached[t.name])
+                continue
+            sd = sds.get(t.name)
+            if term_type == 'fixed':
+                self._scale_fixed(t, sd_corr, sd)
+            elif term_type == 'random':
+                self._scale_random(t, sd_corr, sd and sd[0])
+            else:
+                self._scale_intercept(t, sd_corr)
+            if self.cache is not None:
+                self.cache.set(keys[t.name], self._get_cached(t, term_type))
+
+    def _depends_on_slopes(self, term, term_type):
+        # whether the default prior of a term depends on the slope priors
+        if term_type == 'intercept':
+            return True
+        if term_type == 'random':
+            fix_data, kind, fix = self._random_fixed_data(term)
+            return kind == 'intercept' or fix in self.model.fixed_terms
+        return False
+
+    def _cache_key(self, term, term_type, sd_corr):
+        # fingerprint of everything the default prior of a term depends on
+        parts = [self.fingerprint, term.name, term_type, sd_corr,
+                 term.prior.name]
+        if term_type == 'random':
+            parts += [term.prior.args['sd'].name,
+                      self._random_fixed_data(term)[0]]
+        if self._depends_on_slopes(term, term_type):
+            parts.append(self.priors)
+        return _fingerprint(*parts)
+
+    def _get_cached(self, term, term_type):
+        # the scaled parameters of a term's default prior
+        if term_type == 'random':
+            if term.prior.args['sd'].name != 'HalfNormal':
+                return {}
+            return {'sd': term.prior.args['sd'].args['sd']}
+        if term.name not in self.priors:
+            return {}
+        return {k: self.priors[term.name][k] for k in ['mu', 'sd']}
+
+    def _set_cached(self, term, term_type, values):
+        # set the scaled parameters of a term's default prior
+        if not values:
+            return
+        if term_type == 'random':
+            term.prior.args['sd'].update(sd=values['sd'])
+            return
+        self.priors.update({term.name: {
+            'mu': values['mu'], 'sd': values['sd'], 'levels': term.levels}})
+        term.prior.update(mu=values['mu'], sd=values['sd'])
+
+
+class PriorCache(object):
+
+    '''
+    A directory of scaled default priors, with one entry per term, keyed by
+    a fingerprint of everything the scaling of the term depends on (see
+    PriorScaler): the fixed effects design, y, the family and link, the
+    Taylor order, the term's width and, for terms that depend on them, the
+    slope priors. Models that are rebuilt with the same terms and data
+    reuse the priors rather than refitting the GLMs they are derived from;
+    adding a random term only scales that term.
+    Args:
+        path (str): The directory the priors are stored in. It is created
+            if it doesn't exist.
+
+    Attributes:
+        hits (int): Number of priors found in the cache.
+        misses (int): Number of priors that weren't.
+    '''
+
+    def __init__(self, path):
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.path = path
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        ''' The prior parameters stored under key, or None. '''
+        try:
+            with open(join(self.path, key + '.json'), 'r') as f:
+                values = json.load(f)
+        except (IOError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {k: np.array(v) if isinstance(v, list) else v
+                for k, v in values.items()}
+
+    def set(self, key, values):
+        ''' Store the prior parameters in values under key. '''
+        path = join(self.path, key + '.json')
+        # written to a temporary file first, so that concurrent builds
+        # never read a partial entry
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump({k: np.asarray(v).tolist() for k, v in values.items()},
+                      f)
+        replace_file(tmp, path)
+
+
+def _fingerprint(*parts):
+    # SHA-1 digest of (nested lists, tuples and dicts of) arrays, sparse
+    # matrices and scalars
+    digest = hashlib.sha1()
+
+    def _update(x):
+        if isinstance(x, dict):
+            digest.update(b'{')
+            for k in sorted(x, key=str):
+                _update(k)
+                _update(x[k])
+            digest.update(b'}')
+        elif isinstance(x, (list, tuple)):
+            digest.update(b'[')
+            for v in x:
+                _update(v)
+            digest.update(b']')
+        elif hasattr(x, 'tocsr'):
+            x = x.tocsr()
+            _update([x.shape, x.data, x.indices, x.indptr])
+        elif isinstance(x, (np.ndarray, pd.Series, pd.DataFrame)):
+            x = np.asarray(x)
+            digest.update(repr((x.dtype.str, x.shape)).encode())
+            if x.dtype.hasobject:
+                digest.update(repr(x.tolist()).encode())
+            else:
+                digest.update(np.ascontiguousarray(x).tobytes())
+        else:
+            digest.update(repr(x).encode())
+        digest.update(b';')
+
+    _update(list(parts))
+    return digest.hexdigest()
+
+
+class _ScalerModel(object):
+    # the parts of a model that the slope statistics depend on, sent to
+    # worker processes instead of the model
+    def __init__(self, model):
+        self.y = model.y
+        self.family = model.family
+        self.dropna = model.dropna
+
+
+# PriorScaler of pool worker processes; set by _init_scaler
+_worker = {}
+
+
+def _init_scaler(scaler):
+    _worker['scaler'] = scaler
 
-                # scale it!
-                getattr(self, '_scale_%s' % term_type)(t, sd_corr)
 
+def _run_scaler(method, args):
+    return getattr(_worker['scaler'], method)(*args)
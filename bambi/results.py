@@ -1,10 +1,9 @@
 import pandas as pd
 import numpy as np
-import pymc3 as pm
-from pymc3.model import TransformedRV
-import pymc3.diagnostics as pmd
-from abc import abstractmethod, ABCMeta
-import re, warnings
+from abc import abstractmethod, abstractproperty, ABCMeta
+import json, os, re, warnings
+from collections import OrderedDict
+from bambi.diagnostics import gelman_rubin, hpd, ConvergenceMonitor
 
 
 class ModelResults(object):
@@ -33,51 +32,6 @@ class ModelResults(object):
     def summary(self):
         pass
 
-
-class PyMC3Results(ModelResults):
-
-    '''
-    Holds PyMC3 sampler results and provides plotting and summarization tools.
-    Args:
-        model (Model): a bambi Model instance specifying the model.
-        trace (MultiTrace): a PyMC3 MultiTrace object returned by the sampler. 
-    '''
-
-    def __init__(self, model, trace):
-
-        self.trace = trace
-        self.n_samples = len(trace)
-
-        # here we determine which variables have been internally transformed 
-        # (e.g., sd_log). transformed vars are actually 'untransformed' from 
-        # the PyMC3 model's perspective, and it's the backtransformed (e.g., sd)
-        # variable that is 'transformed'. So the logic of this is to find and
-        # remove 'untranformed' variables that have a 'transformed' counterpart,
-        # in that 'untransformed' varname is the 'transfornmed' varname plus
-        # some suffix (such as '_log' or '_interval')
-        rvs = model.backend.model.unobserved_RVs
-        trans = set(var.name for var in rvs if isinstance(var, TransformedRV))
-        untrans = set(var.name for var in rvs) - trans
-        untrans = set(x for x in untrans if not any([t in x for t in trans]))
-        self.untransformed_vars = [x for x in trace.varnames \
-            if x in trans | untrans]
-
-        super(PyMC3Results, self).__init__(model)
-
-
-    def _filter_names(self, names, exclude_ranefs=True, hide_transformed=True):
-        names = self.untransformed_vars \
-            if hide_transformed else self.trace.varnames
-        # helper function to put parameter names in same format as random_terms
-        def _format(name):
-            regex = re.match(r'^u_([^\|]+)\|([^_\1]+)_\1(.*_sd$)?', name)
-            return name if regex is None or regex.group(3) is not None \
-                else 'u_{}|{}'.format(regex.group(1), regex.group(2))
-        if exclude_ranefs:
-            names = [x for x in names
-                if _format(x)[2:] not in list(self.model.random_terms.keys())]
-        return names
-
     def _prettify_name(self, old_name):
         # re1 chops 'u_subj__7' into {1:'u_', 2:'subj', 3:'7'}
         re1 = re.match(r'^([bu]_)(.+[^__\d+]+)(__\d+)?$', old_name)
@@ -114,6 +68,532 @@ class PyMC3Results(ModelResults):
             return '1|{}[{}]'.format(
                 re1.group(2), term.levels[int(re1.group(3)[2:])])
 
+    @staticmethod
+    def load(path, mmap=True):
+        '''
+        Open a results archive written by save(). Neither PyMC3 nor theano
+        are imported, and the draws are memory-mapped by default, so this
+        is fast even for long traces.
+        Args:
+            path (str): The directory the archive was written to.
+            mmap (bool): If True (default), the draws are memory-mapped
+                rather than read into memory.
+        Returns: A SampleResults instance, whose model attribute is an
+            ArchivedModel.
+        '''
+        with open(os.path.join(path, 'results.json')) as f:
+            meta = json.load(f, object_pairs_hook=OrderedDict)
+        bounds = np.cumsum([0] + meta['lengths'])
+        samples = OrderedDict()
+        for var in meta['varnames']:
+            values = np.load(os.path.join(path, meta['files'][var]),
+                             mmap_mode='r' if mmap else None)
+            samples[var] = [values[a:b]
+                            for a, b in zip(bounds[:-1], bounds[1:])]
+        results = SampleResults(ArchivedModel(meta['model']), samples,
+                                names=meta['names'])
+        results.untransformed_vars = meta['untransformed_vars']
+        results.aux_vars = meta['aux_vars']
+        return results
+
+
+class TraceResults(ModelResults):
+
+    '''
+    Base class for results that hold posterior draws (PyMC3Results,
+    SampleResults). Subclasses provide access to the draws of each chain;
+    this class builds traces, exports, information criteria, scorers and
+    archives from them.
+    '''
+
+    @abstractproperty
+    def varnames(self):
+        ''' Names of all variables with stored draws. '''
+        pass
+
+    @abstractproperty
+    def chains(self):
+        ''' The chain identifiers. '''
+        pass
+
+    @abstractmethod
+    def _chain_length(self, chain):
+        # number of stored draws of a chain
+        pass
+
+    @abstractmethod
+    def _chain_values(self, var, chain, burn_in=0):
+        # the draws of one variable in one chain, of shape (n_draws, ...)
+        pass
+
+    def _filter_names(self, names, exclude_ranefs=True, hide_transformed=True,
+                      summarized=False):
+        names = self.untransformed_vars \
+            if hide_transformed else self.varnames
+        if summarized:
+            names = list(names) + (self.summarized_vars
+                if hide_transformed else list(self.summaries))
+        # helper function to put parameter names in same format as random_terms
+        def _format(name):
+            regex = re.match(r'^u_([^\|]+)\|([^_\1]+)_\1(.*_sd$)?', name)
+            return name if regex is None or regex.group(3) is not None \
+                else 'u_{}|{}'.format(regex.group(1), regex.group(2))
+        if exclude_ranefs:
+            names = [x for x in names
+                if _format(x)[2:] not in list(self.model.random_terms.keys())
+                and self.aux_vars.get(x) != 'offset']
+        return names
+
+    def _column_index(self, names):
+        '''
+        Labels of the columns get_trace() returns for the given variables,
+        and the (variable, start, stop) column span of each variable. The
+        index only depends on the model, so it is computed once per set of
+        names.
+        '''
+        key = tuple(names)
+        if key in self._columns:
+            return self._columns[key]
+
+        chain = self.chains[0]
+        labels, spans = [], []
+        for var in names:
+            shape = self._chain_values(var, chain).shape
+            width = int(np.prod(shape[1:]))
+            # handle terms with a single level
+            if width == 1:
+                cols = [self._prettify_name(var)]
+            # handle auxiliary variables, which don't map onto terms
+            elif var in self.aux_vars:
+                cols = ['{}[{}]'.format(var, i) for i in range(width)]
+            # handle fixed terms with multiple levels
+            # (slice off the 'b_' or 'u_')
+            elif var[2:] in self.model.fixed_terms.keys():
+                cols = self.model.terms[var[2:]].levels
+            # handle random terms with multiple levels
+            else:
+                cols = ['{}[{}]'.format(var[2:], x)
+                        for x in self.model.terms[var[2:]].levels]
+            spans.append((var, len(labels), len(labels) + width))
+            labels += list(cols)
+
+        self._columns[key] = labels, spans
+        return labels, spans
+
+    def get_trace(self, burn_in=0, names=None, exclude_ranefs=True,
+        hide_transformed=True):
+        '''
+        Returns the MCMC samples in a nice, neat DataFrame.
+        Args:
+            burn_in (int): Number of initial samples to exclude from
+                each chain before returning the trace DataFrame.
+            names (list): Optional list of variable names to get samples for.
+            exclude_ranefs (bool): If True (default), do not return samples
+                for individual random effects.
+            hide_transformed (bool): If True (default), do not return
+            samples for internally transformed variables.
+        '''
+        # if no 'names' specified, filter out unwanted variables
+        if names is None:
+            names = self._filter_names(names, exclude_ranefs, hide_transformed)
+        labels, spans = self._column_index(names)
+
+        # copy each chain's draws straight into a single preallocated array
+        lengths = [max(self._chain_length(c) - burn_in, 0)
+                   for c in self.chains]
+        values = np.empty((sum(lengths), len(labels)))
+        row = 0
+        for chain, n in zip(self.chains, lengths):
+            for var, a, b in spans:
+                values[row:row + n, a:b] = self._chain_values(
+                    var, chain, burn_in).reshape(n, b - a)
+            row += n
+
+        return pd.DataFrame(values, columns=labels, copy=False)
+
+    def to_arrow(self, burn_in=0, names=None, exclude_ranefs=True,
+                 hide_transformed=True):
+        '''
+        Returns the MCMC samples as an Arrow table, with 'chain' and 'draw'
+        columns and one column per variable. The table has one record batch
+        per chain, which wraps the sampler's buffers without copying them.
+        Variables with several elements become fixed-size list columns;
+        their element labels (as in get_trace()) are kept in the field
+        metadata under 'labels'. Requires pyarrow.
+        Args:
+            burn_in (int): Number of initial samples to exclude from
+                each chain.
+            names (list): Optional list of variable names to get samples for.
+            exclude_ranefs (bool): If True (default), do not return samples
+                for individual random effects.
+            hide_transformed (bool): If True (default), do not return
+            samples for internally transformed variables.
+        '''
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("Exporting traces to Arrow requires pyarrow.")
+
+        if names is None:
+            names = self._filter_names(names, exclude_ranefs, hide_transformed)
+        labels, spans = self._column_index(names)
+
+        batches = []
+        for chain in self.chains:
+            n = max(self._chain_length(chain) - burn_in, 0)
+            columns = [pa.array(np.full(n, chain, dtype=np.int64)),
+                       pa.array(np.arange(burn_in, burn_in + n))]
+            fields = [pa.field('chain', pa.int64()),
+                      pa.field('draw', pa.int64())]
+            for var, a, b in spans:
+                # slicing rows off a C-ordered array keeps it contiguous,
+                # so Arrow can use the buffer as-is
+                values = pa.array(self._chain_values(var, chain, burn_in)
+                                  .reshape(-1))
+                if b - a > 1:
+                    values = pa.FixedSizeListArray.from_arrays(values, b - a)
+                meta = {'labels': json.dumps(labels[a:b])}
+                columns.append(values)
+                fields.append(pa.field(var, values.type, metadata=meta))
+            batches.append(pa.RecordBatch.from_arrays(
+                columns, schema=pa.schema(fields)))
+        return pa.Table.from_batches(batches)
+
+    def to_parquet(self, path, burn_in=0, names=None, exclude_ranefs=True,
+                   hide_transformed=True, **kwargs):
+        '''
+        Write the MCMC samples to a Parquet file (see to_arrow()). Requires
+        pyarrow.
+        Args:
+            path (str): Path of the file to write.
+            kwargs (dict): Optional keyword arguments passed onto
+                pyarrow.parquet.write_table() (e.g., compression). All other
+                arguments are as in to_arrow().
+        '''
+        import pyarrow.parquet as pq
+        pq.write_table(self.to_arrow(burn_in, names, exclude_ranefs,
+                                     hide_transformed), path, **kwargs)
+
+    def log_likelihood(self, burn_in=0, chunk_size=1000):
+        '''
+        The pointwise log-likelihood of every observation under every draw,
+        as an array of shape (n_draws, n_rows). This can be large; waic()
+        and loo() never build it.
+        Args:
+            burn_in (int): Number of initial samples to exclude from each
+                chain.
+            chunk_size (int): Number of rows evaluated at a time.
+        '''
+        from bambi.criteria import log_likelihood
+        return log_likelihood(self, burn_in, chunk_size)
+
+    def waic(self, burn_in=0, chunk_size=1000, pointwise=False):
+        '''
+        The widely applicable information criterion. The pointwise
+        log-likelihood is evaluated and reduced one chunk of rows at a time.
+        Args:
+            burn_in (int): Number of initial samples to exclude from each
+                chain.
+            chunk_size (int): Number of rows evaluated at a time.
+            pointwise (bool): If True, also return the per-observation
+                values.
+        Returns: See bambi.criteria.waic().
+        '''
+        from bambi.criteria import waic
+        return waic(self, burn_in, chunk_size, pointwise)
+
+    def loo(self, burn_in=0, chunk_size=1000, pointwise=False):
+        '''
+        Leave-one-out cross-validation by Pareto-smoothed importance
+        sampling. The pointwise log-likelihood is evaluated, smoothed and
+        reduced one chunk of rows at a time.
+        Args: See waic().
+        Returns: See bambi.criteria.loo().
+        '''
+        from bambi.criteria import loo
+        return loo(self, burn_in, chunk_size, pointwise)
+
+    def export_scorer(self, path, draws='mean', burn_in=0):
+        '''
+        Write a standalone scoring artifact for the fitted model: the
+        coefficients, random-effect tables and level indexes needed to
+        predict new observations. Load it with bambi.scoring.Scorer, which
+        only needs NumPy.
+        Args:
+            path (str): The file to write (a NumPy .npz archive).
+            draws (int, str): The number of posterior draws to keep, or
+                'mean' (default) to keep only the posterior means.
+            burn_in (int): Number of initial samples to exclude from each
+                chain.
+        '''
+        from bambi.scoring import export_scorer
+        export_scorer(self, path, draws, burn_in)
+
+
+    def save(self, path):
+        '''
+        Write the results to a compact archive in a directory: the draws of
+        each variable as a raw .npy array (all chains stacked), plus a JSON
+        file with the term, level and prior metadata and the names reported
+        by summary(). Neither the data nor the compiled model are stored.
+        The archive can be opened with ModelResults.load().
+        Args:
+            path (str): The directory to write to. It is created if it
+                doesn't exist.
+        '''
+        if self.summaries:
+            warnings.warn("The running summaries of %s are not saved."
+                          % sorted(self.summaries))
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        from bambi.priors import Prior
+
+        def _prior(p):
+            if not isinstance(p, Prior):
+                return p
+            return {'name': p.name, 'args': {
+                k: _prior(v) for k, v in p.args.items() if k != 'observed'}}
+
+        model = self.model
+        terms = [{'name': t.name, 'random': bool(t.random), 'kind': t.kind,
+                  'levels': list(t.levels), 'n_columns': t.n_columns,
+                  'prior': _prior(t.prior)}
+                 for t in model.terms.values()]
+        link = model.family.link
+        meta = OrderedDict([
+            ('format', 1),
+            ('varnames', list(self.varnames)),
+            ('untransformed_vars', list(self.untransformed_vars)),
+            ('aux_vars', dict(self.aux_vars)),
+            ('lengths', [self._chain_length(c) for c in self.chains]),
+            ('files', {}), ('names', {}),
+            ('model', {'terms': terms,
+                       'y': {'name': model.y.name,
+                             'prior': _prior(model.y.prior)},
+                       'family': {'name': model.family.name,
+                                  'parent': model.family.parent,
+                                  'link': link if not callable(link)
+                                  else None}})])
+
+        for i, var in enumerate(self.varnames):
+            values = np.concatenate([self._chain_values(var, c)
+                                     for c in self.chains])
+            meta['files'][var] = 'var_%d.npy' % i
+            np.save(os.path.join(path, meta['files'][var]), values)
+            width = int(np.prod(values.shape[1:]))
+            keys = [var] if width == 1 else \
+                ['{}__{}'.format(var, j) for j in range(width)]
+            for key in keys:
+                try:
+                    meta['names'][key] = self._prettify_name(key)
+                except (KeyError, IndexError, ValueError):
+                    meta['names'][key] = key
+
+        def _default(o):
+            return o.tolist() if hasattr(o, 'tolist') else str(o)
+        with open(os.path.join(path, 'results.json'), 'w') as f:
+            json.dump(meta, f, default=_default)
+
+
+class ArchivedModel(object):
+
+    '''
+    The parts of a Model kept in a results archive (see ModelResults.save):
+    the names, kinds, levels and priors of the terms, and the outcome's
+    name and family. Priors are kept as dicts.
+    Args:
+        spec (dict): The model metadata stored in the archive.
+    '''
+
+    class Part(object):
+        def __init__(self, **kwargs):
+            self.__dict__.update(kwargs)
+
+    def __init__(self, spec):
+        self.terms = OrderedDict((t['name'], self.Part(**t))
+                                 for t in spec['terms'])
+        self.y = self.Part(**spec['y'])
+        self.family = self.Part(**spec['family'])
+
+    @property
+    def fixed_terms(self):
+        return OrderedDict((k, v) for k, v in self.terms.items()
+                           if not v.random)
+
+    @property
+    def random_terms(self):
+        return OrderedDict((k, v) for k, v in self.terms.items() if v.random)
+
+
+class PyMC3Results(TraceResults):
+
+    '''
+    Holds PyMC3 sampler results and provides plotting and summarization tools.
+    Args:
+        model (Model): a bambi Model instance specifying the model.
+        trace (MultiTrace): a PyMC3 MultiTrace object returned by the sampler. 
+    '''
+
+    def __init__(self, model, trace):
+
+        self.trace = trace
+        self.n_samples = len(trace)
+
+        # here we determine which variables have been internally transformed 
+        # (e.g., sd_log). transformed vars are actually 'untransformed' from 
+        # the PyMC3 model's perspective, and it's the backtransformed (e.g., sd)
+        # variable that is 'transformed'. So the logic of this is to find and
+        # remove 'untranformed' variables that have a 'transformed' counterpart,
+        # in that 'untransformed' varname is the 'transfornmed' varname plus
+        # some suffix (such as '_log' or '_interval')
+        from pymc3.model import TransformedRV
+        rvs = model.backend.model.unobserved_RVs
+        trans = set(var.name for var in rvs if isinstance(var, TransformedRV))
+        untrans = set(var.name for var in rvs) - trans
+        untrans = set(x for x in untrans if not any([t in x for t in trans]))
+        # auxiliary variables of the backend's parameterization (e.g.,
+        # non-centered offsets) are hidden like transformed variables
+        self.aux_vars = getattr(model.backend, 'aux_vars', {})
+        self.untransformed_vars = [x for x in trace.varnames \
+            if x in trans | untrans and x not in self.aux_vars]
+        # variables for which the sampler only kept running summaries
+        self.summaries = {}
+        for strace in trace._straces.values():
+            for name, acc in getattr(strace, 'summaries', {}).items():
+                self.summaries.setdefault(name, []).append(acc)
+        self.summarized_vars = [x for x in self.summaries
+            if x in trans | untrans and x not in self.aux_vars]
+        # column labels of get_trace(), by names requested
+        self._columns = {}
+
+        super(PyMC3Results, self).__init__(model)
+
+
+    def extend(self, n_draws, **kwargs):
+        '''
+        Draw more samples, continuing every chain from its last draw with the
+        sampler state (step size, mass matrix, etc.) it ended with, and
+        append them to the trace. Chains sampled in parallel (njobs > 1)
+        can only be extended if their run was checkpointed.
+        Args:
+            n_draws (int): The number of draws to add to each chain.
+            kwargs (dict): Optional keyword arguments passed onto the
+                backend's extend() method (e.g., checkpoint).
+        Returns: The PyMC3Results instance, with the extended trace.
+        '''
+        self.trace = self.model.backend.extend(self.trace, n_draws, **kwargs)
+        self.model.backend.trace = self.trace
+        self.n_samples = len(self.trace)
+        return self
+
+    def to_priors(self, burn_in=0, multivariate=False, model=None,
+                  inflate=1.):
+        '''
+        Approximate the posterior by priors that can be passed to
+        Model.set_priors() when the model is refit to a new batch of data
+        only (sequential updating). Fixed effects get moment-matched Normal
+        priors. Random effects get Normal priors centered at their posterior
+        means, with a HalfNormal prior on the group SD whose second moment
+        matches that of the posterior of the SD.
+        Args:
+            burn_in (int): Number of initial samples to exclude.
+            multivariate (bool): If True, fixed terms with several columns
+                (e.g., factors) get a full-rank MvNormal prior with the
+                posterior covariance of their coefficients, rather than
+                independent Normal priors.
+            model (Model): Optional model the priors are meant for, whose
+                terms may have different levels (e.g., if the new batch
+                contains new groups). Coefficients are then matched by level
+                name, and random effects of new groups are centered at 0.
+                Defaults to the fitted model.
+            inflate (float): Factor by which all prior SDs are multiplied,
+                e.g. to let the parameters drift between batches.
+        Returns: A dict mapping term names to Prior instances.
+        '''
+        from bambi.priors import Prior
+        target = self.model if model is None else model
+
+        def _samples(name):
+            x = np.asarray(self.trace[name, burn_in:])
+            return x.reshape(len(x), -1)
+
+        priors = {}
+        for name, t in target.terms.items():
+            old = self.model.terms.get(name)
+            if old is None or old.random != t.random:
+                continue
+            idx = [old.levels.index(l) if l in old.levels else None
+                   for l in t.levels]
+
+            if not t.random:
+                missing = [l for l, i in zip(t.levels, idx) if i is None]
+                if missing:
+                    raise ValueError("Level '%s' of term '%s' is not in the "
+                                     "fitted model." % (missing[0], name))
+                x = _samples('b_' + name)[:, idx]
+                if multivariate and x.shape[1] > 1:
+                    cov = np.cov(x, rowvar=False) * inflate ** 2
+                    priors[name] = Prior('MvNormal', mu=x.mean(0), cov=cov)
+                else:
+                    priors[name] = Prior('Normal', mu=x.mean(0),
+                                         sd=x.std(0) * inflate)
+                continue
+
+            # categorical random slopes have one vector of effects (and one
+            # SD) per level of the factor; only their SDs are carried over
+            if old.kind == 'split':
+                labels = ['u_%s_%s' % (name, l) for l in old.data]
+                mu = 0
+            else:
+                labels = ['u_' + name]
+                u = _samples('u_' + name)
+                mu = np.array([0. if i is None else u[:, i].mean()
+                               for i in idx])
+            sd = np.concatenate([_samples(l + '_sd').ravel() for l in labels])
+            priors[name] = Prior('Normal', mu=mu, sd=Prior(
+                'HalfNormal', sd=np.sqrt(np.mean(sd ** 2)) * inflate))
+        return priors
+
+    def drift(self, reference, burn_in=0):
+        '''
+        Compare the posterior to that of a reference fit of the same model,
+        e.g. to check how far a sequentially updated fit drifts from a full
+        refit to all of the data.
+        Args:
+            reference (PyMC3Results): The reference fit.
+            burn_in (int): Number of initial samples to exclude from both
+                traces.
+        Returns: A DataFrame with the posterior means and SDs of the
+            parameters in both fits, the difference of the means in units
+            of the reference SD ('z'), and the ratio of the SDs
+            ('sd_ratio').
+        '''
+        a = self.get_trace(burn_in)
+        b = reference.get_trace(burn_in)
+        cols = [c for c in a.columns if c in b.columns]
+        df = pd.DataFrame({'mean': a[cols].mean(), 'ref_mean': b[cols].mean(),
+                           'sd': a[cols].std(), 'ref_sd': b[cols].std()},
+                          columns=['mean', 'ref_mean', 'sd', 'ref_sd'])
+        df['z'] = (df['mean'] - df['ref_mean']) / df['ref_sd']
+        df['sd_ratio'] = df['sd'] / df['ref_sd']
+        return df
+
+    @property
+    def varnames(self):
+        return self.trace.varnames
+
+    @property
+    def chains(self):
+        return self.trace.chains
+
+    def _chain_length(self, chain):
+        return len(self.trace._straces[chain])
+
+    def _chain_values(self, var, chain, burn_in=0):
+        # the draws of one chain, as a view of the trace's own buffer
+        return self.trace._straces[chain].get_values(var, burn=burn_in)
+
     def plot(self, burn_in=0, names=None, annotate=True, exclude_ranefs=False, 
         hide_transformed=True, kind='trace', **kwargs):
         '''
@@ -137,6 +617,7 @@ class PyMC3Results(ModelResults):
         '''
         if kind == 'priors':
             return self.model.plot()
+        import pymc3 as pm
 
         # if no 'names' specified, filter out unwanted variables
         if names is None:
@@ -215,44 +696,58 @@ class PyMC3Results(ModelResults):
                 summary statistics for internally transformed variables.
             mc_error (bool): If True (defaults to False), include the monte
                 carlo error for each parameter estimate.
+        Variables that were sampled with store='summary' are summarized from
+        the running summaries kept while sampling (ignoring burn_in); their
+        intervals are equal-tailed rather than HPD.
         '''
 
+        import pymc3 as pm
+        import pymc3.diagnostics as pmd
+
         # if no 'names' specified, filter out unwanted variables
         if names is None:
-            names = self._filter_names(names, exclude_ranefs, hide_transformed)
+            names = self._filter_names(names, exclude_ranefs, hide_transformed,
+                                       summarized=True)
+        summarized = [x for x in names if x in self.summaries]
+        names = [x for x in names if x not in self.summaries]
 
-        # get the basic DataFrame
-        df = pm.df_summary(self.trace[burn_in:], varnames=names, **kwargs)
-        df.set_index([[self._prettify_name(x) for x in df.index]], inplace=True)
-
-        # append diagnostic info if there are multiple chains.
-        if self.trace.nchains > 1:
-            # first remove unwanted variables so we don't waste time on those
-            diag_trace = self.trace[burn_in:]
-            for var in set(diag_trace.varnames) - set(names):
-                diag_trace.varnames.remove(var)
-            # append each diagnostic statistic
-            for diag_fn,diag_name in zip([pmd.effective_n, pmd.gelman_rubin],
-                                         ['effective_n',   'gelman_rubin']):
-                # compute the diagnostic statistic
-                stat = diag_fn(diag_trace)
-                # rename stat indices to match df indices
-                for k, v in list(stat.items()):
-                    stat.pop(k)
-                    # handle categorical predictors w/ >3 levels
-                    if isinstance(v, np.ndarray) and len(v) > 1:
-                        for i,x in enumerate(v):
-                            ugly_name = '{}__{}'.format(k, i)
-                            stat[self._prettify_name(ugly_name)] = x
-                    # handle all other variables
-                    else:
-                        stat[self._prettify_name(k)] = v
-                # append to df
-                stat = pd.DataFrame(stat, index=[diag_name]).T
-                df = df.merge(stat, how='left', left_index=True, right_index=True)
+        if not names:
+            df = self._accumulated_summary(summarized)
         else:
-            warnings.warn('Multiple MCMC chains (i.e., njobs > 1) are required'
-                          ' in order to compute convergence diagnostics.')
+            # get the basic DataFrame
+            df = pm.df_summary(self.trace[burn_in:], varnames=names, **kwargs)
+            df.set_index([[self._prettify_name(x) for x in df.index]], inplace=True)
+
+            # append diagnostic info if there are multiple chains.
+            if self.trace.nchains > 1:
+                # first remove unwanted variables so we don't waste time on those
+                diag_trace = self.trace[burn_in:]
+                for var in set(diag_trace.varnames) - set(names):
+                    diag_trace.varnames.remove(var)
+                # append each diagnostic statistic
+                for diag_fn,diag_name in zip([pmd.effective_n, pmd.gelman_rubin],
+                                             ['effective_n',   'gelman_rubin']):
+                    # compute the diagnostic statistic
+                    stat = diag_fn(diag_trace)
+                    # rename stat indices to match df indices
+                    for k, v in list(stat.items()):
+                        stat.pop(k)
+                        # handle categorical predictors w/ >3 levels
+                        if isinstance(v, np.ndarray) and len(v) > 1:
+                            for i,x in enumerate(v):
+                                ugly_name = '{}__{}'.format(k, i)
+                                stat[self._prettify_name(ugly_name)] = x
+                        # handle all other variables
+                        else:
+                            stat[self._prettify_name(k)] = v
+                    # append to df
+                    stat = pd.DataFrame(stat, index=[diag_name]).T
+                    df = df.merge(stat, how='left', left_index=True, right_index=True)
+            else:
+                warnings.warn('Multiple MCMC chains (i.e., njobs > 1) are required'
+                              ' in order to compute convergence diagnostics.')
+            if summarized:
+                df = pd.concat([df, self._accumulated_summary(summarized)])
 
         # drop the mc_error column if requested
         if not mc_error:
@@ -270,44 +765,167 @@ class PyMC3Results(ModelResults):
 
         return df
 
-    def get_trace(self, burn_in=0, names=None, exclude_ranefs=True,
-        hide_transformed=True):
+    def _accumulated_summary(self, names):
+        # summary() rows for variables that were only summarized while
+        # sampling; intervals are equal-tailed rather than HPD
+        rows = {}
+        for name in names:
+            accs = self.summaries[name]
+            n = np.array([a.moments.n for a in accs], dtype=float)[:, None]
+            means = np.array([a.moments.mean for a in accs])
+            mean = (n * means).sum(0) / n.sum()
+            # pooled over chains: within- plus between-chain sums of squares
+            ss = np.sum([a.moments.m2 for a in accs], 0) + \
+                (n * (means - mean) ** 2).sum(0)
+            sd = (ss / max(n.sum() - 1, 1)) ** .5
+            ess = np.sum([a.ess() for a in accs], 0)
+            stats = OrderedDict([('mean', mean), ('sd', sd),
+                                 ('mc_error', sd / ess ** .5)])
+            for p in sorted(accs[0].quantiles):
+                stats['hpd_%g' % (100 * p)] = np.mean(
+                    [a.quantiles[p].value for a in accs], 0)
+            if len(accs) > 1:
+                stats['effective_n'] = ess
+                stats['gelman_rubin'] = gelman_rubin([a.moments for a in accs])
+            labels = [name] if accs[0].shape == () else \
+                ['{}__{}'.format(name, i) for i in range(len(mean))]
+            for i, label in enumerate(labels):
+                rows[self._prettify_name(label)] = \
+                    OrderedDict((k, v[i]) for k, v in stats.items())
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+class SampleResults(TraceResults):
+
+    '''
+    Holds posterior draws kept as plain NumPy arrays (e.g., by the Gibbs
+    back-end) and provides the same summarization tools as PyMC3Results.
+    Args:
+        model (Model): a bambi Model instance specifying the model.
+        samples (dict): Maps variable names (named as in the PyMC3 back-end,
+            e.g. 'b_x', 'u_1|subj', 'u_1|subj_sd') to arrays of draws, of
+            shape (n_chains, n_draws) + the variable's shape, or to lists
+            with one array of draws per chain.
+        names (dict): Optional precomputed mapping of variable (element)
+            names to the names reported by summary() (see ModelResults.save).
+    '''
+
+    def __init__(self, model, samples, names=None):
+
+        self.samples = OrderedDict(samples)
+        self.n_samples = self._chain_length(0) if self.samples else 0
+        self.aux_vars = {}
+        self.untransformed_vars = list(self.samples)
+        self.summaries = {}
+        self.summarized_vars = []
+        self._names = names or {}
+        self._columns = {}
+
+        super(SampleResults, self).__init__(model)
+
+    @property
+    def varnames(self):
+        return list(self.samples)
+
+    @property
+    def chains(self):
+        n = len(next(iter(self.samples.values()))) if self.samples else 0
+        return list(range(n))
+
+    def _chain_length(self, chain):
+        return len(next(iter(self.samples.values()))[chain])
+
+    def _chain_values(self, var, chain, burn_in=0):
+        return self.samples[var][chain][burn_in:]
+
+    def _prettify_name(self, old_name):
+        if old_name in self._names:
+            return self._names[old_name]
+        return super(SampleResults, self)._prettify_name(old_name)
+
+    def plot(self, burn_in=0, names=None, exclude_ranefs=False,
+             hide_transformed=True, **kwargs):
         '''
-        Returns the MCMC samples in a nice, neat DataFrame.
+        Plots the posterior distribution (left) and the draws of each chain
+        (right) of every variable.
         Args:
-            burn_in (int): Number of initial samples to exclude from
-                each chain before returning the trace DataFrame.
-            names (list): Optional list of variable names to get samples for.
-            exclude_ranefs (bool): If True (default), do not return samples
-                for individual random effects.
-            hide_transformed (bool): If True (default), do not return
-            samples for internally transformed variables.
+            burn_in (int): Number of initial samples to exclude.
+            names (list): Optional list of variable names to plot.
+            exclude_ranefs (bool): If True, do not show trace plots for
+                individual random effects. Defaults to False.
+            hide_transformed (bool): Unused; kept for compatibility with
+                PyMC3Results.plot().
+            kwargs (dict): Optional keyword arguments passed onto
+                matplotlib's hist().
         '''
-        # if no 'names' specified, filter out unwanted variables
+        import matplotlib.pyplot as plt
         if names is None:
             names = self._filter_names(names, exclude_ranefs, hide_transformed)
+        fig, axes = plt.subplots(len(names), 2, squeeze=False,
+                                 figsize=(12, len(names) * 1.5))
+        for ax, var in zip(axes, names):
+            for chain in self.chains:
+                x = self._chain_values(var, chain, burn_in)
+                x = x.reshape(len(x), -1)
+                ax[0].hist(x, bins=30, histtype='step', **kwargs)
+                ax[1].plot(x, alpha=.6)
+            ax[0].set_title(var)
+        fig.tight_layout()
+        return axes
 
-        # helper function to label the trace DataFrame columns appropriately
-        def get_cols(var):
-            # handle terms with a single level
-            if len(self.trace[var].shape)==1 or self.trace[var].shape[1]==1:
-                return [self._prettify_name(var)]
-            else:
-                # handle fixed terms with multiple levels
-                # (slice off the 'b_' or 'u_')
-                if var[2:] in self.model.fixed_terms.keys():
-                    return self.model.terms[var[2:]].levels
-                # handle random terms with multiple levels
-                else:
-                    return ['{}[{}]'.format(var[2:], x)
-                            for x in self.model.terms[var[2:]].levels]
-
-        # construct the trace DataFrame
-        trace_df = pd.concat([pd.DataFrame(self.trace[x, burn_in:],
-                                           columns=get_cols(x))
-                              for x in names], axis=1)
+    def summary(self, burn_in=0, exclude_ranefs=True, names=None,
+                hide_transformed=True, mc_error=False, alpha=0.05):
+        '''
+        Summarizes all parameter estimates, in the same format as
+        PyMC3Results.summary().
+        Args:
+            burn_in (int): Number of initial samples to exclude before
+                summary statistics are computed.
+            exclude_ranefs (bool): If True (default), do not print
+                summary statistics for individual random effects.
+            names (list): Optional list of variable names to summarize.
+            hide_transformed (bool): If True (default), do not print
+                summary statistics for internally transformed variables.
+            mc_error (bool): If True (defaults to False), include the monte
+                carlo error for each parameter estimate.
+            alpha (float): One minus the probability mass of the HPD
+                intervals.
+        The effective sample sizes (and the Monte Carlo errors) are batch-
+        means estimates.
+        '''
+        if names is None:
+            names = self._filter_names(names, exclude_ranefs, hide_transformed)
+        # label the rows as PyMC3Results.summary() does
+        labels = []
+        for var, a, b in self._column_index(names)[1]:
+            labels += [self._prettify_name(var)] if b - a == 1 else \
+                [self._prettify_name('{}__{}'.format(var, i))
+                 for i in range(b - a)]
+        x = self.get_trace(burn_in, names=names).values
+        lengths = [max(self._chain_length(c) - burn_in, 0)
+                   for c in self.chains]
+        draws = np.split(x, np.cumsum(lengths)[:-1])
+
+        lo, hi = hpd(x, alpha)
+        df = pd.DataFrame(OrderedDict([
+            ('mean', x.mean(0)), ('sd', x.std(0)), ('mc_error', np.nan),
+            ('hpd_%g' % (100 * alpha / 2), lo),
+            ('hpd_%g' % (100 * (1 - alpha / 2)), hi)]), index=labels)
+
+        monitor = ConvergenceMonitor(len(labels), self.chains)
+        for chain in self.chains:
+            monitor.update(chain, draws[chain])
+        ess = monitor.ess()
+        df['mc_error'] = df['sd'] / ess ** .5
+        if len(self.chains) > 1:
+            df['effective_n'] = ess
+            df['gelman_rubin'] = monitor.rhat()
+        else:
+            warnings.warn('Multiple MCMC chains are required in order to '
+                          'compute convergence diagnostics.')
 
-        return trace_df
+        if not mc_error:
+            df = df.drop('mc_error', axis=1)
+        return df
 
 
 class PyMC3ADVIResults(ModelResults):
@@ -0,0 +1,269 @@
+'''
+Standalone scoring of new observations with a fitted model. A scorer
+artifact (written by ModelResults.export_scorer) holds the coefficient
+draws (or their posterior means), one table of random effects per group
+variable, and the level-to-index maps and contrast matrices of every
+categorical predictor. Scorer reads it and computes predictions with
+NumPy only: the design rows of new observations are built from those
+precomputed indexes, without patsy. Apart from export_scorer(), which
+runs where the model was fitted, this module only depends on NumPy and
+on the (NumPy-only) bambi.utils module.
+'''
+import json
+import re
+import numpy as np
+from bambi.utils import links
+
+
+def _column(code, data):
+    # the dataset column a patsy factor reads; only plain columns and
+    # C(column, ...) are supported
+    name = re.sub(r'^C\(\s*([^,\)]+?)\s*(,.*)?\)$', r'\1', code.strip())
+    if name not in data.columns:
+        raise ValueError("The scorer only supports predictors that are "
+                         "columns of the dataset; '%s' is not." % code)
+    return name
+
+
+def export_scorer(results, path, draws='mean', burn_in=0):
+    '''
+    Write a scorer artifact for a fitted model (see ModelResults.
+    export_scorer()).
+    Args:
+        results (ModelResults): The fitted model's results.
+        path (str): The file to write (a NumPy .npz archive).
+        draws (int, str): The number of posterior draws to keep (evenly
+            spaced over the trace), or 'mean' (default) to keep only the
+            posterior means of the coefficients.
+        burn_in (int): The number of samples to discard from the start of
+            each chain.
+    '''
+    import pandas as pd
+
+    model = results.model
+    data = model.data
+    arrays = {}
+
+    def _draws(var):
+        x = [results._chain_values(var, c, burn_in) for c in results.chains]
+        x = np.concatenate([v.reshape(len(v), -1) for v in x])
+        if draws == 'mean':
+            return x.mean(0)[None]
+        idx = np.linspace(0, len(x) - 1, min(int(draws), len(x)))
+        return x[np.round(idx).astype(int)]
+
+    def _array(prefix, values):
+        name = '%s_%d' % (prefix, len(arrays))
+        arrays[name] = np.asarray(values, dtype=float)
+        return name
+
+    def _levels(values):
+        return [str(v) for v in values]
+
+    def _factor(f):
+        column = _column(f['code'], data)
+        if 'categories' in f:
+            return {'column': column, 'levels': _levels(f['categories']),
+                    'contrast': _array('contrast', f['contrast'])}
+        if f['n_columns'] != 1:
+            raise ValueError("The scorer doesn't support matrix-valued "
+                             "predictor '%s'." % f['code'])
+        return {'column': column}
+
+    fixed, coefs, offset = [], [], 0
+    for name, t in model.fixed_terms.items():
+        if t._design is not None:
+            # added through a formula: the coding patsy used for the term
+            subterms = [{'factors': [_factor(f) for f in sub['factors']],
+                         'n_columns': sub['n_columns']}
+                        for sub in t._design]
+        elif t.kind == 'intercept':
+            subterms = [{'factors': [], 'n_columns': 1}]
+        elif name in data.columns and t.kind == 'categorical':
+            # added with add_term(): dummy columns of all but the first
+            # level (the reference) if the coding is treatment
+            levels = list(pd.get_dummies(data[name]).columns)
+            contrast = np.eye(len(levels))
+            if t.coding == 'treatment':
+                contrast = contrast[:, 1:]
+            subterms = [{'factors': [{'column': name,
+                                      'levels': _levels(levels),
+                                      'contrast': _array('contrast',
+                                                         contrast)}],
+                         'n_columns': contrast.shape[1]}]
+        elif name in data.columns and t.n_columns == 1:
+            subterms = [{'factors': [{'column': name}], 'n_columns': 1}]
+        else:
+            raise ValueError("The scorer can't rebuild the columns of "
+                             "fixed term '%s'." % name)
+        if sum(s['n_columns'] for s in subterms) != t.n_columns:
+            raise ValueError("The columns of fixed term '%s' don't match "
+                             "its coding." % name)
+        fixed.append({'name': name, 'start': offset, 'subterms': subterms})
+        coefs.append(_draws('b_' + name))
+        offset += t.n_columns
+
+    random = []
+    rows = np.arange(len(data)) if model.rows is None else model.rows
+    for name, t in model.random_terms.items():
+        variable, _, group = name.rpartition('|')
+        if t.kind == 'split':
+            # each level of the variable has its own random slopes, over
+            # the groups in which it occurs
+            values = data[variable].values[rows]
+            groups = data[group].values[rows]
+            split = {}
+            for level, X in t.data.items():
+                nonzero = X != 0
+                first = nonzero.argmax(0)
+                split[str(values[first[0]])] = {
+                    'groups': _levels(groups[first]),
+                    'table': _array('u', _draws('u_%s_%s' % (name, level)))}
+            random.append({'name': name, 'group': group,
+                           'variable': variable, 'split': split})
+            continue
+        if not variable:
+            # random intercepts: one column per level of the grouping
+            # variable, in the order of its dummy columns
+            group, levels = name, t.levels
+        else:
+            levels = list(pd.get_dummies(data[group]).columns)
+        if len(levels) != t.n_columns:
+            raise ValueError("The groups of random term '%s' don't match "
+                             "its columns." % name)
+        random.append({'name': name, 'group': _column(group, data),
+                       'variable': variable or None,
+                       'groups': _levels(levels),
+                       'table': _array('u', _draws('u_' + name))})
+
+    link = model.family.link
+    if callable(link):
+        raise ValueError("The scorer only supports named link functions.")
+    spec = {'format': 1, 'link': link, 'family': model.family.name,
+            'fixed': fixed, 'random': random}
+    arrays['beta'] = np.concatenate(coefs, axis=1) if coefs \
+        else np.zeros((1, 0))
+    arrays['spec'] = np.array(json.dumps(spec))
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+class Scorer(object):
+
+    '''
+    Scores new observations with a model exported by
+    ModelResults.export_scorer(). Only needs NumPy.
+    Args:
+        path (str): The scorer artifact.
+
+    Examples:
+        >>> scorer = Scorer('model.npz')
+        >>> scorer.score({'x': 1.2, 'condition': 'b', 'subj': 17})
+    '''
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as f:
+            arrays = {k: f[k] for k in f.files}
+        self.spec = json.loads(str(arrays.pop('spec')))
+        self.beta = arrays.pop('beta')
+        self.arrays = arrays
+        self.link = links[self.spec['link']]
+        # level -> index maps of the categorical predictors and groups
+        self._index = {}
+        for term in self.spec['fixed']:
+            for sub in term['subterms']:
+                for f in sub['factors']:
+                    if 'levels' in f:
+                        self._index[f['contrast']] = dict(
+                            (l, i) for i, l in enumerate(f['levels']))
+        for term in self.spec['random']:
+            tables = term['split'].values() if 'split' in term else [term]
+            for table in tables:
+                self._index[table['table']] = dict(
+                    (l, i) for i, l in enumerate(table['groups']))
+
+    def _columns(self, records):
+        # records as a dict of columns
+        if isinstance(records, dict):
+            first = next(iter(records.values()), None)
+            if np.ndim(first) == 0:
+                records = [records]
+            else:
+                return dict((k, np.asarray(v)) for k, v in records.items())
+        if hasattr(records, 'columns'):
+            return dict((k, records[k].values) for k in records.columns)
+        keys = set().union(*records) if records else set()
+        return dict((k, np.array([r.get(k) for r in records], dtype=object))
+                    for k in keys)
+
+    def _lookup(self, table, values):
+        # indexes of values in a level map (-1 for unknown values)
+        index = self._index[table]
+        return np.array([index.get(str(v), -1) for v in values], dtype=int)
+
+    def linear_predictor(self, records):
+        '''
+        The linear predictor of each record under each kept draw, as an
+        array of shape (n_records, n_draws).
+        Args:
+            records: A dict (one record), a list of dicts, or a dict of
+                columns (or DataFrame) holding the predictors.
+        '''
+        cols = self._columns(records)
+        n = len(next(iter(cols.values()))) if cols else 1
+        X = np.empty((n, self.beta.shape[1]))
+        for term in self.spec['fixed']:
+            start = term['start']
+            for sub in term['subterms']:
+                # like patsy, the left-most factor varies fastest
+                out = np.ones((n, 1))
+                for f in reversed(sub['factors']):
+                    values = cols[f['column']]
+                    if 'levels' in f:
+                        idx = self._lookup(f['contrast'], values)
+                        if (idx < 0).any():
+                            raise ValueError(
+                                "Unknown level '%s' of '%s'." % (
+                                    values[idx < 0][0], f['column']))
+                        block = self.arrays[f['contrast']][idx]
+                    else:
+                        block = np.asarray(values, dtype=float)[:, None]
+                    out = (out[:, :, None] * block[:, None, :]).reshape(n, -1)
+                X[:, start:start + sub['n_columns']] = out
+                start += sub['n_columns']
+        eta = np.dot(X, self.beta.T)
+
+        # random effects of groups not seen in the fit are 0
+        for term in self.spec['random']:
+            groups = cols[term['group']]
+            if 'split' in term:
+                levels = np.array([str(v) for v in cols[term['variable']]])
+                for level, table in term['split'].items():
+                    rows = np.flatnonzero(levels == level)
+                    idx = self._lookup(table['table'], groups[rows])
+                    u = self.arrays[table['table']]
+                    eta[rows[idx >= 0]] += u[:, idx[idx >= 0]].T
+                continue
+            idx = self._lookup(term['table'], groups)
+            u = self.arrays[term['table']]
+            effect = u[:, idx.clip(0)].T * (idx >= 0)[:, None]
+            if term['variable'] is not None:
+                effect *= np.asarray(cols[term['variable']],
+                                     dtype=float)[:, None]
+            eta += effect
+        return eta
+
+    def score(self, records, draws=False):
+        '''
+        Predict the mean response (e.g., the probability of the event for
+        binomial models) of new records.
+        Args:
+            records: A dict (one record), a list of dicts, or a dict of
+                columns (or DataFrame) holding the predictors.
+            draws (bool): If True, return the prediction under every kept
+                draw, as an array of shape (n_records, n_draws), rather
+                than the average over draws.
+        Returns: An array of predictions, one per record.
+        '''
+        mu = self.link(self.linear_predictor(records))
+        return mu if draws else mu.mean(1)
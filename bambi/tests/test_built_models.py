@@ -3,6 +3,7 @@ from bambi.models import Term, Model
 from bambi.priors import Prior
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
 import matplotlib
 import re
 matplotlib.use('Agg')
@@ -490,3 +491,536 @@ def test_poisson_regression(crossed_data):
     priors1 = {
         x.name: x.prior.args for x in model1.terms.values() if not x.random}
     assert set(priors0) == set(priors1)
+
+
+def test_save_and_load_built_model(crossed_data, tmpdir):
+    model0 = Model(crossed_data)
+    model0.fit('Y ~ continuous + threecats', random=['1|site'], run=False)
+    model0.build()
+    filename = str(tmpdir.join('model.pkl'))
+    model0.save(filename)
+
+    model1 = Model.load(filename)
+    assert model1.built
+    assert model1.term_names == model0.term_names
+    assert model1.backend.step is not None
+
+    # check that the resolved priors survived the round trip
+    for name, term in model0.fixed_terms.items():
+        np.testing.assert_array_equal(term.prior.args['sd'],
+                                      model1.terms[name].prior.args['sd'])
+
+    # loaded model can be fit without being rebuilt
+    fitted = model1.fit(samples=1)
+    assert fitted.n_samples == 1
+
+
+def test_runs_start_untuned(crossed_data):
+    model = Model(crossed_data)
+    model.fit('Y ~ continuous', random=['1|site'], run=False)
+    model.build()
+    model.backend.compile()
+    initial = model.backend.step.step_size
+    model.fit(samples=20, tune=10)
+    # tuning happens on a copy of the compiled step method
+    assert model.backend.step.step_size == initial
+    assert model.backend.step_states[0]['step_size'] != initial
+
+
+def test_model_set(crossed_data):
+    from bambi import ModelSet
+    specs = {
+        'fixed': {'fixed': 'Y ~ continuous', 'samples': 10},
+        'mixed': {'fixed': 'Y ~ continuous', 'random': ['1|site'],
+                  'samples': 10}
+    }
+    model_set = ModelSet(crossed_data, specs, n_jobs=2)
+    assert model_set.cost(specs['mixed']) > model_set.cost(specs['fixed'])
+    results = model_set.fit()
+    assert list(results.keys()) == ['fixed', 'mixed']
+    assert results['mixed'].n_samples == 10
+    assert 'site' in results['mixed'].model.random_terms
+
+
+def test_fit_by_groups(crossed_data):
+    model = Model(crossed_data)
+    summary, traces = model.fit_by('site', 'Y ~ continuous', n_jobs=2,
+                                   traces=True, samples=10)
+    sites = sorted(crossed_data['site'].unique())
+    assert summary.index.names == ['site', 'parameter']
+    assert len(summary) == 3 * len(sites)
+    assert len(traces) == len(sites)
+    # the full data are left in place after fitting
+    assert model.backend.shared_data['Y'].get_value().shape[0] == \
+        len(crossed_data)
+
+
+def test_noncentered_random_effects(crossed_data):
+    centered = Model(crossed_data)
+    fitted0 = centered.fit('Y ~ continuous', random=['1|site', 'dummy|item'],
+                           samples=10)
+
+    noncentered = Model(crossed_data, noncentered=True)
+    fitted1 = noncentered.fit('Y ~ continuous',
+                              random=['1|site', 'dummy|item'], samples=10)
+    assert '_u_site_offset' in noncentered.backend.aux_vars
+
+    # trace naming is unaffected by the parameterization
+    assert set(fitted0.summary().index) == set(fitted1.summary().index)
+    assert set(fitted0.get_trace(exclude_ranefs=False).columns) == \
+        set(fitted1.get_trace(exclude_ranefs=False).columns)
+    assert set(fitted0.summary(exclude_ranefs=False).index) == \
+        set(fitted1.summary(exclude_ranefs=False).index)
+
+    # 'auto' picks the parameterization from the per-group counts: there
+    # are 24 observations per site and 10 per item
+    model = Model(crossed_data, noncentered='auto')
+    model.backend.noncentered_max_count = 12
+    model.fit('Y ~ continuous', random=['1|site', '1|item'], run=False)
+    model.build()
+    assert '_u_site_offset' not in model.backend.aux_vars
+    assert '_u_item_offset' in model.backend.aux_vars
+
+    # per-term settings take precedence
+    model.add_term('site', random=True, categorical=True, drop_first=False,
+                   noncentered=True)
+    model.build()
+    assert '_u_site_offset' in model.backend.aux_vars
+
+    # hyperpriors on the mean are built as in the centered parameterization
+    prior = Prior('Normal', mu=Prior('Normal', mu=0, sd=1),
+                  sd=Prior('HalfNormal', sd=1))
+    model.add_term('site', random=True, categorical=True, drop_first=False,
+                   noncentered=True, prior=prior)
+    model.build()
+    assert 'u_site_mu' in model.backend.model.named_vars
+
+
+def test_qr_fixed_effects(crossed_data):
+    data = crossed_data.copy()
+    # a predictor that is strongly correlated with 'continuous'
+    np.random.seed(0)
+    data['collinear'] = data['continuous'] + np.random.normal(0, .1, len(data))
+
+    model0 = Model(data)
+    fitted0 = model0.fit('Y ~ continuous + collinear + threecats',
+                         random=['1|site'], samples=10)
+    model1 = Model(data, qr=True)
+    fitted1 = model1.fit('Y ~ continuous + collinear + threecats',
+                         random=['1|site'], samples=10)
+    assert '_b_qr' in model1.backend.aux_vars
+
+    # users see the same parameters on the same scale
+    assert set(fitted0.summary().index) == set(fitted1.summary().index)
+    assert set(fitted0.get_trace().columns) == \
+        set(fitted1.get_trace().columns)
+    assert fitted1.trace['b_threecats'].shape == \
+        fitted0.trace['b_threecats'].shape
+
+
+def test_laplace_approximation(crossed_data):
+    model = Model(crossed_data)
+    model.fit('Y ~ continuous + threecats', run=False)
+    model.build()
+    # the MLE is used as the starting point
+    start = model.backend._mle_start()
+    np.testing.assert_allclose(start['b_continuous'],
+                               model.mle.params['continuous[0]'])
+    fitted = model.fit(method='laplace', samples=200)
+    assert fitted.n_samples == 200
+    summary = fitted.summary()
+    assert set(summary.index) == {'Intercept', 'continuous', 'threecats[T.b]',
+                                  'threecats[T.c]', 'Y_sd'}
+    assert fitted.get_trace().shape == (200, 5)
+    assert abs(summary.loc['continuous', 'mean'] -
+               model.mle.params['continuous[0]']) < 1
+
+
+def test_mle_initialization(crossed_data):
+    model = Model(crossed_data)
+    model.fit('Y ~ continuous + dummy', random=['1|item', 'continuous|site'],
+              run=False)
+    model.build()
+    start = model.backend._mle_start()
+    # random effect SDs are set on the scale of their free variables
+    sd_names = [x for x in start if x.startswith('u_item_sd')]
+    assert len(sd_names) == 1 and sd_names[0] != 'u_item_sd'
+    assert start['u_item'].shape == (12,)
+    scaling = model.backend._mle_scaling()
+    assert len(scaling) == sum(np.size(v) for v in start.values())
+    assert np.all(scaling > 0)
+    model.backend.compile()
+    potential = model.backend.step.potential
+    fitted = model.fit(start='mle', samples=10, tune=10)
+    assert fitted.n_samples == 10
+    # the run's step method was built with the MLE mass matrix, which
+    # doesn't carry over to later runs
+    state = model.backend.step_states[fitted.trace.chains[-1]]
+    assert np.allclose(state['potential'].v, scaling)
+    assert model.backend.step.potential is potential
+
+
+def test_checkpoint_resume_and_extend(crossed_data, tmpdir):
+    checkpoint = str(tmpdir.join('model.ckpt'))
+    model = Model(crossed_data)
+    fitted = model.fit('Y ~ continuous', random=['1|site'], samples=20,
+                       tune=10, njobs=2, checkpoint=checkpoint,
+                       checkpoint_every=5)
+    assert fitted.n_samples == 20
+    assert len(fitted.trace.chains) == 2
+    step = model.backend.step_states[0]
+    assert not step['tune']
+
+    # resuming a finished run returns the same draws
+    model2 = Model(crossed_data)
+    model2.fit('Y ~ continuous', random=['1|site'], run=False)
+    resumed = model2.resume(checkpoint)
+    assert np.allclose(resumed.trace['b_continuous'],
+                       fitted.trace['b_continuous'])
+
+    # extending keeps the old draws, and continues without re-tuning
+    old = fitted.trace['b_continuous']
+    fitted.extend(10)
+    assert fitted.n_samples == 30
+    assert np.allclose(
+        fitted.trace.get_values('b_continuous', chains=[0])[:20], old[:20])
+    assert model.backend.step_states[0]['step_size'] == step['step_size']
+
+    # without a checkpoint, only chains sampled in this process keep their
+    # sampler state
+    fitted = model.fit(samples=10, tune=10)
+    fitted.extend(5)
+    assert fitted.n_samples == 15
+    fitted = model.fit(samples=10, tune=10, njobs=2)
+    with pytest.raises(ValueError):
+        fitted.extend(5)
+
+
+def test_sequential_updating(crossed_data):
+    formula, random = 'Y ~ continuous + threecats', ['1|site']
+    first = crossed_data.iloc[:len(crossed_data) // 2]
+    second = crossed_data.iloc[len(crossed_data) // 2:]
+    fitted = Model(first).fit(formula, random=random, samples=50, tune=25)
+
+    model = Model(second)
+    model.fit(formula, random=random, run=False)
+    priors = fitted.to_priors(model=model)
+    assert set(priors) == set(model.terms)
+    assert priors['1|site'].args['sd'].name == 'HalfNormal'
+    model.set_priors(priors)
+    updated = model.fit(samples=50, tune=25)
+
+    mv = fitted.to_priors(multivariate=True)
+    assert mv['threecats'].name == 'MvNormal'
+    assert mv['threecats'].args['cov'].shape == (2, 2)
+
+    full = Model(crossed_data).fit(formula, random=random, samples=50,
+                                   tune=25)
+    drift = updated.drift(full)
+    assert list(drift.columns) == ['mean', 'ref_mean', 'sd', 'ref_sd', 'z',
+                                   'sd_ratio']
+    assert 'continuous' in drift.index
+
+
+def test_adaptive_sampling_length(crossed_data):
+    model = Model(crossed_data)
+    fitted = model.fit('Y ~ continuous', random=['1|site'], target_ess=50,
+                       max_rhat=1.5, tune=20, block_size=50, samples=500,
+                       njobs=2)
+    assert fitted.stop_reason in ['converged', 'samples']
+    assert (fitted.n_samples - 20) % 50 == 0
+    assert 'b_continuous' in fitted.convergence.index
+    assert not any('u_site[' in x for x in fitted.convergence.index)
+    if fitted.stop_reason == 'converged':
+        assert (fitted.convergence['effective_n'] >= 50).all()
+
+    fitted = model.fit(time_budget=0, tune=20, block_size=10)
+    assert fitted.stop_reason == 'time_budget'
+    assert fitted.n_samples == 10
+
+
+def test_summary_store(crossed_data):
+    model = Model(crossed_data)
+    full = model.fit('Y ~ continuous', random=['1|item'], samples=100,
+                     tune=50, njobs=2)
+    fitted = model.fit(samples=100, tune=50, njobs=2,
+                       store={'random': 'summary'})
+    # individual random effects are not stored, but still summarized
+    assert 'u_item' not in fitted.trace.varnames
+    assert 'b_continuous' in fitted.trace.varnames
+    acc = fitted.summaries['u_item'][0]
+    assert acc.moments.n == 50
+    df = fitted.summary(exclude_ranefs=False)
+    ref = full.summary(exclude_ranefs=False)
+    assert list(df.columns) == list(ref.columns)
+    assert set(df.index) == set(ref.index)
+    row = df.loc[[x for x in df.index if x.startswith('1|item[')][0]]
+    assert row['hpd_2.5'] < row['mean'] < row['hpd_97.5']
+    with pytest.raises(ValueError):
+        model.fit(samples=10, store='some')
+
+
+def test_trace_export(crossed_data, tmpdir):
+    model = Model(crossed_data)
+    fitted = model.fit('Y ~ continuous + threecats', random=['1|site'],
+                       samples=20, njobs=2)
+    df = fitted.get_trace(burn_in=5, exclude_ranefs=False)
+    assert df.shape[0] == 30
+    assert np.allclose(df['continuous'],
+                       fitted.trace['b_continuous', 5:].ravel())
+
+    pa = pytest.importorskip('pyarrow')
+    table = fitted.to_arrow(burn_in=5)
+    assert table.num_rows == 30
+    assert table.column('chain').to_pylist() == [0] * 15 + [1] * 15
+    assert table.column('draw').to_pylist()[:2] == [5, 6]
+    assert isinstance(table.schema.field('b_threecats').type,
+                      pa.FixedSizeListType)
+    filename = str(tmpdir.join('trace.parquet'))
+    fitted.to_parquet(filename)
+    import pyarrow.parquet as pq
+    assert pq.read_table(filename).num_rows == 40
+
+
+def test_categorical_fixed_effects_as_lookups(crossed_data):
+    model = Model(crossed_data)
+    fitted = model.fit('Y ~ continuous + threecats', samples=20, tune=10)
+    term = model.terms['threecats']
+    assert term.kind == 'categorical' and term.coding == 'treatment'
+    # the backend holds level codes, with the reference level last
+    codes = model.backend.full_data['b_threecats']
+    assert codes.dtype.kind == 'i' and codes.shape == (len(crossed_data),)
+    assert set(codes) == {0, 1, 2}
+    # the log-probability matches the one computed with indicator columns
+    point = model.backend.model.test_point
+    point['b_threecats'] = np.array([.5, -1.])
+    mu = np.dot(term.data, point['b_threecats'])
+    assert np.allclose(mu[codes < 2], point['b_threecats'][codes[codes < 2]])
+    assert (mu[codes == 2] == 0).all()
+    assert set(fitted.summary().index) >= {'threecats[T.b]', 'threecats[T.c]'}
+
+
+def test_sparse_fixed_effects(crossed_data):
+    formula = 'Y ~ continuous + continuous:C(subj)'
+    dense = Model(crossed_data)
+    dense.add_formula(formula)
+    model = Model(crossed_data, sparse_threshold=.5)
+    fitted = model.fit(formula, samples=20, tune=10)
+    term = model.terms['continuous:C(subj)']
+    assert term.kind == 'sparse' and sp.issparse(term.data)
+    assert model.terms['continuous'].kind == 'numeric'
+    assert np.allclose(term.data.toarray(),
+                       dense.terms['continuous:C(subj)'].data)
+    assert term.levels == dense.terms['continuous:C(subj)'].levels
+    assert term.prior.args['sd'].shape == (term.n_columns,)
+    assert (term.prior.args['sd'] > 0).all()
+    assert sp.issparse(model.backend.full_data['b_continuous:C(subj)'])
+    assert set(fitted.summary().index) >= set(term.levels)
+
+
+def test_fused_linear_predictor(crossed_data):
+    model = Model(crossed_data)
+    model.fit('Y ~ continuous + threecats',
+              random=['1|site', 'dummy|item', 'threecats|subj'], run=False)
+    model.build()
+    backend = model.backend
+    assert backend.mu.ndim == 1
+    assert backend.shared_data['Y'].get_value().ndim == 1
+    # the dense columns of all terms share a single block
+    assert backend.full_data['_X'].shape == (len(crossed_data), 2 + 3 * 10)
+    # the fused predictor matches the sum of the terms' dense products
+    rng = np.random.RandomState(0)
+    point = {k: rng.randn(*np.shape(v))
+             for k, v in backend.model.test_point.items()}
+    mu = backend.model.fn(backend.mu)(point)
+    expected = sum(np.dot(t.data, point['b_' + name])
+                   for name, t in model.fixed_terms.items())
+    for name, t in model.random_terms.items():
+        items = t.data.items() if t.kind == 'split' else [(None, t.data)]
+        for level, data in items:
+            label = 'u_' + name if level is None \
+                else 'u_%s_%s' % (name, level)
+            expected = expected + np.dot(data, point[label])
+    assert np.allclose(mu, expected)
+
+
+def test_gibbs_backend(crossed_data):
+    model = Model(crossed_data, backend='gibbs')
+    fitted = model.fit('Y ~ continuous + threecats', random=['1|subj'],
+                       samples=200, tune=50, njobs=2, random_seed=0)
+    assert model.backend.samples['u_subj'].shape == (2, 200, 10)
+    summary = fitted.summary()
+    assert set(['mean', 'sd', 'hpd_2.5', 'hpd_97.5', 'effective_n',
+                'gelman_rubin']) <= set(summary.columns)
+    assert set(['Intercept', 'continuous', '1|subj_sd', 'Y_sd']) <= \
+        set(summary.index)
+    trace = fitted.get_trace()
+    assert len(trace) == 400
+    assert 'threecats[T.b]' in trace.columns
+    # the posterior agrees with the one from the PyMC3 backend
+    reference = Model(crossed_data).fit(
+        'Y ~ continuous + threecats', random=['1|subj'], samples=500,
+        tune=500)
+    ref = reference.get_trace(burn_in=100)
+    for col in ['Intercept', 'continuous', 'Y_sd']:
+        assert abs(trace[col].mean() - ref[col].mean()) < 3 * ref[col].std()
+
+    with pytest.raises(ValueError):
+        Model(crossed_data, backend='gibbs').fit('Y ~ continuous',
+                                                 link='log')
+
+
+def test_information_criteria(crossed_data):
+    from bambi.criteria import compare
+    fitted0 = Model(crossed_data).fit('Y ~ continuous', samples=200, tune=200)
+    fitted1 = Model(crossed_data).fit('Y ~ continuous', random=['1|subj'],
+                                      samples=200, tune=200)
+    ll = fitted1.log_likelihood(burn_in=50)
+    assert ll.shape == (150, len(crossed_data))
+    # chunking doesn't change the results
+    waic, pointwise = fitted1.waic(burn_in=50, chunk_size=7, pointwise=True)
+    assert np.allclose(waic, fitted1.waic(burn_in=50, chunk_size=10000))
+    assert np.allclose(pointwise['p_waic'], ll.var(0, ddof=1))
+    loo = fitted1.loo(burn_in=50, chunk_size=13)
+    assert set(loo.index) == {'loo', 'loo_se', 'p_loo', 'k_max'}
+    assert abs(loo['loo'] - waic['waic']) < waic['waic_se']
+    df = compare({'fixed': fitted0, 'mixed': fitted1}, burn_in=50)
+    assert df['d_ic'].iloc[0] == 0 and np.isclose(df['weight'].sum(), 1)
+
+
+def test_results_archive(crossed_data, tmpdir):
+    import subprocess
+    import sys
+    from bambi.results import ModelResults
+    model = Model(crossed_data)
+    fitted = model.fit('Y ~ continuous + threecats', random=['1|subj'],
+                       samples=50, tune=50, njobs=2)
+    path = str(tmpdir.join('archive'))
+    fitted.save(path)
+    loaded = ModelResults.load(path)
+    assert isinstance(loaded.samples['b_threecats'][0], np.memmap)
+    pd.testing.assert_frame_equal(loaded.get_trace(), fitted.get_trace())
+    expected = fitted.summary()
+    summary = loaded.summary()
+    assert list(summary.index) == list(expected.index)
+    assert np.allclose(summary['mean'], expected['mean'])
+    assert loaded.model.terms['threecats'].levels == \
+        model.terms['threecats'].levels
+    # loading doesn't need pymc3 or theano
+    code = ("import sys; from bambi.results import ModelResults; "
+            "r = ModelResults.load(%r); r.summary(); r.get_trace(); "
+            "assert 'pymc3' not in sys.modules and "
+            "'theano' not in sys.modules" % path)
+    assert subprocess.call([sys.executable, '-c', code]) == 0
+
+
+def test_export_scorer(crossed_data, tmpdir):
+    from bambi.scoring import Scorer
+    model = Model(crossed_data)
+    fitted = model.fit('Y ~ continuous + threecats',
+                       random=['continuous|subj'], samples=50, tune=50,
+                       njobs=2)
+    path = str(tmpdir.join('scorer.npz'))
+    fitted.export_scorer(path)
+    scorer = Scorer(path)
+    expected = sum(
+        np.dot(t.data, fitted.trace[('u_' if t.random else 'b_') + name]
+               .reshape(100, -1).mean(0))
+        for name, t in model.terms.items())
+    assert np.allclose(scorer.score(crossed_data), expected)
+    # one record at a time; unseen groups get no random effects
+    record = crossed_data.iloc[0].to_dict()
+    assert np.allclose(scorer.score(record), expected[0])
+    record['subj'] = 'unseen'
+    assert not np.allclose(scorer.score(record), expected[0])
+    record['threecats'] = 'unseen'
+    with pytest.raises(ValueError):
+        scorer.score(record)
+    # terms appended by another formula keep the coding of their formula
+    model = Model(crossed_data)
+    model.add_formula('Y ~ continuous')
+    model.add_formula('0 + C(threecats)')
+    model.build()
+    fitted = model.fit(samples=50, tune=50, njobs=2)
+    fitted.export_scorer(path)
+    expected = sum(np.dot(t.data, fitted.trace['b_' + name]
+                          .reshape(100, -1).mean(0))
+                   for name, t in model.terms.items())
+    assert np.allclose(Scorer(path).score(crossed_data), expected)
+
+
+def test_parallel_prior_scaling(crossed_data):
+    formula = dict(fixed='Y ~ continuous + dummy + threecats',
+                   random=['1|subj', 'continuous|item', 'threecats|subj'])
+
+    def _priors(**kwargs):
+        model = Model(crossed_data, **kwargs)
+        model.fit(run=False, **formula)
+        model.build()
+        return {t.name: t.prior.args['sd'].args['sd'] if t.random
+                else t.prior.args['sd'] for t in model.terms.values()}
+
+    serial = _priors()
+    for executor in ['thread', 'process']:
+        pooled = _priors(scale_jobs=3, scale_executor=executor)
+        assert set(pooled) == set(serial)
+        for name in serial:
+            assert np.allclose(pooled[name], serial[name])
+    with pytest.raises(ValueError):
+        _priors(scale_jobs=2, scale_executor='gpu')
+
+
+def test_prior_scaler_fit_cache(crossed_data):
+    import statsmodels.api as sm
+    from bambi.priors import PriorScaler
+    model = Model(crossed_data)
+    model.fit('Y ~ continuous + threecats', random=['dummy|subj'], run=False)
+    model.build()
+    scaler = PriorScaler(model, taylor=5)
+    assert scaler._intercept_fit() is scaler._intercept_fit()
+    fix_data = model.terms['dummy|subj'].data.sum(1)
+    exog, fit = scaler._augmented_fit(fix_data)
+    # the gaussian fit extends the QR decomposition of the fixed effects
+    assert 'qr' in scaler._fits
+    assert scaler._augmented_fit(fix_data.copy())[1] is fit
+    ref = sm.GLM(endog=model.y.data, exog=exog,
+                 family=sm.families.Gaussian()).fit()
+    assert np.allclose(fit.params, ref.params)
+    assert np.isclose(fit.llf, ref.llf)
+    assert np.allclose(fit.cov_params(), ref.cov_params())
+    # collinear columns can't be added to the QR decomposition: the fit
+    # falls back to IRLS
+    fix_data = np.column_stack([fix_data, 2 * fix_data])
+    exog, fit = scaler._augmented_fit(fix_data)
+    assert np.isfinite(fit.params).all()
+    ref = sm.GLM(endog=model.y.data, exog=exog,
+                 family=sm.families.Gaussian()).fit()
+    assert np.allclose(exog.values.dot(fit.params),
+                       exog.values.dot(ref.params))
+
+
+def test_prior_cache(crossed_data, tmpdir):
+    path = str(tmpdir.join('priors'))
+
+    def _build(random, **kwargs):
+        model = Model(crossed_data, **kwargs)
+        model.fit('Y ~ continuous + threecats', random=random, run=False)
+        model.build()
+        return model, {t.name: t.prior.args['sd'].args['sd'] if t.random
+                       else t.prior.args['sd'] for t in model.terms.values()}
+
+    model, priors = _build(['1|subj'], prior_cache=path)
+    assert model.timings['prior_cache_hits'] == 0
+    assert model.timings['prior_cache_misses'] == len(model.terms)
+    model, cached = _build(['1|subj'], prior_cache=path)
+    assert model.timings['prior_cache_hits'] == len(model.terms)
+    assert model.timings['prior_cache_misses'] == 0
+    for name in priors:
+        assert np.allclose(cached[name], priors[name])
+    # only the new terms (random intercepts and slopes over item) are scaled
+    model, cached = _build(['1|subj', 'continuous|item'], prior_cache=path)
+    assert model.timings['prior_cache_misses'] == 2
+    fresh = _build(['1|subj', 'continuous|item'])[1]
+    for name in fresh:
+        assert np.allclose(cached[name], fresh[name])
+    assert set(['terms', 'priors', 'backend']) <= set(model.timings)
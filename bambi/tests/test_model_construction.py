@@ -137,3 +137,102 @@ def test_add_formula_append(diabetes_data):
     assert model.y is None
     assert 'S2' in model.terms
     assert 'S1' not in model.terms
+
+
+def test_shared_data_roundtrip(diabetes_data):
+    # datasets are only shared in memory since Python 3.8
+    pytest.importorskip('multiprocessing.shared_memory')
+    from bambi.parallel import SharedData
+    data = diabetes_data.copy()
+    data['grp'] = data['age_grp'].map({0: 'young', 1: 'middle', 2: 'old'})
+    shared = SharedData(data)
+    try:
+        shm, copy = SharedData.attach(shared.spec)
+        # columns are grouped by dtype
+        assert sorted(copy.columns) == sorted(data.columns)
+        assert copy['grp'].dtype.name == 'category'
+        assert (copy['grp'].astype(str) == data['grp']).all()
+        np.testing.assert_array_equal(copy['BMI'], data['BMI'])
+        # the columns are read-only views of the shared memory
+        buf = np.frombuffer(shm.buf, dtype=np.uint8)
+        for name in copy.columns:
+            values = copy[name].values
+            if name == 'grp':
+                values = values.codes
+            assert np.shares_memory(values, buf)
+            assert not values.flags.writeable
+        del copy, buf, values
+        shm.close()
+    finally:
+        shared.close()
+
+
+def test_design_cache_reuses_columns(diabetes_data):
+    cache = {}
+    model0 = Model(diabetes_data)
+    model0._design_cache = cache
+    model0.add_formula('BP ~ S1 + S2')
+    model1 = Model(diabetes_data)
+    model1._design_cache = cache
+    model1.add_formula('BP ~ S1 + S2', random=['1|age_grp'])
+    assert len([k for k in cache if k[0] == 'formula']) == 1
+    assert model0.terms['S1'].levels == model1.terms['S1'].levels
+
+
+def test_term_representation(diabetes_data):
+    model = Model(diabetes_data, intercept=True)
+    model.add_formula('BMI ~ 0 + AGE + C(age_grp)')
+    model.add_term('age_grp', over='BMI', categorical=False, random=True)
+    terms = model.terms
+    assert terms['Intercept'].kind == 'intercept'
+    assert terms['Intercept'].is_intercept
+    assert terms['AGE'].kind == 'numeric'
+    assert not terms['AGE'].is_intercept
+    # full-rank coded factor: indicator codes, and spans the intercept
+    factor = terms['C(age_grp)']
+    assert factor.kind == 'categorical' and factor.n_columns == 3
+    assert factor.is_intercept
+    assert np.array_equal(factor.data.argmax(1), factor.codes)
+    slopes = terms['age_grp|BMI']
+    assert slopes.kind == 'group'
+    assert slopes.data.shape == (442, slopes.n_columns)
+    # classification is cached until the terms change
+    assert model.fixed_terms is model.fixed_terms
+    model.add_term('BP')
+    assert 'BP' in model.fixed_terms
+    # subsetting keeps the compact representation
+    factor.subset(np.arange(10))
+    assert factor.data.shape == (10, 3)
+    with pytest.raises(AttributeError):
+        factor.foo = 1
+
+
+def test_lazy_term_materialization(diabetes_data):
+    model = Model(diabetes_data)
+    model.add_formula('BMI ~ S1 + C(age_grp)')
+    model.add_formula('S2 + S1:S2', random=['1|age_grp', 'S3|age_grp'])
+    model.add_formula('BMI ~ S3', append=False)
+    model.add_formula('S1 + S3:S1', random=['S2|age_grp'])
+    model.set_priors({'S1': 0.3})
+    # nothing is built until the model is, or a term's values are accessed
+    assert all(t._source is not None for t in model.terms.values())
+    assert model.terms['S1'].prior == 0.3
+    assert model.terms['S3:S1'].kind == 'numeric'
+    assert all(t._source is None for t in model.terms.values())
+    assert model.y._source is None
+    assert model.term_names == ['Intercept', 'S3', 'S1', 'S3:S1', 'age_grp',
+                                'S2|age_grp']
+    np.testing.assert_array_equal(model.terms['S3:S1'].data[:, 0],
+                                  diabetes_data['S3'] * diabetes_data['S1'])
+    # the same terms, built right away
+    eager = Model(diabetes_data)
+    eager.add_formula('BMI ~ S3 + S1 + S3:S1', random=['S2|age_grp'])
+    for name, term in eager.terms.items():
+        assert model.terms[name].levels == term.levels
+        np.testing.assert_array_equal(model.terms[name].data, term.data)
+    # terms appended by another formula keep the coding of their own formula
+    model = Model(diabetes_data)
+    model.add_formula('BMI ~ S1')
+    model.add_formula('0 + C(age_grp)')
+    assert model.terms['C(age_grp)'].levels == \
+        ['C(age_grp)[0]', 'C(age_grp)[1]', 'C(age_grp)[2]']
@@ -1,6 +1,54 @@
-from bambi.utils import listify
+import pytest
+from bambi.utils import listify, load_data, formula_columns
+from bambi.diagnostics import ConvergenceMonitor
+from os.path import dirname, join
+import pandas as pd
+import numpy as np
+
 
 def test_listify():
     assert listify(None) == []
     assert listify([1, 2, 3]) == [1, 2, 3]
-    assert listify('giraffe') == ['giraffe']
\ No newline at end of file
+    assert listify('giraffe') == ['giraffe']
+
+
+def test_convergence_monitor():
+    np.random.seed(0)
+    monitor = ConvergenceMonitor(2, [0, 1])
+    for chain in [0, 1]:
+        x = np.random.normal(size=(4000, 2))
+        x[:, 1] += chain * 5
+        for i in range(0, 4000, 300):
+            monitor.update(chain, x[i:i + 300])
+    ess, rhat = monitor.ess(), monitor.rhat()
+    assert 4000 < ess[0] < 12000
+    assert abs(rhat[0] - 1) < .01
+    assert rhat[1] > 2
+
+
+def test_load_data(tmpdir):
+    data = pd.read_csv(join(dirname(__file__), 'data', 'diabetes.txt'),
+                       sep='\t')
+    assert {'y', 'x', 'g', 'subj', 'z'} <= formula_columns(
+        ['y[1] ~ np.log(x) + C(g)', 'z|subj'])
+    # delimited text: the separator is sniffed, only used columns are read
+    path = str(tmpdir.join('data.csv'))
+    data.to_csv(path, sep=';', index=False)
+    loaded = load_data(path, columns=['BMI ~ S1 + C(SEX)', '1|AGE'],
+                       dtypes={'SEX': 'category'})
+    assert list(loaded.columns) == ['AGE', 'SEX', 'BMI', 'S1']
+    assert loaded['SEX'].dtype.name == 'category'
+    np.testing.assert_array_equal(loaded['S1'], data['S1'])
+    assert load_data(join(dirname(__file__), 'data', 'diabetes.txt')).shape \
+        == data.shape
+    path = str(tmpdir.join('data.npz'))
+    np.savez(path, **{c: data[c].values for c in data.columns})
+    loaded = load_data(path, columns=['BMI'], dtypes={'BMI': 'float32'})
+    assert list(loaded.columns) == ['BMI']
+    assert loaded['BMI'].dtype == np.float32
+    pytest.importorskip('pyarrow')
+    path = str(tmpdir.join('data.parquet'))
+    data.to_parquet(path)
+    loaded = load_data(path, columns=['BMI ~ S1'])
+    assert list(loaded.columns) == ['BMI', 'S1']
+    np.testing.assert_array_equal(loaded['BMI'], data['BMI'])
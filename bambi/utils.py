@@ -1,3 +1,19 @@
+import os
+import re
+import numpy as np
+from bambi.external.six import string_types
+
+
+# Inverse link functions, as applied by PyMC3BackEnd.links
+links = {
+    'identity': lambda x: x,
+    # the logistic function, without overflow for large negative x
+    'logit': lambda x: .5 * (1. + np.tanh(.5 * x)),
+    'inverse': lambda x: 1. / x,
+    'log': np.log
+}
+
+
 def listify(obj):
     ''' Wraps all non-list or tuple objects in a list; provides a simple
     way to accept flexible arguments. '''
@@ -5,3 +21,184 @@ def listify(obj):
         return []
     else:
         return obj if isinstance(obj, (list, tuple, type(None))) else [obj]
+
+
+def _call(task):
+    func, args = task
+    return func(*args)
+
+
+def pool_imap(func, tasks, n_jobs, initializer=None, initargs=(),
+              threads=False, ordered=True):
+    '''
+    Apply a function to several tuples of arguments in a pool of worker
+    processes (or threads).
+    Args:
+        func (callable): The function. Functions run in processes must be
+            picklable, i.e. defined at the top level of a module.
+        tasks (list): The tuples of arguments of each call.
+        n_jobs (int): The number of workers.
+        initializer (callable): An optional function called with initargs
+            when each worker starts.
+        initargs (tuple): The arguments of initializer.
+        threads (bool): If True, the workers are threads rather than
+            processes.
+        ordered (bool): If True (default), results are yielded in the
+            order of the tasks; otherwise in the order they finish.
+    Returns: A generator of the results.
+    '''
+    from multiprocessing.pool import Pool, ThreadPool
+    pool = (ThreadPool if threads else Pool)(n_jobs, initializer, initargs)
+    try:
+        imap = pool.imap if ordered else pool.imap_unordered
+        for result in imap(_call, [(func, args) for args in tasks]):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def replace_file(src, dst):
+    ''' Rename src to dst, replacing dst if it exists (os.replace() on
+    Python 3). '''
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+        return
+    # on Python 2, os.rename() only replaces existing files on POSIX
+    if os.name == 'nt' and os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
+
+
+def sparse_column_stats(X):
+    ''' Column means and standard deviations (with ddof=1, as in pandas) of
+    a scipy sparse matrix, without densifying it. '''
+    n = X.shape[0]
+    mean = np.asarray(X.mean(0)).ravel()
+    var = np.asarray(X.multiply(X).mean(0)).ravel() - mean ** 2
+    return mean, np.sqrt(np.clip(var, 0, None) * n / max(n - 1, 1))
+
+
+def formula_columns(specs):
+    '''
+    Names that the given formulas, random effects specifications or column
+    names may refer to as dataset columns.
+    Args:
+        specs (str, list): Column names, fixed effects formulas (e.g.,
+            'y[event] ~ x + C(g)') and/or random effects specifications
+            (e.g., '1|subj' or 'x|subj').
+    Returns: A set of names. Names that aren't columns (e.g., 'np' in
+        'np.log(x)') are included as well, and have to be filtered out
+        against the actual columns.
+    '''
+    import ast
+    from patsy import ModelDesc
+    names = set()
+    for spec in listify(specs):
+        names.add(spec)
+        # the event syntax of binomial outcomes isn't valid patsy
+        spec = re.sub(r'^\s*(\S+)\[\S+\]\s*~', r'\1 ~', spec)
+        try:
+            desc = ModelDesc.from_formula(spec.replace('|', '+'))
+        except Exception:
+            continue
+        for term in desc.lhs_termlist + desc.rhs_termlist:
+            for factor in term.factors:
+                for node in ast.walk(ast.parse(factor.code, mode='eval')):
+                    if isinstance(node, ast.Name):
+                        names.add(node.id)
+                    # quoted names, as in Q('my column'); string literals
+                    # are Str nodes before Python 3.8
+                    elif type(node).__name__ in ['Constant', 'Str']:
+                        value = node.value if hasattr(node, 'value') \
+                            else node.s
+                        if isinstance(value, string_types):
+                            names.add(value)
+    return names
+
+
+def _sniff_separator(path, default):
+    # the field separator of a (possibly compressed) delimited text file,
+    # sniffed from its first lines
+    import bz2
+    import csv
+    import gzip
+    openers = {'.gz': gzip.open, '.bz2': bz2.BZ2File}
+    try:
+        import lzma
+        openers['.xz'] = lzma.open
+    except ImportError:
+        # Python 2 has no lzma module
+        pass
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.xz' and ext not in openers:
+        return default
+    with openers.get(ext, open)(path, 'rb') as f:
+        sample = b''.join(line for _, line in zip(range(20), f))
+    if not isinstance(sample, str):
+        sample = sample.decode('utf-8', 'replace')
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',;\t| ').delimiter
+    except csv.Error:
+        return default
+
+
+def load_data(path, columns=None, dtypes=None):
+    '''
+    Read a dataset from a file. Parquet (.parquet, .pq) and Feather/Arrow
+    (.feather, .arrow) files are read with pyarrow, memory-mapped, and
+    only the requested columns are read. NumPy archives (.npz) hold one
+    array per column. Any other file is read as delimited text with the
+    C parser of pandas: the separator is sniffed from the first lines, and
+    only the requested columns are parsed.
+    Args:
+        path (str): The file to read.
+        columns (list): Optional names of the columns to read, and/or
+            formulas or random effects specifications whose variables
+            should be read (see formula_columns()). Names that aren't
+            columns of the file are ignored. Defaults to all columns.
+        dtypes (dict): Optional dtypes of some columns (e.g., 'category',
+            'float32' or a pandas CategoricalDtype with the categories).
+    Returns: A pandas DataFrame.
+    '''
+    import pandas as pd
+    dtypes = dict(dtypes or {})
+    ext = path.lower()
+    for suffix in ['.gz', '.bz2', '.xz']:
+        if ext.endswith(suffix):
+            ext = ext[:-len(suffix)]
+    ext = os.path.splitext(ext)[1]
+    names = formula_columns(columns) if columns is not None else None
+
+    def _select(available):
+        # the requested columns, in the order of the file
+        if names is None:
+            return None
+        return [c for c in available if c in names]
+
+    if ext in ['.parquet', '.pq', '.feather', '.arrow']:
+        import pyarrow.parquet as pq
+        import pyarrow.feather as feather
+        if ext in ['.parquet', '.pq']:
+            cols = _select(pq.read_schema(path, memory_map=True).names)
+            table = pq.read_table(path, columns=cols, memory_map=True)
+        else:
+            table = feather.read_table(path, memory_map=True)
+            cols = _select(table.column_names)
+            if cols is not None:
+                table = table.select(cols)
+        data = table.to_pandas()
+    elif ext == '.npz':
+        with np.load(path, allow_pickle=False) as f:
+            cols = f.files if names is None else _select(f.files)
+            data = pd.DataFrame(dict((c, f[c]) for c in cols), columns=cols)
+    else:
+        default = '\t' if ext in ['.tsv', '.tab', '.txt'] else ','
+        sep = _sniff_separator(path, default)
+        cols = _select(pd.read_csv(path, sep=sep, nrows=0).columns)
+        return pd.read_csv(path, sep=sep, engine='c', usecols=cols,
+                           dtype=dtypes or None)
+
+    dtypes = dict((c, t) for c, t in dtypes.items() if c in data.columns)
+    return data.astype(dtypes) if dtypes else data